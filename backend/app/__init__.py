@@ -8,10 +8,11 @@ except ImportError:  # pragma: no cover - 开发环境下可选依赖
 from .config import Config
 from .extensions import db, jwt, socketio, migrate, cors
 
-def create_app(config_class=Config):
+def create_app(config_class=Config, start_background=True):
     """
     创建 Flask 应用实例
     :param config_class: 配置类
+    :param start_background: 是否按配置启动内嵌后台运行时；一次性脚本应传 False，避免参与选主与执行定时任务
     :return: Flask app
     """
     app = Flask(__name__)
@@ -20,7 +21,8 @@ def create_app(config_class=Config):
     # 初始化项目依赖的核心扩展（数据库、JWT、SocketIO、迁移、跨域）
     db.init_app(app)
     jwt.init_app(app)
-    socketio.init_app(app)
+    # 配置 Redis 消息队列后，所有 gunicorn worker 与后台进程都可以向客户端推送事件
+    socketio.init_app(app, message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'))
     migrate.init_app(app, db)
     cors.init_app(app)
     
@@ -81,32 +83,17 @@ def create_app(config_class=Config):
     from .feedback.routes import feedback_bp
     app.register_blueprint(feedback_bp, url_prefix='/api/feedback') # 留言反馈
 
+    # 注册 Socket.IO 事件处理（JWT 认证与个人房间）
+    from . import realtime  # noqa: F401
+
     from .utils.storage import storage_client
     storage_client.init_app(app)
     
-    # 启动后台同步线程，将 Redis 中的离线文档回写数据库
-    # 启动后台同步线程
-    from .sync import start_sync_worker
-    start_sync_worker(app)
-    
-    # 初始化并启动定时任务调度器
-    try:
-        from flask_apscheduler import APScheduler
-        from .tasks.scheduler import check_notifications
-        
-        scheduler = APScheduler()
-        scheduler.init_app(app)
-        scheduler.start()
-        
-        @scheduler.task('interval', id='check_notifications', minutes=1)
-        def job_check_notifications():
-            check_notifications(app)
-            
-        print("✅ Scheduler started.")
-    except ImportError:
-        print("⚠️ Flask-APScheduler not installed, skipping scheduler.")
-    except Exception as e:
-        print(f"⚠️ Scheduler start failed: {e}")
+    # 启动后台运行时：离线同步、索引消费与定时任务只在选主成功的进程中运行
+    # external 模式下 Web 进程不参与，由 scripts/run_background.py 独立进程负责
+    if start_background and app.config.get('BACKGROUND_RUNTIME', 'embedded') == 'embedded':
+        from .runtime import start_background_runtime
+        start_background_runtime(app)
 
     return app
 
@@ -1,17 +1,51 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 import subprocess
 import os
 import tempfile
-import io
+import uuid
+import zlib
 from datetime import datetime
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
 
-from ..models.models import User, Document, Folder
+from ..models.models import User, Document, DocumentFlag, Folder, MonitorKeyword
 from ..extensions import db
+from ..tasks.backup_restore import (
+    create_restore_job,
+    get_restore_job,
+    resume_restore_job,
+)
+from ..utils.document_flags import build_snippet
+from ..utils.keyword_matcher import get_matcher, strip_html_tags
+from ..utils.logical_backup import iter_backup_ndjson
 from ..utils.minio_service import delete_file_by_url
+from ..utils.pagination import (
+    InvalidCursor,
+    clamp_limit,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    keyset_order_by,
+)
 
 admin_bp = Blueprint('admin', __name__)
 
+# 备份导出每次读取的字节数与 gzip 压缩级别
+BACKUP_CHUNK_SIZE = 64 * 1024
+BACKUP_COMPRESS_LEVEL = 6
+# 关键词监控流式扫描文档的批大小
+MONITOR_SCAN_BATCH_SIZE = 500
+# updated_at 为空的旧数据在游标中的占位值
+_CURSOR_EPOCH = datetime(1970, 1, 1)
+# 实时扫描的分页游标标记，游标中为下一页的起始主键
+_SCAN_CURSOR_TAG = 'scan'
+# 监控结果按更新时间倒序翻页，id 作为唯一列保证翻页稳定
+_MONITOR_KEYSET = [
+    (func.coalesce(Document.updated_at, _CURSOR_EPOCH), True),
+    (Document.id, True),
+]
+
 
 def admin_required(fn):
     """简易管理员校验装饰器"""
@@ -178,139 +212,370 @@ def list_all_tasks():
     
     return jsonify(results), 200
 
+def _serialize_monitored_document(row, username, matched_keywords, snippet):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'content': row.content,  # 完整内容用于预览
+        'username': username or 'Unknown',
+        'user_id': row.owner_id,
+        'snippet': snippet,
+        'matched_keywords': matched_keywords,
+        'created_at': row.created_at.strftime('%Y-%m-%d %H:%M'),
+        'updated_at': row.updated_at.strftime('%Y-%m-%d %H:%M')
+    }
+
+
+def _monitor_page(items, has_more, last_row):
+    next_cursor = None
+    if has_more and last_row is not None:
+        next_cursor = encode_cursor([last_row.updated_at or _CURSOR_EPOCH, last_row.id])
+    return {'items': items, 'next_cursor': next_cursor}
+
+
+def _query_flagged_documents(keywords, page_size=None, cursor_values=None):
+    """
+    按预先计算的标记查询命中文档，keywords 为 [(关键词ID, 关键词)]
+    返回 (结果列表, 是否还有下一页, 本页最后一行)
+    """
+    keyword_ids = [keyword_id for keyword_id, _ in keywords]
+    flagged_ids = select(DocumentFlag.document_id).where(DocumentFlag.keyword_id.in_(keyword_ids))
+    query = db.session.query(
+        Document.id, Document.title, Document.content, Document.owner_id,
+        Document.created_at, Document.updated_at, User.username
+    ).outerjoin(User, User.id == Document.owner_id).filter(
+        Document.is_deleted == False,
+        Document.id.in_(flagged_ids)
+    )
+    if cursor_values:
+        query = query.filter(keyset_condition(_MONITOR_KEYSET, cursor_values))
+    query = query.order_by(*keyset_order_by(_MONITOR_KEYSET))
+
+    has_more = False
+    if page_size:
+        rows = query.limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+    else:
+        rows = query.all()
+    if not rows:
+        return [], False, None
+
+    # 本页文档的全部标记一次取回，按请求中的关键词顺序排列
+    order = {keyword_id: i for i, keyword_id in enumerate(keyword_ids)}
+    flags = {}
+    for document_id, keyword_id, snippet in db.session.query(
+        DocumentFlag.document_id, DocumentFlag.keyword_id, DocumentFlag.snippet
+    ).filter(
+        DocumentFlag.document_id.in_([row.id for row in rows]),
+        DocumentFlag.keyword_id.in_(keyword_ids)
+    ):
+        flags.setdefault(document_id, []).append((order[keyword_id], keyword_id, snippet))
+
+    names = dict(keywords)
+    items = []
+    for row in rows:
+        matched = sorted(flags.get(row.id, []))
+        items.append(_serialize_monitored_document(
+            row, row.username,
+            [names[keyword_id] for _, keyword_id, _ in matched],
+            matched[0][2] if matched else ''
+        ))
+    return items, has_more, rows[-1]
+
+
+def _scan_documents(keywords, page_size=None, before_id=None):
+    """
+    实时扫描文档正文，用于尚未完成回扫的关键词
+    返回 (结果列表, 是否还有下一页, 下一页的起始主键)
+    """
+    matcher = get_matcher(keywords)
+
+    # 按主键倒序分批扫描（id < 上一批最小 id），每批只走主键索引，
+    # 不按更新时间排序以免整表 filesort；分页时凑满一页即停止，命中结果再按更新时间排序
+    flagged = []
+    has_more = False
+    last_id = before_id
+    while not has_more:
+        stmt = select(
+            Document.id, Document.title, Document.content, Document.owner_id,
+            Document.created_at, Document.updated_at
+        ).where(Document.is_deleted == False)
+        if last_id is not None:
+            stmt = stmt.where(Document.id < last_id)
+        rows = db.session.execute(stmt.order_by(Document.id.desc()).limit(MONITOR_SCAN_BATCH_SIZE)).all()
+        for row in rows:
+            last_id = row.id
+            if not row.content:
+                continue
+
+            # 清理HTML标签，获取纯文本后一次扫描匹配全部关键词（OR关系）
+            clean_content = strip_html_tags(row.content)
+            matches = matcher.find(clean_content)
+            if not matches:
+                continue
+            if page_size and len(flagged) == page_size:
+                has_more = True
+                break
+            flagged.append((row, clean_content, matches))
+        if len(rows) < MONITOR_SCAN_BATCH_SIZE:
+            break
+
+    next_id = flagged[-1][0].id if has_more else None
+    flagged.sort(key=lambda entry: (entry[0].updated_at or _CURSOR_EPOCH, entry[0].id), reverse=True)
+
+    # 作者信息一次批量查询
+    owner_ids = {row.owner_id for row, _, _ in flagged}
+    usernames = dict(
+        db.session.query(User.id, User.username).filter(User.id.in_(owner_ids))
+    ) if owner_ids else {}
+
+    items = []
+    for row, clean_content, matches in flagged:
+        # 提取第一个匹配关键词的内容片段
+        keyword, idx = matches[0]
+        items.append(_serialize_monitored_document(
+            row, usernames.get(row.owner_id),
+            [k for k, _ in matches],
+            build_snippet(clean_content, keyword, idx)
+        ))
+    return items, has_more, next_id
+
+
 @admin_bp.route('/monitor/docs', methods=['POST'])
 @admin_required
 def monitor_documents():
-    """根据关键词监控文档内容"""
-    import re
-    
+    """根据关键词监控文档内容（传入 limit/cursor 时分页返回 {items, next_cursor}）"""
     data = request.get_json()
     keywords = data.get('keywords', [])
     
     if not keywords:
         return jsonify([]), 200
-    
-    # 查询所有非删除的文档
-    docs = Document.query.filter_by(is_deleted=False).all()
-    
-    def strip_html_tags(text):
-        """去除HTML标签，保留纯文本"""
-        if not text:
-            return ''
-        # 移除所有HTML标签
-        clean = re.compile('<.*?>')
-        text = re.sub(clean, '', text)
-        # 移除多余的空白字符
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
-    
-    flagged_docs = []
-    for doc in docs:
-        if not doc.content:
-            continue
-        
-        # 清理HTML标签，获取纯文本
-        clean_content = strip_html_tags(doc.content)
-        
-        # 检查文档内容是否包含任何关键词（OR关系）
-        matched_keywords = []
-        content_lower = clean_content.lower()
-        
-        for keyword in keywords:
-            if keyword.lower() in content_lower:
-                matched_keywords.append(keyword)
-        
-        if matched_keywords:
-            # 提取包含关键词的内容片段
-            snippet = ''
-            for keyword in matched_keywords[:1]:  # 只显示第一个匹配的关键词片段
-                idx = content_lower.find(keyword.lower())
-                if idx != -1:
-                    start = max(0, idx - 30)
-                    end = min(len(clean_content), idx + len(keyword) + 30)
-                    snippet = '...' + clean_content[start:end] + '...'
-                    break
-            
-            flagged_docs.append({
-                'id': doc.id,
-                'title': doc.title,
-                'content': doc.content,  # 完整内容用于预览
-                'username': doc.owner.username if doc.owner else 'Unknown',
-                'user_id': doc.owner_id,
-                'snippet': snippet,
-                'matched_keywords': matched_keywords,
-                'created_at': doc.created_at.strftime('%Y-%m-%d %H:%M'),
-                'updated_at': doc.updated_at.strftime('%Y-%m-%d %H:%M')
-            })
-    
-    # 按更新时间倒序排列
-    flagged_docs.sort(key=lambda x: x['updated_at'], reverse=True)
-    
-    return jsonify(flagged_docs), 200
+
+    limit = data.get('limit', request.args.get('limit', type=int))
+    cursor = data.get('cursor') or request.args.get('cursor')
+    paginated = limit is not None or bool(cursor)
+    page_size = clamp_limit(limit) if paginated else None
+    try:
+        cursor_values = decode_cursor(cursor, len(_MONITOR_KEYSET)) if cursor else None
+    except InvalidCursor:
+        return jsonify({'msg': '无效的分页游标'}), 400
+
+    # 关键词均为已完成回扫的监控关键词时直接查询标记表，否则实时扫描
+    stored = dict(
+        db.session.query(MonitorKeyword.keyword, MonitorKeyword.id).filter(
+            MonitorKeyword.keyword.in_(keywords),
+            MonitorKeyword.scanned_at.isnot(None)
+        )
+    )
+    # 实时扫描的游标按主键翻页，翻页期间关键词完成回扫也继续扫描，保证结果连续
+    scanning = bool(cursor_values) and cursor_values[0] == _SCAN_CURSOR_TAG
+    if not scanning and all(keyword in stored for keyword in keywords):
+        ordered = [(stored[keyword], keyword) for keyword in dict.fromkeys(keywords)]
+        items, has_more, last_row = _query_flagged_documents(ordered, page_size, cursor_values)
+        page = _monitor_page(items, has_more, last_row)
+    else:
+        # 标记查询的游标 (更新时间, 主键) 在关键词重新回扫期间从该主键继续扫描
+        before_id = cursor_values[1] if cursor_values else None
+        items, has_more, next_id = _scan_documents(keywords, page_size, before_id)
+        page = {'items': items, 'next_cursor': encode_cursor([_SCAN_CURSOR_TAG, next_id]) if has_more else None}
+
+    if paginated:
+        return jsonify(page), 200
+    return jsonify(items), 200
+
+
+@admin_bp.route('/monitor/flags', methods=['GET'])
+@admin_required
+def get_monitor_flags():
+    """
+    分页查询命中监控关键词的文档，返回 {items, next_cursor, pending_keywords}
+    可用 keyword 参数（可重复）限定关键词，默认全部；pending_keywords 为尚未完成回扫的关键词
+    """
+    requested = request.args.getlist('keyword')
+    query = db.session.query(MonitorKeyword.id, MonitorKeyword.keyword, MonitorKeyword.scanned_at)
+    if requested:
+        query = query.filter(MonitorKeyword.keyword.in_(requested))
+    rows = query.order_by(MonitorKeyword.id).all()
+
+    cursor = request.args.get('cursor')
+    try:
+        cursor_values = decode_cursor(cursor, len(_MONITOR_KEYSET)) if cursor else None
+    except InvalidCursor:
+        return jsonify({'msg': '无效的分页游标'}), 400
+
+    keywords = [(keyword_id, keyword) for keyword_id, keyword, _ in rows]
+    items, has_more, last_row = [], False, None
+    if keywords:
+        items, has_more, last_row = _query_flagged_documents(
+            keywords, clamp_limit(request.args.get('limit', type=int)), cursor_values
+        )
+
+    page = _monitor_page(items, has_more, last_row)
+    page['pending_keywords'] = [keyword for _, keyword, scanned_at in rows if scanned_at is None]
+    return jsonify(page), 200
+
+
+def _mysql_client_args():
+    """
+    从 SQLALCHEMY_DATABASE_URI 解析 mysql / mysqldump 的连接参数
+    返回 (命令行参数, 环境变量, 数据库名)，密码经 MYSQL_PWD 传递，不出现在进程列表中
+    """
+    url = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    args = ['-h', url.host or 'localhost', '-P', str(url.port or 3306), '-u', url.username or '', '--skip-ssl']
+    env = dict(os.environ, MYSQL_PWD=url.password or '')
+    return args, env, url.database
+
+
+def _gzip_chunks(chunks):
+    """对字节块序列做流式 gzip 压缩"""
+    compressor = zlib.compressobj(BACKUP_COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _stream_gzip(process, stderr, logger):
+    """
+    逐块读取子进程输出并即时 gzip 压缩，内存占用与数据库大小无关
+    子进程失败时不写入 gzip 结尾而是中断响应，下载得到的文件解压时会报错
+    """
+    def read_output():
+        yield from iter(lambda: process.stdout.read(BACKUP_CHUNK_SIZE), b'')
+        if process.wait() != 0:
+            stderr.seek(0)
+            message = stderr.read().decode('utf-8', errors='replace').strip()
+            logger.error(f"数据库备份失败，mysqldump 退出码 {process.returncode}: {message}")
+            # 响应头已发送，只能中断连接
+            raise RuntimeError(f'mysqldump exited with {process.returncode}')
+
+    try:
+        yield from _gzip_chunks(read_output())
+    finally:
+        stderr.close()
+        # 客户端中途断开时结束 mysqldump
+        if process.poll() is None:
+            process.kill()
+            process.wait()
 
 
 @admin_bp.route('/backup/export', methods=['GET'])
 @admin_required
 def export_backup():
-    """导出系统数据库备份"""
-    db_host = 'mysql'
-    db_user = 'user'
-    db_password = 'user'
-    db_name = 'db'
-    
+    """导出系统数据库备份（gzip 压缩的 SQL，边导出边压缩边下载）"""
     try:
-        # 使用 mysqldump 导出
+        args, env, db_name = _mysql_client_args()
+        # 使用 mysqldump 导出；--single-transaction 获取一致性快照且不锁表，--quick 逐行输出不在内存中缓冲
         # 注意: 需要容器内安装 mysql-client
-        cmd = ["mysqldump", "-h", db_host, "-u", db_user, f"-p{db_password}", "--skip-ssl", "--databases", db_name]
-        output = subprocess.check_output(cmd)
-        
-        return send_file(
-            io.BytesIO(output),
-            as_attachment=True,
-            download_name=f'backup_{db_name}_{datetime.now().strftime("%Y%m%d%H%M")}.sql',
-            mimetype='application/sql'
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"Backup failed: {e}")
-        return jsonify({'msg': '数据库导出失败'}), 500
+        cmd = ["mysqldump", *args, "--single-transaction", "--quick", "--databases", db_name]
+        # 错误输出写入临时文件，避免管道写满阻塞 mysqldump
+        stderr = tempfile.TemporaryFile()
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, env=env)
+        except Exception:
+            stderr.close()
+            raise
     except Exception as e:
         print(f"Export error: {e}")
         return jsonify({'msg': f'备份失败: {str(e)}'}), 500
 
+    filename = f'backup_{db_name}_{datetime.now().strftime("%Y%m%d%H%M")}.sql.gz'
+    return Response(
+        _stream_gzip(process, stderr, current_app.logger),
+        mimetype='application/gzip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+@admin_bp.route('/backup/logical', methods=['POST'])
+@admin_required
+def export_logical_backup():
+    """
+    生成并下载逻辑备份（gzip 压缩的 NDJSON），包含 since 之后变更的数据行与 MinIO 附件 ETag 清单
+    会将附件复制到备份桶，因此只接受 POST；since 为空时全量导出，
+    响应头 X-Backup-Until 为本次水位线，作为下一次增量备份的 since
+    """
+    since = request.args.get('since')
+    try:
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({'msg': '无法解析 since，应为 ISO 格式时间'}), 400
+    include_objects = request.args.get('objects', '1') != '0'
+
+    until = datetime.utcnow()
+    kind = 'incremental' if since else 'full'
+    filename = f'backup_logical_{kind}_{until.strftime("%Y%m%d%H%M%S")}.ndjson.gz'
+    return Response(
+        stream_with_context(_gzip_chunks(iter_backup_ndjson(since, until, include_objects))),
+        mimetype='application/gzip',
+        headers={
+            'Content-Disposition': f'attachment; filename={filename}',
+            'X-Backup-Until': until.isoformat(),
+        }
+    )
+
 
 @admin_bp.route('/backup/import', methods=['POST'])
 @admin_required
 def import_backup():
-    """导入系统数据库备份"""
+    """导入系统数据库备份（后台执行，返回任务 ID；支持 gzip / bz2 / xz 压缩文件）"""
     if 'file' not in request.files:
         return jsonify({'msg': '未上传文件'}), 400
     file = request.files['file']
     if not file:
         return jsonify({'msg': '文件为空'}), 400
-        
-    # 保存到临时文件
-    temp = tempfile.NamedTemporaryFile(delete=False)
-    temp_path = temp.name
+
+    # 上传内容分块写入磁盘，恢复在后台线程中进行，不占用请求时间
+    restore_dir = current_app.config['BACKUP_RESTORE_DIR']
+    os.makedirs(restore_dir, exist_ok=True)
+    path = os.path.join(restore_dir, f'{uuid.uuid4().hex}.upload')
     try:
-        file.save(temp_path)
-        temp.close()
-        
-        db_host = 'mysql'
-        db_user = 'user'
-        db_password = 'user'
-        db_name = 'db'
-        
-        # 使用 mysql 命令恢复
-        cmd = f"mysql -h {db_host} -u {db_user} -p{db_password} --skip-ssl {db_name} < {temp_path}"
-        
-        subprocess.check_call(cmd, shell=True)
-        
-        return jsonify({'msg': '恢复成功，数据已重置'}), 200
+        file.save(path)
+        job_id = create_restore_job(path, file.filename or '', int(get_jwt_identity()))
     except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
         return jsonify({'msg': f'恢复失败: {str(e)}'}), 500
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+    if not job_id:
+        os.remove(path)
+        return jsonify({'msg': '已有恢复任务正在执行'}), 409
+
+    return jsonify({'msg': '恢复任务已开始', 'job_id': job_id}), 202
+
+
+def _get_own_restore_job(job_id):
+    """
+    按任务记录校验发起人，不查询数据库：恢复期间 user 表会被删除重建
+    只有管理员能创建恢复任务，因此发起人即已通过管理员校验
+    """
+    job = get_restore_job(job_id)
+    if not job or job['created_by'] != int(get_jwt_identity()):
+        return None
+    return job
+
+
+@admin_bp.route('/backup/import/<job_id>', methods=['GET'])
+@jwt_required()
+def get_import_backup_status(job_id):
+    """查询恢复任务进度"""
+    job = _get_own_restore_job(job_id)
+    if not job:
+        return jsonify({'msg': '任务不存在'}), 404
+    return jsonify(job), 200
+
+
+@admin_bp.route('/backup/import/<job_id>/resume', methods=['POST'])
+@jwt_required()
+def resume_import_backup(job_id):
+    """从第一个未完成的表继续执行失败或中断的恢复任务"""
+    if not _get_own_restore_job(job_id):
+        return jsonify({'msg': '任务不存在'}), 404
+    if not resume_restore_job(job_id):
+        return jsonify({'msg': '任务无法继续（已完成、正在执行或备份文件已删除）'}), 409
+    return jsonify({'msg': '恢复任务已继续', 'job_id': job_id}), 202
 
 
 @admin_bp.route('/monitor/keywords', methods=['GET'])
@@ -351,6 +616,7 @@ def delete_monitor_keyword(id):
     """删除监控关键词"""
     from ..models.models import MonitorKeyword
     keyword = MonitorKeyword.query.get_or_404(id)
+    DocumentFlag.query.filter_by(keyword_id=id).delete(synchronize_session=False)
     db.session.delete(keyword)
     db.session.commit()
     return jsonify({'msg': '删除成功'}), 200
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models.models import ApprovalFlow, User, SystemNotification
+from ..models.models import ApprovalFlow, User
 from ..extensions import db
+from ..utils.notification_service import NotificationService
 from datetime import datetime, timedelta
 
 approval_bp = Blueprint('approval', __name__)
@@ -294,13 +295,12 @@ def update_status(id):
     
     # 创建通知（密码重置类型除外，因为用户登录不进去）
     if approval.type != 'password_reset':
-        notification = SystemNotification(
-            user_id=approval.applicant_id,
-            title="审批结果通知",
-            content=notif_content,
+        NotificationService.notify_user(
+            approval.applicant_id,
+            "审批结果通知",
+            notif_content,
             created_at=datetime.utcnow() + timedelta(hours=8)
         )
-        db.session.add(notification)
     
     
     # 提交更改
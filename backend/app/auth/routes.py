@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
 from ..models.models import User, Role
 from ..extensions import db
+from ..utils.notification_service import NotificationService
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -63,6 +64,8 @@ def register():
         user.role_id = default_role.id
         
     db.session.add(user)
+    db.session.flush()
+    NotificationService.init_read_state(user.id)
     db.session.commit()
     
     return jsonify({"msg": "用户注册成功"}), 201
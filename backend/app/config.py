@@ -38,9 +38,37 @@ class Config:
     # Redis 配置
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
 
+    # Socket.IO 消息队列，多进程部署时经 Redis 转发推送事件；置空则仅在本进程内推送
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', REDIS_URL)
+
+    # 搜索索引发件箱的消费间隔（秒）
+    ES_INDEX_DRAIN_INTERVAL = float(os.environ.get('ES_INDEX_DRAIN_INTERVAL') or 1)
+
+    # 离线文档同步：每批消费条数与空闲时的最长轮询间隔（秒）
+    OFFLINE_SYNC_BATCH_SIZE = int(os.environ.get('OFFLINE_SYNC_BATCH_SIZE') or 500)
+    OFFLINE_SYNC_MAX_INTERVAL = float(os.environ.get('OFFLINE_SYNC_MAX_INTERVAL') or 5)
+
+    # 反馈浏览量 / 点赞计数从 Redis 回写数据库的间隔（秒）
+    FEEDBACK_COUNTER_FLUSH_INTERVAL = float(os.environ.get('FEEDBACK_COUNTER_FLUSH_INTERVAL') or 10)
+
+    # 实时计票推送的合并间隔（毫秒），每个投票在一个间隔内最多推送一次
+    VOTE_TALLY_BROADCAST_INTERVAL = int(os.environ.get('VOTE_TALLY_BROADCAST_INTERVAL') or 500)
+
+    # 检查新增监控关键词并回扫存量文档的间隔（秒）
+    MONITOR_BACKSCAN_INTERVAL = float(os.environ.get('MONITOR_BACKSCAN_INTERVAL') or 10)
+
+    # 后台任务运行方式：embedded 为各 Web 进程竞争主节点、仅主节点运行后台任务；
+    # external 为 Web 进程不运行后台任务，由 scripts/run_background.py 独立进程运行
+    BACKGROUND_RUNTIME = os.environ.get('BACKGROUND_RUNTIME') or 'embedded'
+    # 主节点租约时长与心跳间隔（秒），主节点失联后最多一个租约周期完成切换
+    BACKGROUND_LEASE_TTL = int(os.environ.get('BACKGROUND_LEASE_TTL') or 15)
+    BACKGROUND_HEARTBEAT_INTERVAL = float(os.environ.get('BACKGROUND_HEARTBEAT_INTERVAL') or 5)
+
     # 文件上传配置
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
+    # 待恢复的备份文件存放目录，恢复失败时保留以便继续恢复；由后台运行时执行恢复，需与后台进程共享
+    BACKUP_RESTORE_DIR = os.environ.get('BACKUP_RESTORE_DIR') or os.path.join(UPLOAD_FOLDER, 'restore')
     # Email Configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.qq.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 465)
@@ -1,22 +1,54 @@
+import re
 from datetime import datetime
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, func, literal, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import load_only, undefer
 
 from ..models.models import Document, Folder, User
 from ..extensions import db
 from ..utils.es_service import (
-    delete_document_from_index,
-    index_document,
+    DEFAULT_SEARCH_SIZE,
+    OP_DELETE,
+    SEARCH_SORT,
+    queue_document_delete,
+    queue_document_index,
+    queue_index_operations,
     search_document_ids,
+    search_document_hits,
+    search_documents as search_documents_in_index,
 )
-from ..utils.crypto_service import encrypt_content, decrypt_content
+from ..utils.crypto_service import encrypt_content, decrypt_content, decrypt_contents
+from ..utils.document_flags import refresh_document_flags
 from ..utils.privacy_service import PrivacySpaceService
+from ..utils.redis_service import RedisService
 from ..utils.minio_service import upload_file_to_minio, delete_file_by_url
+from ..utils.pagination import (
+    InvalidCursor,
+    clamp_limit,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    keyset_order_by,
+)
 
 docs_bp = Blueprint('docs', __name__)
 
+# 列表接口返回的内容预览长度（字符）
+PREVIEW_LENGTH = Document.PREVIEW_LENGTH
+# updated_at / created_at 为空时在游标中使用的占位时间
+_CURSOR_EPOCH = datetime(1970, 1, 1)
+# 需与 MySQL 的 ngram_token_size 保持一致（默认 2）
+NGRAM_TOKEN_SIZE = 2
+# BOOLEAN MODE 中有特殊含义的字符，作为普通分隔符处理
+_FULLTEXT_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+# 分页搜索游标的标记，与 keyset 游标区分
+_SEARCH_CURSOR_TAG = 'search'
+# 分页搜索单次请求最多向 ES 取的页数，命中大多不属于当前视图时提前返回
+_SEARCH_MAX_ROUNDS = 5
+
 
 def _parse_datetime(value):
     """将字符串或时间戳解析为 datetime，用于备份恢复保持原时间。"""
@@ -83,28 +115,112 @@ def delete_attachment():
         return jsonify({'msg': '删除失败', 'error': str(exc)}), 500
 
 
-def _build_like_condition(keyword: str):
-    pattern = f"%{keyword}%"
-    return or_(
-        Document.title.ilike(pattern),
-        Document.content.ilike(pattern)
-    )
+def _get_privacy_session_key(user_id):
+    """读取与隐私空间令牌绑定的会话密钥（验证隐私空间密码时派生），不存在时返回 None"""
+    return PrivacySpaceService.get_session_key(user_id, request.headers.get('X-Privacy-Token'))
+
+
+def _decrypt_privacy_rows(rows, privacy_password, privacy_key):
+    """
+    批量解密隐私空间列表的标题与预览，返回 [(doc, title, preview)]
+    尚未生成预览密文的旧文档一次性补查正文，解密后再截取预览
+    """
+    docs = [row[0] for row in rows]
+    previews = [row[1] for row in rows]
+
+    legacy_ids = [doc.id for doc, preview in zip(docs, previews) if preview is None]
+    legacy_contents = {}
+    if legacy_ids:
+        legacy_contents = dict(
+            db.session.query(Document.id, Document.content)
+            .filter(Document.id.in_(legacy_ids))
+            .all()
+        )
+    ciphertexts = [doc.title for doc in docs] + [
+        legacy_contents.get(doc.id) if preview is None else preview
+        for doc, preview in zip(docs, previews)
+    ]
+    plaintexts = decrypt_contents(ciphertexts, privacy_password, key=privacy_key)
+    titles, bodies = plaintexts[:len(docs)], plaintexts[len(docs):]
+
+    entries = []
+    for doc, preview, title, body in zip(docs, previews, titles, bodies):
+        error = title if isinstance(title, Exception) else body if isinstance(body, Exception) else None
+        if error is not None:
+            # 解密失败，显示加密状态提示
+            print(f"[DEBUG] 解密失败 ID={doc.id}: {str(error)}")
+            entries.append((doc, '[加密文档 - 解密失败]', ''))
+            continue
+        entries.append((doc, title, Document.build_preview(body) if preview is None else body))
+    return entries
+
+
+def _build_fulltext_query(keyword: str) -> str:
+    """将关键词转换为 BOOLEAN MODE 查询串。
+
+    每个词拆成 ngram 分词器同样长度的片段并全部要求命中（+片段），保留原先按字拆分的
+    召回效果；不足一个片段长度的词（如中文单字）使用前缀匹配。
+    """
+    terms = _FULLTEXT_OPERATORS.sub(' ', keyword or '').split()
+    parts = []
+    for term in terms:
+        if len(term) < NGRAM_TOKEN_SIZE:
+            parts.append(f'+{term}*')
+            continue
+        grams = dict.fromkeys(term[i:i + NGRAM_TOKEN_SIZE] for i in range(len(term) - NGRAM_TOKEN_SIZE + 1))
+        parts.extend(f'+{gram}' for gram in grams)
+    return ' '.join(parts)
 
 
 def _apply_split_keyword_filter(query, keyword: str):
-    """将关键词拆分为单个字符做模糊匹配，提升中文单字召回率。"""
-    keyword = (keyword or '').strip()
-    if not keyword:
+    """ES 不可用时的降级检索：通过标题与正文上的 FULLTEXT (ngram) 索引匹配关键词。"""
+    fulltext_query = _build_fulltext_query((keyword or '').strip())
+    if not fulltext_query:
         return query
 
-    base_condition = _build_like_condition(keyword)
-    char_conditions = [_build_like_condition(char) for char in keyword if char.strip()]
+    match = text(
+        'MATCH (document.title, document.content) AGAINST (:fulltext_query IN BOOLEAN MODE)'
+    ).bindparams(fulltext_query=fulltext_query)
+    return query.filter(match)
 
-    if not char_conditions:
-        return query.filter(base_condition)
 
-    combined_chars = and_(*char_conditions)
-    return query.filter(or_(base_condition, combined_chars))
+def _decode_search_cursor(cursor):
+    """解析分页搜索游标，返回 ES 的 search_after 排序值；不是搜索游标时返回 None"""
+    try:
+        values = decode_cursor(cursor, len(SEARCH_SORT) + 1)
+    except InvalidCursor:
+        return None
+    return values[1:] if values[0] == _SEARCH_CURSOR_TAG else None
+
+
+def _ranked_search_page(query, keyword, owner_id, page_size, search_after=None):
+    """按 ES 相关度取一页文档，返回 (行, 下一页的 search_after)；ES 不可用或首页无命中时返回 None。
+
+    不属于当前视图（文件夹、回收站等）的命中直接跳过并继续向后取，最多取 _SEARCH_MAX_ROUNDS 页。
+    """
+    first_page = search_after is None
+    rows = []
+    for _ in range(_SEARCH_MAX_ROUNDS):
+        hits = search_document_hits(keyword, owner_id, size=page_size, search_after=search_after)
+        if hits is None:
+            # ES 中途不可用时先返回已取得的结果，下一页再重试
+            return (rows, search_after) if rows else None
+        if not hits:
+            return None if first_page else (rows, None)
+        first_page = False
+
+        row_map = {row[0].id: row for row in query.filter(Document.id.in_([doc_id for doc_id, _ in hits]))}
+        exhausted = len(hits) < page_size
+        for index, (doc_id, sort) in enumerate(hits):
+            search_after = sort
+            if doc_id in row_map:
+                rows.append(row_map[doc_id])
+                if len(rows) == page_size:
+                    is_last = exhausted and index == len(hits) - 1
+                    return rows, None if is_last else search_after
+        if exhausted:
+            return rows, None
+    return rows, search_after
 
 # --- 文件夹相关路由 ---
 
@@ -277,67 +393,105 @@ def get_documents():
             else:
                 query = query.filter_by(folder_id=folder_id)
 
-    if search_query:
-        search_ids = search_document_ids(search_query, current_user_id)
-        if search_ids:
-            query = query.filter(Document.id.in_(search_ids))
-        else:
-            query = _apply_split_keyword_filter(query, search_query)
-    
     # 排序字段保护，防止非法字段造成 SQL 注入
     if sort_by not in ['created_at', 'updated_at']:
         sort_by = 'updated_at'
-        
-    sort_column = getattr(Document, sort_by)
-    if order == 'desc':
-        sort_column = sort_column.desc()
+
+    # 传入 limit 或 cursor 时启用游标分页，返回 {items, next_cursor}；否则保持原有的全量列表
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    paginated = limit is not None or bool(cursor)
+    show_pinned_first = not is_recycle_bin and not in_privacy_space
+
+    # 隐私空间读取单独加密的预览密文；其余视图读取预览列，
+    # 尚未回填 preview 的旧数据在 SQL 中截取片段，正文始终不会被加载
+    if in_privacy_space:
+        query = query.add_columns(Document.preview, literal(False))
     else:
-        sort_column = sort_column.asc()
-        
-    # 置顶逻辑：普通视图中将置顶文档优先展示，其余视图使用单一排序字段
-    if not is_recycle_bin and not in_privacy_space:
-        query = query.order_by(Document.is_pinned.desc(), sort_column)
+        query = query.add_columns(
+            func.coalesce(Document.preview, func.substr(Document.content, 1, PREVIEW_LENGTH)),
+            and_(Document.preview.is_(None), func.char_length(Document.content) > PREVIEW_LENGTH)
+        )
+
+    ranked = None
+    if paginated:
+        page_size = clamp_limit(limit)
+        if search_query:
+            # 分页搜索按 ES 相关度翻页，游标中保存 search_after 排序值；
+            # ES 不可用或首页无命中时回退数据库模糊匹配，按 keyset 翻页
+            search_after = _decode_search_cursor(cursor) if cursor else None
+            if search_after is not None or not cursor:
+                ranked = _ranked_search_page(query, search_query, current_user_id, page_size, search_after)
+                if ranked is None and search_after is not None:
+                    return jsonify({'msg': '搜索服务暂不可用，请稍后重试'}), 503
+            if ranked is None:
+                query = _apply_split_keyword_filter(query, search_query)
+
+    if ranked is not None:
+        rows, next_search_after = ranked
+    elif paginated:
+        # keyset: (is_pinned, 排序字段, id)，id 作为唯一列保证翻页稳定
+        descending = order == 'desc'
+        keyset = []
+        if show_pinned_first:
+            keyset.append((func.coalesce(Document.is_pinned, False), True))
+        keyset.append((func.coalesce(getattr(Document, sort_by), _CURSOR_EPOCH), descending))
+        keyset.append((Document.id, descending))
+
+        if cursor:
+            try:
+                cursor_values = decode_cursor(cursor, len(keyset))
+            except InvalidCursor:
+                return jsonify({'msg': '无效的分页游标'}), 400
+            query = query.filter(keyset_condition(keyset, cursor_values))
+        rows = query.order_by(*keyset_order_by(keyset)).limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
     else:
-        query = query.order_by(sort_column)
-        
-    docs = query.all()
-    print(f"[DEBUG] 查询返回文档数量: {len(docs)}")
+        if search_query:
+            search_ids = search_document_ids(search_query, current_user_id)
+            if search_ids:
+                query = query.filter(Document.id.in_(search_ids))
+            else:
+                query = _apply_split_keyword_filter(query, search_query)
+
+        sort_column = getattr(Document, sort_by)
+        if order == 'desc':
+            sort_column = sort_column.desc()
+        else:
+            sort_column = sort_column.asc()
+
+        # 置顶逻辑：普通视图中将置顶文档优先展示，其余视图使用单一排序字段
+        if show_pinned_first:
+            query = query.order_by(Document.is_pinned.desc(), sort_column)
+        else:
+            query = query.order_by(sort_column)
+        rows = query.all()
 
-    if search_ids:
-        doc_map = {doc.id: doc for doc in docs}
-        ordered_docs = [doc_map[doc_id] for doc_id in search_ids if doc_id in doc_map]
-        docs = ordered_docs
+        if search_ids:
+            row_map = {row[0].id: row for row in rows}
+            rows = [row_map[doc_id] for doc_id in search_ids if doc_id in row_map]
+    print(f"[DEBUG] 查询返回文档数量: {len(rows)}")
     
     # 构建返回数据，如果是隐私空间文档需要解密
     result = []
     privacy_password = request.args.get('_privacy_password') if in_privacy_space else None
+    privacy_key = _get_privacy_session_key(current_user_id) if in_privacy_space else None
     
     if in_privacy_space:
         print(f"[DEBUG] 隐私空间查询 - 密码参数: {'已提供' if privacy_password else '未提供'}")
+        if privacy_key or privacy_password:
+            entries = _decrypt_privacy_rows(rows, privacy_password, privacy_key)
+        else:
+            print(f"[DEBUG] 隐私空间查询未提供密码，返回密文")
+            entries = [(doc, doc.title, preview) for doc, preview, _ in rows]
+    else:
+        entries = [
+            (doc, doc.title, content + '...' if content and truncated else content)
+            for doc, content, truncated in rows
+        ]
     
-    for doc in docs:
-        title = doc.title
-        content = doc.content
-        
-        # 如果是隐私空间文档，解密标题和内容
-        if doc.in_privacy_space and privacy_password:
-            try:
-                print(f"[DEBUG] 尝试解密文档 ID={doc.id}, 标题长度={len(title)}")
-                title = decrypt_content(title, privacy_password)
-                if content:
-                    content = decrypt_content(content, privacy_password)
-                print(f"[DEBUG] 解密成功 - 标题: {title[:20]}...")
-            except Exception as e:
-                # 解密失败，显示加密状态提示
-                print(f"[DEBUG] 解密失败 ID={doc.id}: {str(e)}")
-                title = '[加密文档 - 解密失败]'
-                content = ''
-        elif doc.in_privacy_space and not privacy_password:
-            print(f"[DEBUG] 文档 ID={doc.id} 是隐私文档但未提供密码")
-        
-        # 内容预览
-        content_preview = content[:200] + '...' if content and len(content) > 200 else content
-        
+    for doc, title, content_preview in entries:
         result.append({
             'id': doc.id,
             'title': title,
@@ -348,6 +502,19 @@ def get_documents():
             'folder_id': doc.folder_id,
             'deleted_at': doc.deleted_at
         })
+
+    if paginated:
+        next_cursor = None
+        if ranked is not None:
+            if next_search_after:
+                next_cursor = encode_cursor([_SEARCH_CURSOR_TAG, *next_search_after])
+        elif has_more and rows:
+            last = rows[-1][0]
+            cursor_values = [getattr(last, sort_by) or _CURSOR_EPOCH, last.id]
+            if show_pinned_first:
+                cursor_values.insert(0, bool(last.is_pinned))
+            next_cursor = encode_cursor(cursor_values)
+        return jsonify({'items': result, 'next_cursor': next_cursor}), 200
     
     return jsonify(result), 200
 
@@ -356,7 +523,6 @@ def get_documents():
 def create_document():
     """创建新文档"""
     current_user_id = int(get_jwt_identity())
-    user = User.query.get_or_404(current_user_id)
     data = request.get_json()
     
     is_privacy = data.get('in_privacy_space', False)
@@ -366,6 +532,7 @@ def create_document():
     created_at = _parse_datetime(data.get('created_at'))
     updated_at = _parse_datetime(data.get('updated_at'))
     attachments = data.get('attachments') or []
+    preview = Document.build_preview(content)
     
     # 如果是隐私空间文档，需要验证令牌并加密内容
     if is_privacy:
@@ -374,25 +541,28 @@ def create_document():
             return jsonify({'msg': '隐私空间访问令牌无效或已过期'}), 401
         
         # 使用用户的隐私空间密码加密内容
+        user = User.query.get_or_404(current_user_id)
         if not user.privacy_password_hash:
             return jsonify({'msg': '尚未设置隐私空间密码'}), 400
         
-        # 这里我们需要临时存储密码用于加密，实际上应该在验证时传递
-        # 为简化，我们使用用户 ID 作为加密密钥的一部分
-        # 更安全的做法是在验证时返回派生密钥
-        privacy_password = data.get('_privacy_password')  # 前端在创建时需要传递
-        if not privacy_password:
+        # 优先使用验证密码时派生的会话密钥（v2 格式），仅在会话密钥失效时回退为密码加密
+        privacy_password = data.get('_privacy_password')
+        privacy_key = _get_privacy_session_key(current_user_id)
+        if not privacy_key and not privacy_password:
             return jsonify({'msg': '创建隐私文档需要提供密码'}), 400
         
         try:
-            title = encrypt_content(title, privacy_password)
-            content = encrypt_content(content, privacy_password)
+            title = encrypt_content(title, privacy_password, key=privacy_key)
+            content = encrypt_content(content, privacy_password, key=privacy_key)
+            # 预览单独加密，列表页只需解密预览而不必解密整篇正文
+            preview = encrypt_content(preview, privacy_password, key=privacy_key)
         except Exception as e:
             return jsonify({'msg': '加密失败', 'error': str(e)}), 500
     
     doc = Document(
         title=title,
         content=content,
+        preview=preview,
         owner_id=current_user_id,
         folder_id=data.get('folder_id'),
         in_privacy_space=is_privacy,
@@ -406,10 +576,31 @@ def create_document():
     
     try:
         db.session.add(doc)
+        db.session.flush()
+        # 写入时按监控关键词标记，管理员监控页无需全量扫描
+        refresh_document_flags([(doc.id, doc.content)])
         db.session.commit()
         if not is_privacy:  # 隐私文档不索引到 ES
-            index_document(doc)
+            queue_document_index(doc.id)
         return jsonify({'id': doc.id, 'msg': '文档创建成功'}), 201
+    except OperationalError as e:
+        db.session.rollback()
+        print(f"数据库不可用，转存离线队列: {e}")
+        # 数据库恢复后由同步线程按幂等键落库
+        offline_key = RedisService.save_offline_document(current_user_id, {
+            'title': title,
+            'content': content,
+            'preview': preview,
+            'folder_id': data.get('folder_id'),
+            'in_privacy_space': is_privacy,
+            'is_pinned': is_pinned,
+            'attachments': attachments,
+            'created_at': created_at.isoformat() if created_at else None,
+            'updated_at': updated_at.isoformat() if updated_at else None,
+        })
+        if offline_key:
+            return jsonify({'offline_key': offline_key, 'msg': '数据库暂不可用，文档已离线保存，恢复后自动同步'}), 202
+        return jsonify({'msg': '保存失败'}), 500
     except Exception as e:
         db.session.rollback()
         print(f"数据库错误: {e}")
@@ -433,17 +624,18 @@ def get_document(id):
     # 如果是隐私空间文档，需要验证令牌并解密
     if doc.in_privacy_space:
         privacy_token = request.headers.get('X-Privacy-Token')
-        privacy_password = request.args.get('_privacy_password')  # 或通过其他方式传递
+        privacy_password = request.args.get('_privacy_password')  # 仅旧格式密文需要
         
         if not privacy_token or not PrivacySpaceService.verify_access_token(current_user_id, privacy_token):
             return jsonify({'msg': '隐私空间访问令牌无效或已过期'}), 401
         
-        if not privacy_password:
+        privacy_key = _get_privacy_session_key(current_user_id)
+        if not privacy_key and not privacy_password:
             return jsonify({'msg': '访问隐私文档需要提供密码'}), 400
         
         try:
-            title = decrypt_content(title, privacy_password)
-            content = decrypt_content(content, privacy_password)
+            title = decrypt_content(title, privacy_password, key=privacy_key)
+            content = decrypt_content(content, privacy_password, key=privacy_key)
         except Exception as e:
             return jsonify({'msg': '解密失败，密码可能不正确', 'error': str(e)}), 400
     
@@ -481,28 +673,37 @@ def update_document(id):
         try:
             db.session.commit()
             if not doc.in_privacy_space:
-                index_document(doc)
+                queue_document_index(doc.id)
             return jsonify({'msg': '文档已恢复'}), 200
         except Exception as e:
             db.session.rollback()
             return jsonify({'msg': '恢复失败', 'error': str(e)}), 500
     
-    # 如果文档在隐私空间，更新时需要重新加密
-    if doc.in_privacy_space:
+    # 按更新后所在的空间决定是否加密：移入隐私空间的新内容需要加密，移出隐私空间的新内容保存明文
+    was_privacy = doc.in_privacy_space
+    to_privacy = bool(data['in_privacy_space']) if 'in_privacy_space' in data else was_privacy
+    has_new_text = 'title' in data or 'content' in data
+
+    if was_privacy or (to_privacy and has_new_text):
         privacy_token = request.headers.get('X-Privacy-Token')
         privacy_password = data.get('_privacy_password')
         
         if not privacy_token or not PrivacySpaceService.verify_access_token(current_user_id, privacy_token):
             return jsonify({'msg': '隐私空间访问令牌无效或已过期'}), 401
         
-        if not privacy_password:
+        privacy_key = _get_privacy_session_key(current_user_id)
+        if not privacy_key and not privacy_password:
             return jsonify({'msg': '更新隐私文档需要提供密码'}), 400
-        
+
+    if to_privacy:
         try:
             if 'title' in data:
-                doc.title = encrypt_content(data['title'], privacy_password)
+                doc.title = encrypt_content(data['title'], privacy_password, key=privacy_key)
             if 'content' in data:
-                doc.content = encrypt_content(data['content'], privacy_password)
+                doc.content = encrypt_content(data['content'], privacy_password, key=privacy_key)
+                doc.preview = encrypt_content(
+                    Document.build_preview(data['content']), privacy_password, key=privacy_key
+                )
         except Exception as e:
             return jsonify({'msg': '加密失败', 'error': str(e)}), 500
     else:
@@ -510,6 +711,7 @@ def update_document(id):
             doc.title = data['title']
         if 'content' in data:
             doc.content = data['content']
+            doc.preview = Document.build_preview(data['content'])
     
     if 'folder_id' in data:
         doc.folder_id = data['folder_id']
@@ -537,13 +739,20 @@ def update_document(id):
     if updated_at:
         doc.updated_at = updated_at
         
-    if 'in_privacy_space' in data:
-        doc.in_privacy_space = data['in_privacy_space']
+    doc.in_privacy_space = to_privacy
+
+    # 列表预览已在上方随新正文生成（隐私文档为密文）；仅切换空间而未提供明文时，
+    # 现有正文的形式与目标空间不符，无法生成预览，置空后由列表接口回退
+    if 'content' not in data and was_privacy != to_privacy:
+        doc.preview = None
+
+    if 'content' in data:
+        refresh_document_flags([(doc.id, doc.content)])
     
     try:
         db.session.commit()
-        if not doc.in_privacy_space:
-            index_document(doc)
+        # 移入隐私空间的文档会在消费发件箱时从索引中删除
+        queue_document_index(doc.id)
         return jsonify({'msg': '文档更新成功'}), 200
     except Exception as e:
         db.session.rollback()
@@ -583,7 +792,7 @@ def delete_document(id):
             
             db.session.delete(doc)
             db.session.commit()
-            delete_document_from_index(doc.id)
+            queue_document_delete(doc.id)
             return jsonify({'msg': '文档已彻底删除'}), 200
         except Exception as e:
             db.session.rollback()
@@ -594,7 +803,7 @@ def delete_document(id):
         doc.deleted_at = datetime.utcnow()
         try:
             db.session.commit()
-            delete_document_from_index(doc.id)
+            queue_document_delete(doc.id)
             return jsonify({'msg': '文档已移入回收站'}), 200
         except Exception as e:
             db.session.rollback()
@@ -607,7 +816,8 @@ def clear_recycle_bin():
     current_user_id = int(get_jwt_identity())
     try:
         # 保留将被清理的文档 ID 和附件，以便在清空数据库记录后同步清除
-        recycled_docs = Document.query.filter_by(owner_id=current_user_id, is_deleted=True).all()
+        recycled_docs = Document.query.options(undefer(Document.content))\
+            .filter_by(owner_id=current_user_id, is_deleted=True).all()
         doc_ids = [doc.id for doc in recycled_docs]
         
         # 收集所有附件 URL
@@ -627,8 +837,7 @@ def clear_recycle_bin():
         
         Document.query.filter_by(owner_id=current_user_id, is_deleted=True).delete(synchronize_session=False)
         db.session.commit()
-        for doc_id in doc_ids:
-            delete_document_from_index(doc_id)
+        queue_index_operations({doc_id: OP_DELETE for doc_id in doc_ids})
         return jsonify({'msg': '回收站已清空'}), 200
     except Exception as e:
         db.session.rollback()
@@ -637,33 +846,85 @@ def clear_recycle_bin():
 @docs_bp.route('/search', methods=['GET'])
 @jwt_required()
 def search_documents():
-    """搜索文档"""
+    """搜索文档（传入 limit/cursor 时分页返回 {items, total, next_cursor}）"""
     keyword = (request.args.get('q') or '').strip()
     current_user_id = int(get_jwt_identity())
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    paginated = limit is not None or bool(cursor)
 
     if not keyword:
-        return jsonify([]), 200
+        return jsonify({'items': [], 'total': 0, 'next_cursor': None} if paginated else []), 200
+
+    page_size = clamp_limit(limit) if paginated else None
 
-    # 优先通过 Elasticsearch 获取匹配的文档 ID，若 ES 不可用则回退数据库模糊匹配
-    search_ids = search_document_ids(keyword, current_user_id)
-    query = Document.query.filter(
+    # 优先由 Elasticsearch 直接返回排序、高亮与分页结果，无需回查数据库
+    search_after = None
+    if cursor:
+        try:
+            search_after = decode_cursor(cursor, len(SEARCH_SORT))
+        except InvalidCursor:
+            search_after = None
+    if not cursor or search_after is not None:
+        result = search_documents_in_index(
+            keyword, current_user_id,
+            size=page_size or DEFAULT_SEARCH_SIZE,
+            search_after=search_after
+        )
+        if result is not None:
+            items = [{
+                'id': hit['id'],
+                'title': hit['title'],
+                'updated_at': hit['updated_at'],
+                'highlight': hit['highlight']
+            } for hit in result['hits']]
+            if not paginated:
+                return jsonify(items), 200
+            next_cursor = None
+            if result['sort'] and len(items) == page_size:
+                next_cursor = encode_cursor(result['sort'])
+            return jsonify({'items': items, 'total': result['total'], 'next_cursor': next_cursor}), 200
+
+    # ES 不可用时回退数据库模糊匹配，按 (updated_at, id) 倒序做 keyset 翻页
+    query = Document.query.options(load_only(Document.id, Document.title, Document.updated_at)).filter(
         Document.owner_id == current_user_id,
         Document.is_deleted == False
     )
+    query = _apply_split_keyword_filter(query, keyword)
 
-    if search_ids:
-        query = query.filter(Document.id.in_(search_ids))
-    else:
-        query = _apply_split_keyword_filter(query, keyword)
-
-    docs = query.order_by(Document.updated_at.desc()).all()
+    if not paginated:
+        docs = query.order_by(Document.updated_at.desc()).all()
+        return jsonify([{
+            'id': doc.id,
+            'title': doc.title,
+            'updated_at': doc.updated_at,
+            'highlight': None
+        } for doc in docs]), 200
+
+    keyset = [
+        (func.coalesce(Document.updated_at, _CURSOR_EPOCH), True),
+        (Document.id, True),
+    ]
+    total = query.count()
+    if cursor:
+        try:
+            cursor_values = decode_cursor(cursor, len(keyset))
+        except InvalidCursor:
+            return jsonify({'msg': '无效的分页游标'}), 400
+        query = query.filter(keyset_condition(keyset, cursor_values))
+    docs = query.order_by(*keyset_order_by(keyset)).limit(page_size + 1).all()
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = encode_cursor([docs[-1].updated_at or _CURSOR_EPOCH, docs[-1].id])
 
-    if search_ids:
-        doc_map = {doc.id: doc for doc in docs}
-        docs = [doc_map[doc_id] for doc_id in search_ids if doc_id in doc_map]
-    
-    return jsonify([{
-        'id': doc.id,
-        'title': doc.title,
-        'updated_at': doc.updated_at
-    } for doc in docs]), 200
+    return jsonify({
+        'items': [{
+            'id': doc.id,
+            'title': doc.title,
+            'updated_at': doc.updated_at,
+            'highlight': None
+        } for doc in docs],
+        'total': total,
+        'next_cursor': next_cursor
+    }), 200
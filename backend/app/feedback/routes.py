@@ -1,11 +1,28 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models.models import Feedback, FeedbackReply, User, SystemNotification, FeedbackLike, FeedbackReplyLike
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import defer, joinedload
+from ..models.models import Feedback, FeedbackReply, User, FeedbackLike, FeedbackReplyLike
 from ..extensions import db
+from ..utils.feedback_counters import FeedbackCounters
+from ..utils.notification_service import NotificationService
+from ..utils.pagination import (
+    InvalidCursor,
+    clamp_limit,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    keyset_order_by,
+)
 from datetime import datetime, timedelta
 
 feedback_bp = Blueprint('feedback', __name__)
 
+# 列表页内容摘要长度
+PREVIEW_LENGTH = 100
+# created_at 为空的旧数据在游标中的占位值
+_CURSOR_EPOCH = datetime(1970, 1, 1)
+
 @feedback_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_feedbacks():
@@ -20,33 +37,76 @@ def get_feedbacks():
         
     if keyword:
         query = query.filter(Feedback.title.contains(keyword) | Feedback.content.contains(keyword))
-        
-    feedbacks = query.order_by(Feedback.created_at.desc()).all()
+
     current_user_id = int(get_jwt_identity())
-    
+
+    # 传入 limit 或 cursor 时启用游标分页，返回 {items, next_cursor}；否则保持原有的全量列表
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    paginated = limit is not None or bool(cursor)
+
+    keyset = [
+        (func.coalesce(Feedback.created_at, _CURSOR_EPOCH), True),
+        (Feedback.id, True),
+    ]
+    if cursor:
+        try:
+            cursor_values = decode_cursor(cursor, len(keyset))
+        except InvalidCursor:
+            return jsonify({'msg': '无效的分页游标'}), 400
+        query = query.filter(keyset_condition(keyset, cursor_values))
+
+    # 计数取自冗余列，作者随主查询 JOIN 加载，是否点赞用相关子查询判断，
+    # 正文只在 SQL 中截取摘要，整页只需一条查询
+    is_liked_expr = select(FeedbackLike.id).where(and_(
+        FeedbackLike.feedback_id == Feedback.id,
+        FeedbackLike.user_id == current_user_id
+    )).exists()
+    query = query.options(joinedload(Feedback.user), defer(Feedback.content)).add_columns(
+        func.substr(Feedback.content, 1, PREVIEW_LENGTH),
+        func.char_length(Feedback.content) > PREVIEW_LENGTH,
+        is_liked_expr
+    ).order_by(*keyset_order_by(keyset))
+
+    if paginated:
+        page_size = clamp_limit(limit)
+        rows = query.limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+    else:
+        rows = query.all()
+
+    # 浏览量与点赞以 Redis 中尚未回写的数据为准，整页一次往返
+    feedback_ids = [row[0].id for row in rows]
+    pending_views = FeedbackCounters.pending_views(feedback_ids)
+    like_states = FeedbackCounters.like_states('feedback', feedback_ids, current_user_id)
+
     result = []
-    for f in feedbacks:
-        reply_count = FeedbackReply.query.filter_by(feedback_id=f.id).count()
-        last_reply = FeedbackReply.query.filter_by(feedback_id=f.id).order_by(FeedbackReply.created_at.desc()).first()
-        like_count = FeedbackLike.query.filter_by(feedback_id=f.id).count()
-        is_liked = FeedbackLike.query.filter_by(feedback_id=f.id, user_id=current_user_id).first() is not None
-        
+    for f, content, truncated, is_liked in rows:
+        like_count, is_liked = like_states.get(f.id, (f.like_count, bool(is_liked)))
         result.append({
             'id': f.id,
             'title': f.title,
-            'content': f.content[:100] + '...' if len(f.content) > 100 else f.content,
+            'content': content + '...' if truncated else content,
             'category': f.category,
             'user_id': f.user_id,
             'username': f.user.username,
             'avatar': f.user.avatar,
             'created_at': f.created_at.isoformat(),
-            'view_count': f.view_count,
-            'reply_count': reply_count,
-            'last_reply_at': last_reply.created_at.isoformat() if last_reply else None,
+            'view_count': (f.view_count or 0) + pending_views.get(f.id, 0),
+            'reply_count': f.reply_count,
+            'last_reply_at': f.last_reply_at.isoformat() if f.last_reply_at else None,
             'like_count': like_count,
             'is_liked': is_liked
         })
-        
+
+    if paginated:
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1][0]
+            next_cursor = encode_cursor([last.created_at or _CURSOR_EPOCH, last.id])
+        return jsonify({'items': result, 'next_cursor': next_cursor}), 200
+
     return jsonify(result), 200
 
 @feedback_bp.route('/', methods=['POST'])
@@ -87,15 +147,44 @@ def get_feedback_detail(id):
     
     current_user_id = int(get_jwt_identity())
 
-    # 增加浏览量
-    feedback.view_count += 1
-    db.session.commit()
+    # 浏览量累加在 Redis 中，由后台定时回写，阅读不再锁 feedback 行；Redis 不可用时直接写库
+    pending_views = FeedbackCounters.record_view(id)
+    if pending_views is None:
+        Feedback.query.filter_by(id=id).update(
+            {Feedback.view_count: func.coalesce(Feedback.view_count, 0) + 1},
+            synchronize_session=False
+        )
+        db.session.commit()
+        pending_views = 0
     
-    replies = FeedbackReply.query.filter_by(feedback_id=id).order_by(FeedbackReply.created_at.asc()).all()
+    replies = FeedbackReply.query.options(joinedload(FeedbackReply.user)) \
+        .filter_by(feedback_id=id).order_by(FeedbackReply.created_at.asc()).all()
+
+    # 回复点赞数与当前用户的点赞状态各用一条分组 / 批量查询取回
+    reply_ids = [r.id for r in replies]
+    reply_like_counts = {}
+    liked_reply_ids = set()
+    if reply_ids:
+        reply_like_counts = dict(
+            db.session.query(FeedbackReplyLike.reply_id, func.count(FeedbackReplyLike.id))
+            .filter(FeedbackReplyLike.reply_id.in_(reply_ids))
+            .group_by(FeedbackReplyLike.reply_id)
+            .all()
+        )
+        liked_reply_ids = {
+            reply_id for (reply_id,) in db.session.query(FeedbackReplyLike.reply_id).filter(
+                FeedbackReplyLike.reply_id.in_(reply_ids),
+                FeedbackReplyLike.user_id == current_user_id
+            )
+        }
+
+    reply_like_states = FeedbackCounters.like_states('reply', reply_ids, current_user_id)
+
     replies_data = []
     for r in replies:
-        is_liked_reply = FeedbackReplyLike.query.filter_by(reply_id=r.id, user_id=current_user_id).first() is not None
-        like_count_reply = FeedbackReplyLike.query.filter_by(reply_id=r.id).count()
+        like_count_reply, is_liked_reply = reply_like_states.get(
+            r.id, (reply_like_counts.get(r.id, 0), r.id in liked_reply_ids)
+        )
         replies_data.append({
             'id': r.id,
             'content': r.content,
@@ -108,8 +197,12 @@ def get_feedback_detail(id):
             'is_liked': is_liked_reply
         })
         
-    is_liked = FeedbackLike.query.filter_by(feedback_id=id, user_id=current_user_id).first() is not None
-    like_count = FeedbackLike.query.filter_by(feedback_id=id).count()
+    like_state = FeedbackCounters.like_states('feedback', [id], current_user_id).get(id)
+    if like_state:
+        like_count, is_liked = like_state
+    else:
+        is_liked = FeedbackLike.query.filter_by(feedback_id=id, user_id=current_user_id).first() is not None
+        like_count = feedback.like_count
 
     return jsonify({
         'id': feedback.id,
@@ -120,7 +213,7 @@ def get_feedback_detail(id):
         'username': feedback.user.username,
         'avatar': feedback.user.avatar,
         'created_at': feedback.created_at.isoformat(),
-        'view_count': feedback.view_count,
+        'view_count': (feedback.view_count or 0) + pending_views,
         'replies': replies_data,
         'like_count': like_count,
         'is_liked': is_liked
@@ -148,15 +241,19 @@ def create_reply(id):
         created_at=datetime.utcnow() + timedelta(hours=8)
     )
     db.session.add(reply)
+    # 计数在数据库侧原子累加，与回复写入同一事务提交
+    Feedback.query.filter_by(id=id).update({
+        Feedback.reply_count: Feedback.reply_count + 1,
+        Feedback.last_reply_at: func.greatest(func.coalesce(Feedback.last_reply_at, reply.created_at), reply.created_at)
+    }, synchronize_session=False)
     
     if feedback.user_id != current_user_id:
-        notification = SystemNotification(
-            user_id=feedback.user_id,
-            title="您的反馈有新回复",
-            content=f"用户 {reply_user.username} 回复了您的帖子: {feedback.title}",
+        NotificationService.notify_user(
+            feedback.user_id,
+            "您的反馈有新回复",
+            f"用户 {reply_user.username} 回复了您的帖子: {feedback.title}",
             created_at=datetime.utcnow() + timedelta(hours=8)
         )
-        db.session.add(notification)
         
     db.session.commit()
     
@@ -185,8 +282,11 @@ def delete_feedback(id):
     if user.role != 'admin' and feedback.user_id !=current_user_id:
         return jsonify({'msg': '无权限删除'}), 403
         
+    reply_ids = [reply_id for (reply_id,) in db.session.query(FeedbackReply.id).filter_by(feedback_id=id)]
     db.session.delete(feedback)
     db.session.commit()
+    FeedbackCounters.discard('feedback', [id])
+    FeedbackCounters.discard('reply', reply_ids)
     return jsonify({'msg': '删除成功'}), 200
 
 @feedback_bp.route('/reply/<int:id>', methods=['DELETE'])
@@ -200,8 +300,18 @@ def delete_reply(id):
     if user.role != 'admin' and reply.user_id != current_user_id:
         return jsonify({'msg': '无权限删除'}), 403
         
+    feedback_id = reply.feedback_id
     db.session.delete(reply)
+    db.session.flush()
+    # 删除后重新取剩余回复中的最晚时间，计数原子递减
+    last_reply_at = select(func.max(FeedbackReply.created_at)) \
+        .where(FeedbackReply.feedback_id == feedback_id).scalar_subquery()
+    Feedback.query.filter_by(id=feedback_id).update({
+        Feedback.reply_count: func.greatest(Feedback.reply_count - 1, 0),
+        Feedback.last_reply_at: last_reply_at
+    }, synchronize_session=False)
     db.session.commit()
+    FeedbackCounters.discard('reply', [id])
     return jsonify({'msg': '删除成功'}), 200
 
 @feedback_bp.route('/<int:id>/like', methods=['POST'])
@@ -209,19 +319,15 @@ def delete_reply(id):
 def toggle_like_feedback(id):
     """帖子点赞/取消"""
     current_user_id = int(get_jwt_identity())
-    feedback = Feedback.query.get_or_404(id)
-    
-    like = FeedbackLike.query.filter_by(user_id=current_user_id, feedback_id=id).first()
-    if like:
-        db.session.delete(like)
-        is_liked = False
-    else:
-        new_like = FeedbackLike(user_id=current_user_id, feedback_id=id)
-        db.session.add(new_like)
-        is_liked = True
-        
-    db.session.commit()
-    like_count = FeedbackLike.query.filter_by(feedback_id=id).count()
+    Feedback.query.get_or_404(id)
+
+    # 点赞记录在 Redis 集合中切换，点赞表与 like_count 由后台定时回写；
+    # Redis 不可用时不回退到数据库（恢复后 Redis 中的旧集合会覆盖期间的变更），直接返回 503
+    try:
+        is_liked, like_count = FeedbackCounters.toggle_like('feedback', id, current_user_id)
+    except Exception as e:
+        print(f"帖子点赞失败 {id}: {e}")
+        return jsonify({'msg': '操作失败，请稍后重试'}), 503
     return jsonify({'is_liked': is_liked, 'like_count': like_count}), 200
 
 @feedback_bp.route('/reply/<int:id>/like', methods=['POST'])
@@ -229,17 +335,11 @@ def toggle_like_feedback(id):
 def toggle_like_reply(id):
     """回复点赞/取消"""
     current_user_id = int(get_jwt_identity())
-    reply = FeedbackReply.query.get_or_404(id)
-    
-    like = FeedbackReplyLike.query.filter_by(user_id=current_user_id, reply_id=id).first()
-    if like:
-        db.session.delete(like)
-        is_liked = False
-    else:
-        new_like = FeedbackReplyLike(user_id=current_user_id, reply_id=id)
-        db.session.add(new_like)
-        is_liked = True
-        
-    db.session.commit()
-    like_count = FeedbackReplyLike.query.filter_by(reply_id=id).count()
+    FeedbackReply.query.get_or_404(id)
+
+    try:
+        is_liked, like_count = FeedbackCounters.toggle_like('reply', id, current_user_id)
+    except Exception as e:
+        print(f"回复点赞失败 {id}: {e}")
+        return jsonify({'msg': '操作失败，请稍后重试'}), 503
     return jsonify({'is_liked': is_liked, 'like_count': like_count}), 200
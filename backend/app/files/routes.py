@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.models import FileCenterFile, FileCenterFolder, User
 from ..extensions import db
 from ..utils.storage import storage_client
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased, joinedload
 import uuid
 import os
 from datetime import datetime, timedelta
@@ -10,19 +12,24 @@ from datetime import datetime, timedelta
 files_bp = Blueprint('files', __name__)
 import requests
 
-def calculate_folder_size(folder):
-    """Calculates folder size recursively"""
-    total_size = 0
-    # Files in current folder
-    for f in folder.files:
-        if f.size:
-            total_size += f.size
-            
-    # Subfolders
-    for sub in folder.subfolders:
-        total_size += calculate_folder_size(sub)
-        
-    return total_size
+def folder_tree_cte(*root_filter):
+    """递归 CTE (root_id, folder_id)：root_filter 选出的每个文件夹及其全部子孙文件夹"""
+    tree = select(FileCenterFolder.id.label('root_id'), FileCenterFolder.id.label('folder_id')) \
+        .where(*root_filter) \
+        .cte('folder_tree', recursive=True)
+    child = aliased(FileCenterFolder)
+    return tree.union_all(
+        select(tree.c.root_id, child.id).where(child.parent_id == tree.c.folder_id)
+    )
+
+def folder_sizes_subquery(*root_filter):
+    """按文件夹汇总其子树下全部文件的大小，一条 SQL 完成 (root_id, size)"""
+    tree = folder_tree_cte(*root_filter)
+    return select(tree.c.root_id, func.coalesce(func.sum(FileCenterFile.size), 0).label('size')) \
+        .select_from(tree) \
+        .outerjoin(FileCenterFile, FileCenterFile.folder_id == tree.c.folder_id) \
+        .group_by(tree.c.root_id) \
+        .subquery()
 
 @files_bp.route('/list', methods=['GET'])
 @jwt_required()
@@ -33,12 +40,17 @@ def list_files():
     
     parent_id = request.args.get('parent_id', type=int) # None 表示根目录
     
-    # 文件夹
-    folders_query = FileCenterFolder.query.filter_by(parent_id=parent_id)
-    folders = folders_query.order_by(FileCenterFolder.created_at.desc()).all()
+    # 文件夹，大小由递归 CTE 在同一条查询中汇总
+    sizes = folder_sizes_subquery(FileCenterFolder.parent_id == parent_id)
+    folders = db.session.query(FileCenterFolder, sizes.c.size) \
+        .options(joinedload(FileCenterFolder.creator)) \
+        .outerjoin(sizes, sizes.c.root_id == FileCenterFolder.id) \
+        .filter(FileCenterFolder.parent_id == parent_id) \
+        .order_by(FileCenterFolder.created_at.desc()) \
+        .all()
     
     # 文件
-    files_query = FileCenterFile.query.filter_by(folder_id=parent_id)
+    files_query = FileCenterFile.query.options(joinedload(FileCenterFile.uploader)).filter_by(folder_id=parent_id)
     files = files_query.order_by(FileCenterFile.created_at.desc()).all()
     
     return jsonify({
@@ -47,8 +59,8 @@ def list_files():
             'name': f.name,
             'creator': f.creator.username,
             'created_at': f.created_at.isoformat(),
-            'size': calculate_folder_size(f) # Add calculated size
-        } for f in folders],
+            'size': int(size or 0)
+        } for f, size in folders],
         'files': [{
             'id': f.id,
             'name': f.name,
@@ -168,6 +180,11 @@ def update_folder(id):
     if 'parent_id' in data:
         if data['parent_id'] == folder.id:
             return jsonify({'error': '不能移动到自身'}), 400
+        # 移动到自己的子文件夹会形成环，文件夹树的递归查询将无法结束
+        if data['parent_id'] is not None:
+            tree = folder_tree_cte(FileCenterFolder.id == folder.id)
+            if db.session.query(tree.c.folder_id).filter(tree.c.folder_id == data['parent_id']).first():
+                return jsonify({'error': '不能移动到子文件夹'}), 400
         folder.parent_id = data['parent_id']
         
     db.session.commit()
@@ -0,0 +1,35 @@
+import time
+import threading
+from .extensions import db
+from .utils.es_service import drain_index_outbox
+
+
+def index_worker(app, runtime=None):
+    """后台线程：批量消费索引发件箱，将文档变更同步到 Elasticsearch"""
+    interval = app.config.get('ES_INDEX_DRAIN_INTERVAL', 1)
+    with app.app_context():
+        while True:
+            # 仅在后台运行时的主节点上消费
+            if runtime is not None:
+                runtime.wait_for_leadership()
+
+            drained = 0
+            try:
+                drained = drain_index_outbox()
+            except Exception as e:
+                # Redis 或 ES 暂不可用，等待下一轮
+                app.logger.warning(f"索引同步线程异常: {e}")
+            finally:
+                # 每轮结束释放会话，避免长期持有过期的 ORM 对象
+                db.session.remove()
+
+            # 本轮有积压时立即继续，否则按间隔休眠
+            if not drained:
+                time.sleep(interval)
+
+
+def start_index_worker(app, runtime=None):
+    """以守护线程启动索引同步任务，随应用生命周期运行"""
+    thread = threading.Thread(target=index_worker, args=(app, runtime))
+    thread.daemon = True
+    thread.start()
@@ -1,6 +1,7 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from ..extensions import db
 from werkzeug.security import generate_password_hash, check_password_hash
+from ..utils.crypto_service import generate_user_salt
 
 class User(db.Model):
     """用户模型"""
@@ -10,6 +11,7 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), comment='密码哈希')
     avatar = db.Column(db.String(500), comment='头像URL')
     privacy_password_hash = db.Column(db.String(255), comment='隐私空间密码哈希')
+    privacy_salt = db.Column(db.String(32), comment='隐私空间密钥派生盐值（十六进制）')
 
     # 新增企业级字段
     department_id = db.Column(db.Integer, db.ForeignKey('department.id', use_alter=True, name='fk_user_dept_id'), comment='部门ID')
@@ -34,6 +36,8 @@ class User(db.Model):
     def set_privacy_password(self, password):
         """设置隐私空间密码（生成哈希）"""
         self.privacy_password_hash = generate_password_hash(password)
+        if not self.privacy_salt:
+            self.privacy_salt = generate_user_salt()
 
     @property
     def role(self):
@@ -91,9 +95,13 @@ class Folder(db.Model):
 
 class Document(db.Model):
     """文档模型"""
+    PREVIEW_LENGTH = 200  # 列表预览截取的字符数
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False, comment='文档标题')
-    content = db.Column(db.Text, comment='文档内容')
+    # 正文可能很大，默认延迟加载；需要正文时显式使用 undefer(Document.content)
+    content = db.deferred(db.Column(db.Text, comment='文档内容'))
+    preview = db.Column(db.Text, comment='内容预览（列表展示用）')
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, comment='创建者ID')
     folder_id = db.Column(db.Integer, db.ForeignKey('folder.id'), comment='所属文件夹ID')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
@@ -106,10 +114,32 @@ class Document(db.Model):
     password = db.Column(db.String(128), comment='访问密码（私有文档）') 
     version = db.Column(db.Integer, default=1, comment='版本号')
     attachments = db.Column(db.JSON, comment='附件列表（图片、视频、文件URL）')
+    offline_key = db.Column(db.String(64), unique=True, index=True, comment='离线写入幂等键')
     
     owner = db.relationship('User', backref='documents')
     folder = db.relationship('Folder', backref='documents')
 
+    __table_args__ = (
+        # ES 不可用时的降级全文检索索引，ngram 分词支持中文
+        db.Index('ft_document_title_content', 'title', 'content',
+                 mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+    )
+
+    @staticmethod
+    def build_preview(content):
+        """根据正文生成列表预览，超出长度时追加省略号"""
+        if not content:
+            return content
+        if len(content) > Document.PREVIEW_LENGTH:
+            return content[:Document.PREVIEW_LENGTH] + '...'
+        return content
+
+def compute_notify_at(start_time, remind_minutes):
+    """根据开始时间与提前分钟数计算提醒时间，不需要提醒时返回 None"""
+    if not start_time or not remind_minutes or remind_minutes <= 0:
+        return None
+    return start_time - timedelta(minutes=remind_minutes)
+
 class Schedule(db.Model):
     """个人日程"""
     id = db.Column(db.Integer, primary_key=True)
@@ -120,9 +150,19 @@ class Schedule(db.Model):
     description = db.Column(db.Text, comment='描述')
     remind_minutes = db.Column(db.Integer, default=0, comment='提前通知时间(分钟)，0表示不通知')
     is_notified = db.Column(db.Boolean, default=False, comment='是否已通知')
+    notify_at = db.Column(db.DateTime, comment='提醒时间（开始时间减提前分钟数），不通知时为空')
     
     user = db.relationship('User', backref='schedules')
 
+    __table_args__ = (
+        # 定时任务按 is_notified + notify_at 筛选到期提醒
+        db.Index('ix_schedule_notify_due', 'is_notified', 'notify_at'),
+    )
+
+    def refresh_notify_at(self):
+        """开始时间或提前分钟数变化后重新计算提醒时间"""
+        self.notify_at = compute_notify_at(self.start_time, self.remind_minutes)
+
 class Meeting(db.Model):
     """会议"""
     id = db.Column(db.Integer, primary_key=True)
@@ -135,9 +175,18 @@ class Meeting(db.Model):
     description = db.Column(db.Text, comment='会议描述')
     remind_minutes = db.Column(db.Integer, default=0, comment='提前通知时间(分钟)，0表示不通知')
     is_notified = db.Column(db.Boolean, default=False, comment='是否已通知')
+    notify_at = db.Column(db.DateTime, comment='提醒时间（开始时间减提前分钟数），不通知时为空')
     
     organizer = db.relationship('User', backref='organized_meetings')
 
+    __table_args__ = (
+        db.Index('ix_meeting_notify_due', 'is_notified', 'notify_at'),
+    )
+
+    def refresh_notify_at(self):
+        """开始时间或提前分钟数变化后重新计算提醒时间"""
+        self.notify_at = compute_notify_at(self.start_time, self.remind_minutes)
+
 class SystemNotification(db.Model):
     """系统通知（针对个人的通知）"""
     id = db.Column(db.Integer, primary_key=True)
@@ -150,6 +199,31 @@ class SystemNotification(db.Model):
     
     user = db.relationship('User', backref=db.backref('notifications', lazy='dynamic'))
 
+    __table_args__ = (
+        # 通知列表按 (is_read, created_at) 排序
+        db.Index('ix_system_notification_user_read', 'user_id', 'is_read', 'created_at'),
+    )
+
+class BroadcastNotification(db.Model):
+    """全员通知（每条通知只存一行，读取时与个人通知合并）"""
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), nullable=False, comment='通知标题')
+    content = db.Column(db.Text, nullable=False, comment='通知内容')
+    type = db.Column(db.String(50), default='system', comment='通知类型')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+
+class BroadcastReadState(db.Model):
+    """用户的全员通知水位线：ID 不大于水位线的全员通知视为已读 / 已清空"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, comment='用户ID')
+    read_watermark = db.Column(db.Integer, nullable=False, default=0, comment='已读水位线')
+    cleared_watermark = db.Column(db.Integer, nullable=False, default=0, comment='已清空水位线')
+
+class BroadcastRead(db.Model):
+    """水位线之后单独标记已读的全员通知"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, comment='用户ID')
+    broadcast_id = db.Column(db.Integer, db.ForeignKey('broadcast_notification.id', ondelete='CASCADE'),
+                             primary_key=True, comment='全员通知ID')
+
 class ApprovalFlow(db.Model):
     """审批流程"""
     id = db.Column(db.Integer, primary_key=True)
@@ -199,6 +273,11 @@ class VoteRecord(db.Model):
     option_key = db.Column(db.String(50), nullable=False, comment='选项标识')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='投票时间')
 
+    __table_args__ = (
+        # 每人每个投票只能投一次，同时支撑"是否已投"查询与按投票统计
+        db.UniqueConstraint('vote_id', 'user_id', name='uq_vote_record_user'),
+    )
+
 class Feedback(db.Model):
     """留言/反馈帖子"""
     id = db.Column(db.Integer, primary_key=True)
@@ -208,10 +287,18 @@ class Feedback(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, comment='发帖人ID')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
     view_count = db.Column(db.Integer, default=0, comment='浏览量')
+    # 冗余计数，列表页无需逐帖统计：回复数随回复在同一事务中维护，点赞数由计数回写任务更新
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='回复数')
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='点赞数')
+    last_reply_at = db.Column(db.DateTime, comment='最后回复时间')
 
     user = db.relationship('User', backref='feedbacks')
     replies = db.relationship('FeedbackReply', backref='feedback', lazy='dynamic', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_feedback_created_at', 'created_at'),
+    )
+
 class FeedbackReply(db.Model):
     """留言/反馈回复"""
     id = db.Column(db.Integer, primary_key=True)
@@ -242,6 +329,21 @@ class MonitorKeyword(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     keyword = db.Column(db.String(100), nullable=False, unique=True, comment='监控关键词')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    scanned_at = db.Column(db.DateTime, comment='存量文档回扫完成时间，为空表示待回扫')
+
+class DocumentFlag(db.Model):
+    """文档命中监控关键词的标记，文档写入时与新增关键词回扫时维护"""
+    __tablename__ = 'document_flag'
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id', ondelete='CASCADE'), nullable=False, comment='文档ID')
+    keyword_id = db.Column(db.Integer, db.ForeignKey('monitor_keyword.id', ondelete='CASCADE'), nullable=False, comment='关键词ID')
+    snippet = db.Column(db.String(255), comment='首次命中处的内容片段')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='标记时间')
+
+    __table_args__ = (
+        db.UniqueConstraint('document_id', 'keyword_id', name='uq_document_flag'),
+        db.Index('ix_document_flag_keyword', 'keyword_id', 'document_id'),
+    )
 
 class AISession(db.Model):
     """AI 会话"""
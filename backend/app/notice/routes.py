@@ -103,6 +103,9 @@ def delete_notice(id):
     return jsonify({'message': '公告删除成功'}), 200
 
 from ..models.models import Notice, Vote, VoteRecord, User
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from ..tasks.vote_tally import record_vote
 
 # ... (Previous notice routes remain unchanged, just append new routes)
 
@@ -114,19 +117,32 @@ def get_votes():
     """获取投票列表"""
     current_user_id = int(get_jwt_identity())
     votes = Vote.query.order_by(Vote.created_at.desc()).all()
+
+    # 一次分组查询统计所有投票各选项的票数，并顺带标出当前用户所投选项
+    tallies = {}
+    user_voted_keys = {}
+    rows = db.session.query(
+        VoteRecord.vote_id,
+        VoteRecord.option_key,
+        func.count(VoteRecord.id),
+        func.max(case((VoteRecord.user_id == current_user_id, 1), else_=0))
+    ).group_by(VoteRecord.vote_id, VoteRecord.option_key)
+    for vote_id, option_key, count, voted in rows:
+        tallies.setdefault(vote_id, {})[option_key] = count
+        if voted:
+            user_voted_keys[vote_id] = option_key
     
     result = []
     for v in votes:
-        # Check if user has voted
-        record = VoteRecord.query.filter_by(vote_id=v.id, user_id=current_user_id).first()
-        user_voted_key = record.option_key if record else None
+        user_voted_key = user_voted_keys.get(v.id)
         
         # Calculate stats
-        total_count = VoteRecord.query.filter_by(vote_id=v.id).count()
+        counts = tallies.get(v.id, {})
+        total_count = sum(counts.values())
         options_stats = []
         if v.options:
             for opt in v.options:
-                count = VoteRecord.query.filter_by(vote_id=v.id, option_key=opt['key']).count()
+                count = counts.get(opt['key'], 0)
                 options_stats.append({
                     'key': opt['key'],
                     'label': opt['label'],
@@ -199,16 +215,12 @@ def submit_vote(id):
     if vote.end_time and vote.end_time < now:
         return jsonify({'error': '投票已结束'}), 400
         
-    # Check if already voted
-    existing = VoteRecord.query.filter_by(vote_id=id, user_id=current_user_id).first()
-    if existing:
-        return jsonify({'error': '您已投过票'}), 400
-        
     # Check option validity
     valid_keys = [opt['key'] for opt in vote.options]
     if option_key not in valid_keys:
         return jsonify({'error': '无效选项'}), 400
         
+    # 重复投票由 (vote_id, user_id) 唯一索引拦截，并发提交也只会成功一次
     record = VoteRecord(
         vote_id=id,
         user_id=current_user_id,
@@ -216,7 +228,12 @@ def submit_vote(id):
         created_at=now
     )
     db.session.add(record)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': '您已投过票'}), 400
+    record_vote(id, option_key)
     
     return jsonify({'message': '投票成功'}), 200
 
@@ -8,6 +8,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.models import User
 from ..extensions import db
 from ..utils.privacy_service import PrivacySpaceService
+from ..utils.crypto_service import derive_user_key, generate_user_salt
 
 privacy_bp = Blueprint('privacy', __name__)
 
@@ -74,7 +75,7 @@ def set_privacy_password():
 def verify_privacy_password():
     """
     验证隐私空间密码
-    成功后返回访问令牌（有效期3分钟）
+    成功后返回访问令牌（有效期3分钟），并在此时一次性派生会话密钥
     """
     current_user_id = int(get_jwt_identity())
     user = User.query.get_or_404(current_user_id)
@@ -90,9 +91,17 @@ def verify_privacy_password():
     
     if not user.check_privacy_password(password):
         return jsonify({'msg': '密码错误'}), 401
+
+    # 早期设置密码的用户没有用户级盐值，首次验证时补齐
+    if not user.privacy_salt:
+        user.privacy_salt = generate_user_salt()
+        db.session.commit()
+
+    # 派生会话密钥，之后的加解密只需 AES-GCM 运算，无需重复 PBKDF2
+    session_key = derive_user_key(password, user.privacy_salt)
     
     # 生成访问令牌
-    token = PrivacySpaceService.generate_access_token(current_user_id)
+    token = PrivacySpaceService.generate_access_token(current_user_id, session_key)
     
     if not token:
         return jsonify({'msg': '生成令牌失败'}), 500
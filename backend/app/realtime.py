@@ -0,0 +1,70 @@
+"""
+Socket.IO 实时推送
+客户端连接时携带 JWT（auth={'token': ...} 或查询参数 token），认证后加入个人房间与全员房间；
+打开投票页面的客户端发送 subscribe_vote 订阅投票房间，接收合并后的实时计票增量；
+配置消息队列后，任意进程（包括后台运行时）发出的事件都会经 Redis 转发给持有连接的 Web 进程
+"""
+from flask import request
+from flask_jwt_extended import decode_token
+from flask_socketio import join_room, leave_room
+from .extensions import socketio
+
+NOTIFICATION_EVENT = 'notification'
+VOTE_TALLY_EVENT = 'vote_tally'
+BROADCAST_ROOM = 'broadcast'
+
+
+def user_room(user_id):
+    return f"user:{user_id}"
+
+
+def vote_room(vote_id):
+    return f"vote:{vote_id}"
+
+
+@socketio.on('connect')
+def handle_connect(auth=None):
+    """校验 JWT，未携带或无效时拒绝连接"""
+    token = (auth or {}).get('token') or request.args.get('token')
+    if not token:
+        return False
+    try:
+        user_id = int(decode_token(token)['sub'])
+    except Exception:
+        return False
+    join_room(user_room(user_id))
+    join_room(BROADCAST_ROOM)
+
+
+@socketio.on('subscribe_vote')
+def handle_subscribe_vote(data):
+    """订阅投票的实时计票，data 为 {'vote_id': ID}"""
+    try:
+        join_room(vote_room(int(data['vote_id'])))
+    except (TypeError, KeyError, ValueError):
+        return False
+    return True
+
+
+@socketio.on('unsubscribe_vote')
+def handle_unsubscribe_vote(data):
+    try:
+        leave_room(vote_room(int(data['vote_id'])))
+    except (TypeError, KeyError, ValueError):
+        return False
+    return True
+
+
+def push_to_user(user_id, payload, event=NOTIFICATION_EVENT):
+    """向指定用户的所有连接推送事件"""
+    socketio.emit(event, payload, to=user_room(user_id))
+
+
+def push_to_all(payload, event=NOTIFICATION_EVENT):
+    """向所有已认证连接推送事件"""
+    socketio.emit(event, payload, to=BROADCAST_ROOM)
+
+
+def push_to_vote(vote_id, payload, event=VOTE_TALLY_EVENT):
+    """向订阅了指定投票的连接推送事件"""
+    socketio.emit(event, payload, to=vote_room(vote_id))
@@ -0,0 +1,151 @@
+import os
+import uuid
+import atexit
+import signal
+import socket
+import threading
+
+from . import extensions
+
+
+# 续约与释放都需确认租约仍归当前进程所有，使用 Lua 脚本保证原子性
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class BackgroundRuntime:
+    """
+    后台运行时
+    多个进程通过 Redis 租约竞争主节点，仅主节点运行定时任务、提醒分发、离线同步与索引消费；
+    主节点按心跳间隔续约，进程退出或续约失败后租约到期，由其他进程接管
+    """
+    LEADER_KEY = "background_runtime:leader"
+
+    def __init__(self, app):
+        self.app = app
+        self.identity = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = app.config.get('BACKGROUND_LEASE_TTL', 15)
+        self.heartbeat_interval = app.config.get('BACKGROUND_HEARTBEAT_INTERVAL', 5)
+        self.scheduler = None
+        self._leader = threading.Event()
+        self._stopped = threading.Event()
+        self._started = False
+
+    @property
+    def is_leader(self):
+        return self._leader.is_set()
+
+    def wait_for_leadership(self, timeout=None):
+        """阻塞直到当前进程成为主节点，返回是否为主节点"""
+        return self._leader.wait(timeout)
+
+    def start(self):
+        """启动心跳线程与后台任务线程，后台任务在成为主节点前保持等待"""
+        if self._started:
+            return
+        self._started = True
+
+        from .sync import start_sync_worker
+        from .indexer import start_index_worker
+        from .tasks.scheduler import init_scheduler
+        from .tasks.reminders import start_reminder_dispatcher
+        from .tasks.vote_tally import start_vote_tally_broadcaster
+        from .tasks.backup_restore import start_restore_worker
+
+        self.scheduler = init_scheduler(self.app)
+        start_sync_worker(self.app, self)
+        start_index_worker(self.app, self)
+        start_reminder_dispatcher(self.app, self)
+        start_vote_tally_broadcaster(self.app, self)
+        start_restore_worker(self.app, self)
+
+        thread = threading.Thread(target=self._heartbeat_loop, name='runtime-heartbeat')
+        thread.daemon = True
+        thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """停止心跳并主动释放租约，其他进程无需等待租约过期即可接管"""
+        self._stopped.set()
+        if self.is_leader:
+            self._step_down('进程退出')
+            try:
+                extensions.redis_client.eval(_RELEASE_SCRIPT, 1, self.LEADER_KEY, self.identity)
+            except Exception:
+                pass
+
+    def run_forever(self):
+        """独立进程模式：阻塞运行直到收到退出信号"""
+        self.start()
+        signal.signal(signal.SIGTERM, lambda *_: self._stopped.set())
+        try:
+            while not self._stopped.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _acquire(self):
+        return bool(extensions.redis_client.set(
+            self.LEADER_KEY, self.identity, nx=True, px=int(self.lease_ttl * 1000)
+        ))
+
+    def _renew(self):
+        return bool(extensions.redis_client.eval(
+            _RENEW_SCRIPT, 1, self.LEADER_KEY, self.identity, int(self.lease_ttl * 1000)
+        ))
+
+    def _take_over(self):
+        self.app.logger.info(f"后台运行时成为主节点: {self.identity}")
+        self._leader.set()
+        if self.scheduler is not None:
+            self._set_scheduler_paused(False)
+
+    def _step_down(self, reason):
+        self.app.logger.warning(f"后台运行时退出主节点（{reason}）: {self.identity}")
+        self._leader.clear()
+        if self.scheduler is not None:
+            self._set_scheduler_paused(True)
+
+    def _set_scheduler_paused(self, paused):
+        try:
+            if paused:
+                self.scheduler.pause()
+            else:
+                self.scheduler.resume()
+        except Exception as e:
+            # 调试模式下 Flask-APScheduler 不会在重载前启动调度器
+            self.app.logger.warning(f"调度器状态切换失败: {e}")
+
+    def _heartbeat_loop(self):
+        while not self._stopped.is_set():
+            try:
+                if self.is_leader:
+                    if not self._renew():
+                        self._step_down('租约已失效')
+                elif self._acquire():
+                    self._take_over()
+            except Exception as e:
+                # Redis 不可用时无法确认租约，主节点主动降级，避免出现多个主节点
+                if self.is_leader:
+                    self._step_down(f'续约失败: {e}')
+            self._stopped.wait(self.heartbeat_interval)
+
+
+def start_background_runtime(app):
+    """创建并启动后台运行时，挂载到 app.extensions 供独立进程入口复用"""
+    runtime = BackgroundRuntime(app)
+    app.extensions['background_runtime'] = runtime
+    runtime.start()
+    return runtime
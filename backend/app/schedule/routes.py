@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.models import Schedule, Meeting, User, SystemNotification, Role
 from ..extensions import db
+from ..tasks.reminders import schedule_reminder, cancel_reminder
 from datetime import datetime
 import calendar
 
@@ -119,8 +120,10 @@ def create_schedule():
             user_id=current_user_id,
             remind_minutes=int(data.get('remind_minutes', 0))
         )
+        new_schedule.refresh_notify_at()
         db.session.add(new_schedule)
         db.session.commit()
+        schedule_reminder('schedule', new_schedule)
         return jsonify({'message': '日程创建成功', 'id': new_schedule.id}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -160,8 +163,10 @@ def update_schedule(id):
             schedule.remind_minutes = int(data['remind_minutes'])
             # 如果更新了提醒时间，重置通知状态
             schedule.is_notified = False
+        schedule.refresh_notify_at()
             
         db.session.commit()
+        schedule_reminder('schedule', schedule)
         return jsonify({'message': '日程更新成功'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -186,6 +191,7 @@ def delete_schedule(id):
          
     db.session.delete(schedule)
     db.session.commit()
+    cancel_reminder('schedule', id)
     return jsonify({'message': '日程删除成功'}), 200
 
 # ----------------- 会议管理 (仅管理员) -----------------
@@ -210,8 +216,10 @@ def create_meeting():
             meeting_link=data.get('meeting_link', ''),
             attendees=data.get('attendees', []) # ID列表
         )
+        new_meeting.refresh_notify_at()
         db.session.add(new_meeting)
         db.session.commit()
+        schedule_reminder('meeting', new_meeting)
         return jsonify({'message': '会议创建成功', 'id': new_meeting.id}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -253,8 +261,10 @@ def update_meeting(id):
             meeting.meeting_link = data['meeting_link']
         if 'attendees' in data:
             meeting.attendees = data['attendees']
+        meeting.refresh_notify_at()
             
         db.session.commit()
+        schedule_reminder('meeting', meeting)
         return jsonify({'message': '会议更新成功'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -275,6 +285,7 @@ def delete_meeting(id):
              return jsonify({'error': '无权限'}), 403
     db.session.delete(meeting)
     db.session.commit()
+    cancel_reminder('meeting', id)
     return jsonify({'message': '会议删除成功'}), 200
 
 
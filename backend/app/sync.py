@@ -1,55 +1,197 @@
+import os
 import time
+import socket
 import threading
+from datetime import datetime
+from sqlalchemy.exc import DataError, IntegrityError
 from .extensions import db
 from .models.models import Document
+from .utils.document_flags import refresh_document_flags
 from .utils.redis_service import RedisService
+from .utils.es_service import OP_INDEX, queue_index_operations
+
+
+def _parse_offline_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _build_document_mapping(doc_data):
+    """将离线消息转换为 bulk_insert_mappings 所需的字段字典"""
+    # 无法解析的消息为 None，合法 JSON 也可能不是对象
+    if not isinstance(doc_data, dict):
+        raise TypeError(f'消息数据不是对象: {type(doc_data).__name__}')
+    content = doc_data.get('content', '')
+    now = datetime.utcnow()
+    return {
+        'title': doc_data['title'],
+        'content': content,
+        # 隐私文档的预览在离线前已加密；旧版列表中的数据没有预览字段
+        'preview': doc_data.get('preview') or Document.build_preview(content),
+        'owner_id': doc_data['owner_id'],
+        'folder_id': doc_data.get('folder_id'),
+        'in_privacy_space': bool(doc_data.get('in_privacy_space')),
+        'is_pinned': bool(doc_data.get('is_pinned')),
+        'attachments': doc_data.get('attachments') or [],
+        'created_at': _parse_offline_datetime(doc_data.get('created_at')) or now,
+        'updated_at': _parse_offline_datetime(doc_data.get('updated_at')) or now,
+        'offline_key': doc_data['offline_key'],
+    }
+
+
+def _existing_offline_keys(keys):
+    return {
+        key for (key,) in db.session.query(Document.offline_key)
+        .filter(Document.offline_key.in_(keys))
+    }
+
+
+def _insert_rows_one_by_one(rows):
+    """逐条插入，返回 (插入条数, {幂等键: 失败原因})；数据库不可用等其他异常继续抛出"""
+    inserted = 0
+    failed = {}
+    for row in rows:
+        try:
+            db.session.bulk_insert_mappings(Document, [row])
+            db.session.commit()
+            inserted += 1
+        except (IntegrityError, DataError) as e:
+            db.session.rollback()
+            # 其他消费者已写入同一文档时视为成功
+            if not _existing_offline_keys([row['offline_key']]):
+                failed[row['offline_key']] = str(e.orig if e.orig is not None else e)
+    return inserted, failed
+
+
+def _insert_new_documents(mappings):
+    """
+    按幂等键过滤已落库的文档后批量插入，返回 (插入条数, {幂等键: 失败原因})
+    其他消费者并发写入导致冲突时重试一次，仍失败则逐条插入，找出无法落库的数据
+    """
+    keys = list(mappings)
+    rows = []
+    for _ in range(2):
+        existing = _existing_offline_keys(keys)
+        rows = [mapping for key, mapping in mappings.items() if key not in existing]
+        if not rows:
+            return 0, {}
+        try:
+            db.session.bulk_insert_mappings(Document, rows)
+            db.session.commit()
+            return len(rows), {}
+        except (IntegrityError, DataError):
+            db.session.rollback()
+    return _insert_rows_one_by_one(rows)
+
+
+def sync_offline_documents(consumer, batch_size=500):
+    """消费一批离线文档并批量落库，返回本批处理的消息数"""
+    entries = RedisService.read_offline_documents(consumer, batch_size)
+    if not entries:
+        return 0
+
+    # 反复投递仍未确认的消息（例如每次处理都使进程异常）转入死信流，不再重试
+    delivery_counts = RedisService.get_offline_delivery_counts([entry_id for entry_id, _ in entries])
+    dead = []
+    mappings = {}
+    entry_keys = {}
+    for entry_id, doc_data in entries:
+        if delivery_counts.get(entry_id, 0) > RedisService.OFFLINE_MAX_DELIVERIES:
+            dead.append((entry_id, doc_data, f'超过最大投递次数 {RedisService.OFFLINE_MAX_DELIVERIES}'))
+            continue
+        try:
+            mapping = _build_document_mapping(doc_data)
+        except (KeyError, TypeError) as e:
+            # 无法解析的消息直接确认丢弃，避免阻塞后续消息
+            print(f"丢弃无效的离线文档消息 {entry_id}: {e}")
+            continue
+        # 同一条消息被重复投递时只保留一份
+        mappings.setdefault(mapping['offline_key'], mapping)
+        entry_keys[entry_id] = mapping['offline_key']
+
+    if mappings:
+        inserted, failed = _insert_new_documents(mappings)
+        if inserted:
+            print(f"成功同步 {inserted} 篇离线文档。")
+        if failed:
+            print(f"{len(failed)} 篇离线文档无法落库，已转入死信流。")
+            dead.extend(
+                (entry_id, doc_data, failed[entry_keys[entry_id]])
+                for entry_id, doc_data in entries
+                if entry_keys.get(entry_id) in failed
+            )
+
+        # 重新投递的消息也会重算标记，结果相同
+        refresh_document_flags(
+            db.session.query(Document.id, Document.content)
+            .filter(Document.offline_key.in_(list(mappings)))
+        )
+        db.session.commit()
+
+        # 按幂等键回查主键，提交搜索索引（隐私文档不索引）
+        doc_ids = [
+            doc_id for (doc_id,) in db.session.query(Document.id)
+            .filter(Document.offline_key.in_(list(mappings)), Document.in_privacy_space.is_(False))
+        ]
+        if doc_ids:
+            queue_index_operations({doc_id: OP_INDEX for doc_id in doc_ids})
+
+    # 落库成功后再确认，失败时消息留在待确认列表中，超时后由消费者重新认领
+    RedisService.dead_letter_offline_documents(dead)
+    dead_ids = {entry_id for entry_id, _, _ in dead}
+    RedisService.ack_offline_documents([entry_id for entry_id, _ in entries if entry_id not in dead_ids])
+    return len(entries)
+
+
+def sync_worker(app, runtime=None):
+    """后台线程：从 Redis Stream 消费离线缓存的文档并批量写回数据库"""
+    batch_size = app.config.get('OFFLINE_SYNC_BATCH_SIZE', 500)
+    min_interval = app.config.get('OFFLINE_SYNC_MIN_INTERVAL', 0.5)
+    max_interval = app.config.get('OFFLINE_SYNC_MAX_INTERVAL', 5)
+    # 每个进程独立的消费者名称，消费组保证同一消息只投递给一个消费者
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    interval = min_interval
+    group_ready = False
 
-def sync_worker(app):
-    """后台线程：周期性地将 Redis 中离线缓存的文档写回数据库"""
     with app.app_context():
         print("同步线程启动，等待检测离线文档...")
         while True:
+            # 仅在后台运行时的主节点上消费
+            if runtime is not None:
+                runtime.wait_for_leadership()
+
+            processed = 0
             try:
-                # 探测数据库连接是否正常
+                if not group_ready:
+                    RedisService.ensure_offline_group()
+                    # 旧版列表只会由升级前的进程写入，启动时迁移一次即可
+                    RedisService.migrate_legacy_offline_documents()
+                    group_ready = True
+
+                # 探测数据库连接是否正常，离线期间不读取消息
                 db.session.execute(db.text('SELECT 1'))
-                
-                # 从 Redis 中取出离线文档列表
-                offline_docs = RedisService.get_offline_documents()
-                
-                if offline_docs:
-                    print(f"检测到 {len(offline_docs)} 篇离线文档，开始同步...")
-                    count = 0
-                    for doc_data in offline_docs:
-                        try:
-                            doc = Document(
-                                title=doc_data['title'],
-                                content=doc_data['content'],
-                                owner_id=doc_data['owner_id']
-                            )
-                            db.session.add(doc)
-                            count += 1
-                        except Exception as e:
-                            print(f"创建文档对象失败: {e}")
-                    
-                    if count > 0:
-                        try:
-                            db.session.commit()
-                            RedisService.remove_offline_documents(count)
-                            print(f"成功同步 {count} 篇离线文档并清理缓存队列。")
-                        except Exception as e:
-                            db.session.rollback()
-                            print(f"同步提交失败，已回滚: {e}")
-                            
+
+                processed = sync_offline_documents(consumer, batch_size)
             except Exception as e:
-                # 可能是数据库暂不可用等异常，此处忽略并等待下一轮
-                # print(f"同步线程异常（数据库可能离线）: {e}")
-                pass
-                
-            # 等待一段时间后再次检查，避免频繁占用资源
-            time.sleep(10)
-
-def start_sync_worker(app):
+                # 可能是数据库或 Redis 暂不可用，等待下一轮
+                db.session.rollback()
+                app.logger.debug(f"离线同步线程异常: {e}")
+            finally:
+                db.session.remove()
+
+            # 自适应轮询：满批时立即继续，有数据时恢复最短间隔，空闲或异常时逐步退避
+            if processed >= batch_size:
+                interval = min_interval
+                continue
+            interval = min_interval if processed else min(interval * 2, max_interval)
+            time.sleep(interval)
+
+def start_sync_worker(app, runtime=None):
     """以守护线程启动同步任务，随应用生命周期运行"""
-    thread = threading.Thread(target=sync_worker, args=(app,))
+    thread = threading.Thread(target=sync_worker, args=(app, runtime))
     thread.daemon = True
     thread.start()
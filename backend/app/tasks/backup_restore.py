@@ -0,0 +1,371 @@
+"""
+数据库备份的后台恢复任务
+上传的备份文件先落盘，再由后台线程逐条执行其中的 SQL 语句，HTTP 请求立即返回任务 ID。
+任务进度（已读取字节数、已执行语句数、当前表）保存在 Redis 中并经 Socket.IO 推送给发起人。
+恢复任务进入 Redis 队列，由后台运行时的主节点执行（BACKGROUND_RUNTIME=external 时为独立的后台进程），
+Web worker 被回收不会中断恢复；恢复期间 user 表会被重建，查询进度只校验 JWT 与任务发起人，不查询数据库。
+同一时间只允许一个恢复任务，互斥锁由独立的心跳线程续期，单条语句执行再久也不会过期；
+执行进程退出后锁自然过期，状态仍为 queued / running 的任务对外显示为 interrupted，可继续执行。
+
+mysqldump 为每张表生成以 DROP TABLE IF EXISTS 开头的独立段落，重新执行整段是幂等的；
+任务失败后可从第一个未完成的表继续恢复，文件头部的会话设置（字符集、外键检查等）会先重放
+"""
+import bz2
+import gzip
+import io
+import lzma
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from app.extensions import db, redis_client
+from app.realtime import push_to_user
+
+RESTORE_JOB_PREFIX = "backup_restore:"
+RESTORE_LOCK_KEY = "backup_restore:lock"
+RESTORE_QUEUE_KEY = "backup_restore:queue"
+RESTORE_QUEUE_POLL_TIMEOUT = 5  # 后台线程等待新任务的超时时间（秒）
+RESTORE_JOB_TTL = 7 * 86400  # 任务状态保留 7 天（秒）
+RESTORE_LOCK_TTL = 60  # 恢复线程失联后锁自动释放的时间（秒）
+RESTORE_LOCK_RENEW_INTERVAL = 10  # 心跳线程续期锁的间隔（秒）
+RESTORE_PROGRESS_INTERVAL = 1  # 进度写入与推送的最小间隔（秒）
+RESTORE_EVENT = 'backup_restore'
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+# 状态为 queued / running 但锁已不归该任务所有：执行进程已退出
+STATUS_INTERRUPTED = 'interrupted'
+
+# 续期与释放都需确认锁仍归当前任务所有
+_RENEW_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_TABLE_START_RE = re.compile(r'^(?:DROP TABLE IF EXISTS|DROP VIEW IF EXISTS)\s+`?([^`\s;]+)`?', re.IGNORECASE)
+_CREATE_TABLE_RE = re.compile(r'^CREATE TABLE\s+(?:IF NOT EXISTS\s+)?`?([^`\s(]+)`?', re.IGNORECASE)
+
+# 压缩格式魔数 -> 打开方式
+_COMPRESSED_FORMATS = (
+    (b'\x1f\x8b', gzip.open),
+    (b'BZh', bz2.open),
+    (b'\xfd7zXZ\x00', lzma.open),
+)
+
+
+class _CountingReader(io.RawIOBase):
+    """统计已读取的原始（压缩）字节数，用于计算进度"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        self.bytes_read += n or 0
+        return n
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def open_backup(path):
+    """
+    按文件头识别 gzip / bz2 / xz 压缩，返回 (文本流, 计数器)
+    以 surrogateescape 解码，非 UTF-8 的二进制数据在驱动编码时可原样还原
+    """
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    counter = _CountingReader(open(path, 'rb'))
+    source = io.BufferedReader(counter)
+    for magic, opener in _COMPRESSED_FORMATS:
+        if head.startswith(magic):
+            return opener(source, 'rt', encoding='utf-8', errors='surrogateescape'), counter
+    return io.TextIOWrapper(source, encoding='utf-8', errors='surrogateescape'), counter
+
+
+def iter_sql_statements(lines):
+    """
+    将 mysqldump 输出拆分为语句，产出 (语句, 表段落名或 None)
+    mysqldump 会将字符串中的换行转义，因此以行尾分隔符判断语句结束；支持 DELIMITER 切换
+    """
+    delimiter = ';'
+    buffer = []
+    table_pending = False
+    for line in lines:
+        stripped = line.strip()
+        if not buffer:
+            if not stripped or stripped.startswith('--') or stripped.startswith('#'):
+                continue
+            if stripped.upper().startswith('DELIMITER '):
+                delimiter = stripped.split(None, 1)[1]
+                continue
+        buffer.append(line)
+        if not stripped.endswith(delimiter):
+            continue
+
+        statement = ''.join(buffer).strip()[:-len(delimiter)].strip()
+        buffer = []
+        if not statement:
+            continue
+
+        # 每张表的段落以 DROP TABLE 开头；未使用 --add-drop-table 导出时以 CREATE TABLE 开头
+        table = None
+        match = _TABLE_START_RE.match(statement)
+        if match:
+            table = match.group(1)
+            table_pending = True
+        else:
+            match = _CREATE_TABLE_RE.match(statement)
+            if match and not table_pending:
+                table = match.group(1)
+            table_pending = False if match else table_pending
+        yield statement, table
+
+    if buffer and ''.join(buffer).strip():
+        yield ''.join(buffer).strip(), None
+
+
+def _job_key(job_id):
+    return RESTORE_JOB_PREFIX + job_id
+
+
+def get_restore_job(job_id):
+    """读取任务状态，不存在时返回 None"""
+    raw = redis_client.hgetall(_job_key(job_id))
+    if not raw:
+        return None
+    job = {k.decode(): v.decode() for k, v in raw.items()}
+    for field in ('bytes_total', 'bytes_read', 'statements', 'sections_done', 'created_by'):
+        job[field] = int(job.get(field) or 0)
+    job['percent'] = round(job['bytes_read'] / job['bytes_total'] * 100, 1) if job['bytes_total'] else 0
+    job['id'] = job_id
+    if job.get('status') in (STATUS_QUEUED, STATUS_RUNNING):
+        owner = redis_client.get(RESTORE_LOCK_KEY)
+        if owner is None or owner.decode() != job_id:
+            job['status'] = STATUS_INTERRUPTED
+    job.pop('path', None)
+    return job
+
+
+def _update_job(job_id, **fields):
+    fields['updated_at'] = datetime.utcnow().isoformat()
+    pipe = redis_client.pipeline()
+    pipe.hset(_job_key(job_id), mapping={k: '' if v is None else v for k, v in fields.items()})
+    pipe.expire(_job_key(job_id), RESTORE_JOB_TTL)
+    pipe.execute()
+
+
+def _publish_progress(job_id):
+    job = get_restore_job(job_id)
+    if job:
+        push_to_user(job['created_by'], job, event=RESTORE_EVENT)
+
+
+def _enqueue(job_id):
+    redis_client.rpush(RESTORE_QUEUE_KEY, job_id)
+
+
+def create_restore_job(path, filename, user_id):
+    """登记恢复任务并加入队列，返回任务 ID；已有任务在运行时返回 None"""
+    job_id = uuid.uuid4().hex
+    if not redis_client.set(RESTORE_LOCK_KEY, job_id, nx=True, ex=RESTORE_LOCK_TTL):
+        return None
+    _update_job(
+        job_id,
+        status=STATUS_QUEUED,
+        filename=filename,
+        path=path,
+        created_by=user_id,
+        bytes_total=os.path.getsize(path),
+        bytes_read=0,
+        statements=0,
+        sections_done=0,
+        current_table='',
+        error='',
+        started_at=datetime.utcnow().isoformat(),
+    )
+    _enqueue(job_id)
+    return job_id
+
+
+def resume_restore_job(job_id):
+    """
+    将失败或中断的任务重新加入队列，返回是否成功
+    中断指执行任务的进程已退出，锁已过期
+    """
+    key = _job_key(job_id)
+    status, path = redis_client.hmget(key, 'status', 'path')
+    if status is None or status.decode() == STATUS_SUCCEEDED:
+        return False
+    if not path or not os.path.exists(path.decode()):
+        return False
+    if not redis_client.set(RESTORE_LOCK_KEY, job_id, nx=True, ex=RESTORE_LOCK_TTL):
+        return False
+    _update_job(job_id, status=STATUS_QUEUED, error='')
+    _enqueue(job_id)
+    return True
+
+
+class _LockHeartbeat(threading.Thread):
+    """定期续期恢复锁；锁被他人持有或续期失败时设置 lost"""
+
+    def __init__(self, job_id):
+        super().__init__(name=f'backup-restore-lock-{job_id}', daemon=True)
+        self.job_id = job_id
+        self.lost = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(RESTORE_LOCK_RENEW_INTERVAL):
+            try:
+                renewed = _renew_lock(self.job_id)
+            except Exception:
+                # Redis 暂时不可用时锁可能仍然有效，下次心跳重试
+                continue
+            if not renewed:
+                self.lost.set()
+                return
+
+    def stop(self):
+        self._stopped.set()
+
+
+def _release_lock(job_id):
+    redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, RESTORE_LOCK_KEY, job_id)
+
+
+def _renew_lock(job_id):
+    """续期恢复锁，返回锁是否仍归该任务所有"""
+    return bool(redis_client.eval(_RENEW_LOCK_SCRIPT, 1, RESTORE_LOCK_KEY, job_id, RESTORE_LOCK_TTL))
+
+
+def run_restore(app, job_id):
+    """执行恢复任务（在后台线程中运行）"""
+    with app.app_context():
+        key = _job_key(job_id)
+        path = redis_client.hget(key, 'path').decode()
+        # 跳过之前已完整恢复的表段落
+        resume_sections = int(redis_client.hget(key, 'sections_done') or 0)
+        statements = int(redis_client.hget(key, 'statements') or 0) if resume_sections else 0
+
+        conn = None
+        counter = None
+        section = 0
+        current_table = ''
+        last_report = 0
+        heartbeat = _LockHeartbeat(job_id)
+        heartbeat.start()
+        _update_job(job_id, status=STATUS_RUNNING)
+        _publish_progress(job_id)
+        try:
+            stream, counter = open_backup(path)
+            # 独立连接逐条执行，no_parameters 避免驱动对语句中的 % 做格式化
+            conn = db.engine.connect().execution_options(isolation_level='AUTOCOMMIT', no_parameters=True)
+            with stream:
+                for statement, table in iter_sql_statements(stream):
+                    if table is not None:
+                        # 进入新段落即表示上一段落已完整执行
+                        section += 1
+                        current_table = table
+                    if section and section <= resume_sections:
+                        continue
+                    if heartbeat.lost.is_set():
+                        # 锁已过期并可能被其他任务取得，不能继续写入
+                        raise RuntimeError('恢复锁已失效')
+                    conn.exec_driver_sql(statement)
+                    statements += 1
+
+                    now = time.monotonic()
+                    if now - last_report >= RESTORE_PROGRESS_INTERVAL:
+                        last_report = now
+                        _update_job(
+                            job_id,
+                            bytes_read=counter.bytes_read,
+                            statements=statements,
+                            sections_done=max(section - 1, 0),
+                            current_table=current_table,
+                        )
+                        _publish_progress(job_id)
+
+            _update_job(
+                job_id,
+                status=STATUS_SUCCEEDED,
+                bytes_read=counter.bytes_read,
+                statements=statements,
+                sections_done=section,
+                current_table='',
+                finished_at=datetime.utcnow().isoformat(),
+            )
+            os.remove(path)
+        except Exception as e:
+            app.logger.warning(f"备份恢复失败 {job_id}: {e}")
+            _update_job(
+                job_id,
+                status=STATUS_FAILED,
+                bytes_read=counter.bytes_read if counter else 0,
+                statements=statements,
+                # 仍在跳过已恢复段落时出错则保留原有进度
+                sections_done=max(section - 1, resume_sections),
+                error=str(e)[:500],
+            )
+        finally:
+            heartbeat.stop()
+            if conn is not None:
+                # 恢复过程中设置的会话变量不能带回连接池
+                conn.invalidate()
+                conn.close()
+            _release_lock(job_id)
+            _publish_progress(job_id)
+
+
+def run_next_restore_job(app, timeout=RESTORE_QUEUE_POLL_TIMEOUT):
+    """从队列取出一个恢复任务并执行，返回执行的任务 ID；超时或任务已失效时返回 None"""
+    item = redis_client.blpop(RESTORE_QUEUE_KEY, timeout=timeout)
+    if item is None:
+        return None
+    job_id = item[1].decode()
+    # 锁已过期或被其他任务占用（例如排队过久），任务对外显示为中断，等待管理员继续执行
+    if not _renew_lock(job_id):
+        app.logger.warning(f"恢复任务 {job_id} 已不持有恢复锁，跳过")
+        return None
+    run_restore(app, job_id)
+    return job_id
+
+
+def restore_worker(app, runtime=None):
+    """后台线程：从队列取出恢复任务并执行，仅在后台运行时的主节点上运行"""
+    with app.app_context():
+        while True:
+            if runtime is not None and not runtime.is_leader:
+                runtime.wait_for_leadership()
+            try:
+                run_next_restore_job(app)
+            except Exception as e:
+                app.logger.warning(f"恢复任务线程异常: {e}")
+                time.sleep(RESTORE_QUEUE_POLL_TIMEOUT)
+            finally:
+                db.session.remove()
+
+
+def start_restore_worker(app, runtime=None):
+    """以守护线程启动恢复任务执行线程，随后台运行时启动"""
+    thread = threading.Thread(target=restore_worker, args=(app, runtime), name='backup-restore')
+    thread.daemon = True
+    thread.start()
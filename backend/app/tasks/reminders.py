@@ -0,0 +1,152 @@
+"""
+日程 / 会议提醒的延迟队列
+提醒按 notify_at 时间戳写入 Redis 有序集合，主节点上的分发线程取出到期条目后立即发送，
+替代按分钟轮询全表；check_notifications 仅作为兜底补发
+"""
+import time
+import threading
+from datetime import datetime
+from app.extensions import db, redis_client
+from app.models.models import Schedule, Meeting
+from app.utils.notification_service import NotificationService
+
+REMINDER_QUEUE_KEY = "reminder_queue"
+# 队列为空或下一条提醒较远时的最长等待时间（秒）
+REMINDER_POLL_INTERVAL = 1
+# 发送失败后的重试延迟（秒）
+REMINDER_RETRY_DELAY = 5
+REMINDER_BATCH_SIZE = 100
+
+# 提醒类型 -> (模型, 通知标题前缀)
+REMINDER_TYPES = {
+    'schedule': (Schedule, '日程'),
+    'meeting': (Meeting, '会议'),
+}
+
+
+def _member(kind, event_id):
+    return f"{kind}:{event_id}"
+
+
+def schedule_reminder(kind, event):
+    """创建或更新日程 / 会议后登记提醒；无需提醒或已提醒时从队列移除"""
+    try:
+        if event.notify_at is None or event.is_notified:
+            redis_client.zrem(REMINDER_QUEUE_KEY, _member(kind, event.id))
+        else:
+            redis_client.zadd(REMINDER_QUEUE_KEY, {_member(kind, event.id): event.notify_at.timestamp()})
+    except Exception as e:
+        # Redis 不可用时由 check_notifications 兜底
+        print(f"登记提醒失败 {kind}:{event.id}: {e}")
+
+
+def cancel_reminder(kind, event_id):
+    """删除日程 / 会议时移除提醒"""
+    try:
+        redis_client.zrem(REMINDER_QUEUE_KEY, _member(kind, event_id))
+    except Exception as e:
+        print(f"移除提醒失败 {kind}:{event_id}: {e}")
+
+
+def rebuild_reminder_queue():
+    """将数据库中尚未发送的提醒全部登记到队列（成为主节点时执行，弥补 Redis 数据丢失）"""
+    mapping = {}
+    for kind, (model, _) in REMINDER_TYPES.items():
+        rows = db.session.query(model.id, model.notify_at).filter(
+            model.is_notified == False,
+            model.notify_at.isnot(None)
+        )
+        for event_id, notify_at in rows:
+            mapping[_member(kind, event_id)] = notify_at.timestamp()
+    if mapping:
+        redis_client.zadd(REMINDER_QUEUE_KEY, mapping)
+    return len(mapping)
+
+
+def send_reminder(kind, event_id):
+    """
+    发送单条提醒并标记已通知，返回是否发送
+    使用条件更新抢占 is_notified，避免与兜底任务重复发送
+    """
+    model, label = REMINDER_TYPES[kind]
+    event = db.session.get(model, event_id)
+    if event is None or event.notify_at is None or event.notify_at > datetime.now():
+        return False
+
+    claimed = db.session.query(model).filter(
+        model.id == event_id,
+        model.is_notified == False
+    ).update({'is_notified': True}, synchronize_session=False)
+    if not claimed:
+        db.session.rollback()
+        return False
+
+    # 提醒面向所有用户，以全员通知发布
+    time_str = event.start_time.strftime('%Y-%m-%d %H:%M')
+    NotificationService.broadcast(
+        f"{label}提醒: {event.title}",
+        f"{label}【{event.title}】将于 {time_str} 开始。",
+        kind
+    )
+    db.session.commit()
+    return True
+
+
+def claim_due_reminders(now=None, limit=REMINDER_BATCH_SIZE):
+    """取出到期的提醒，ZREM 成功才视为领取成功，返回 [(类型, ID)]"""
+    now = now or time.time()
+    members = redis_client.zrangebyscore(REMINDER_QUEUE_KEY, 0, now, start=0, num=limit)
+    claimed = []
+    for member in members:
+        if redis_client.zrem(REMINDER_QUEUE_KEY, member):
+            kind, _, event_id = member.decode().partition(':')
+            if kind in REMINDER_TYPES:
+                claimed.append((kind, int(event_id)))
+    return claimed
+
+
+def _seconds_until_next_reminder():
+    upcoming = redis_client.zrange(REMINDER_QUEUE_KEY, 0, 0, withscores=True)
+    if not upcoming:
+        return REMINDER_POLL_INTERVAL
+    return min(max(upcoming[0][1] - time.time(), 0.05), REMINDER_POLL_INTERVAL)
+
+
+def reminder_dispatcher(app, runtime=None):
+    """后台线程：按到期时间分发提醒，精度在一秒以内"""
+    with app.app_context():
+        queue_ready = False
+        while True:
+            # 仅在后台运行时的主节点上分发
+            if runtime is not None and not runtime.is_leader:
+                queue_ready = False
+                runtime.wait_for_leadership()
+
+            wait = REMINDER_POLL_INTERVAL
+            try:
+                if not queue_ready:
+                    rebuild_reminder_queue()
+                    queue_ready = True
+
+                for kind, event_id in claim_due_reminders():
+                    try:
+                        send_reminder(kind, event_id)
+                    except Exception as e:
+                        db.session.rollback()
+                        app.logger.warning(f"发送提醒失败 {kind}:{event_id}: {e}")
+                        redis_client.zadd(REMINDER_QUEUE_KEY,
+                                          {_member(kind, event_id): time.time() + REMINDER_RETRY_DELAY})
+                wait = _seconds_until_next_reminder()
+            except Exception as e:
+                # Redis 或数据库暂不可用，等待下一轮
+                app.logger.warning(f"提醒分发线程异常: {e}")
+            finally:
+                db.session.remove()
+            time.sleep(wait)
+
+
+def start_reminder_dispatcher(app, runtime=None):
+    """以守护线程启动提醒分发，随应用生命周期运行"""
+    thread = threading.Thread(target=reminder_dispatcher, args=(app, runtime))
+    thread.daemon = True
+    thread.start()
@@ -1,11 +1,17 @@
 from app.extensions import db, redis_client
-from app.models.models import Schedule, Meeting, SystemNotification, User
+from app.models.models import Document
+from app.tasks.reminders import REMINDER_TYPES, send_reminder
+from app.utils.document_flags import backscan_pending_keywords
+from app.utils.feedback_counters import LIKE_TYPES, FeedbackCounters
 from datetime import datetime, timedelta
 
 def check_notifications(app):
-    """检查并生成通知"""
+    """
+    兜底补发到期提醒
+    提醒通常由 reminders 延迟队列实时发送，此处补发因 Redis 故障等原因遗漏的条目
+    """
     # 获取 Redis 锁，防止多 Worker 并发执行
-    # timeout=50s，任务每分钟执行一次
+    # timeout=50s
     if not redis_client:
         return # Redis 未初始化
         
@@ -16,68 +22,100 @@ def check_notifications(app):
     try:
         with app.app_context():
             now = datetime.now()
-            
-            # 获取所有用户（用于发送全员通知）
-            all_users = User.query.all()
 
-            # 1. 检查日程
-            schedules = Schedule.query.filter(
-                Schedule.remind_minutes > 0,
-                Schedule.is_notified == False
-            ).all()
-            
-            for s in schedules:
-                notify_time = s.start_time - timedelta(minutes=s.remind_minutes)
-                if notify_time <= now:
-                    # 创建通知 - 发送给所有用户
-                    title = f"日程提醒: {s.title}"
-                    time_str = s.start_time.strftime('%Y-%m-%d %H:%M')
-                    content = f"日程【{s.title}】将于 {time_str} 开始。"
-                    
-                    for user in all_users:
-                        # 可选：如果不需要通知管理员自己，可以加 if user.role != 'admin':
-                        notification = SystemNotification(
-                            user_id=user.id,
-                            title=title,
-                            content=content,
-                            type='schedule'
-                        )
-                        db.session.add(notification)
-                    
-                    s.is_notified = True
-            
-            # 2. 检查会议
-            meetings = Meeting.query.filter(
-                Meeting.remind_minutes > 0,
-                Meeting.is_notified == False
-            ).all()
-            
-            for m in meetings:
-                notify_time = m.start_time - timedelta(minutes=m.remind_minutes)
-                if notify_time <= now:
-                    title = f"会议提醒: {m.title}"
-                    time_str = m.start_time.strftime('%Y-%m-%d %H:%M')
-                    content = f"会议【{m.title}】将于 {time_str} 开始。"
-                    
-                    # 同样发送给所有用户（视为全员会议）
-                    for user in all_users:
-                        notification = SystemNotification(
-                            user_id=user.id,
-                            title=title,
-                            content=content,
-                            type='meeting'
-                        )
-                        db.session.add(notification)
-                    
-                    m.is_notified = True
-            
-            try:
-                db.session.commit()
-            except Exception as e:
-                print(f"Error checking notifications: {e}")
-                db.session.rollback()
+            # 日程与会议均发送给所有用户；到期条件在 SQL 中按 notify_at 索引筛选
+            for kind, (model, _) in REMINDER_TYPES.items():
+                due_ids = [event_id for (event_id,) in db.session.query(model.id).filter(
+                    model.is_notified == False,
+                    model.notify_at <= now
+                )]
+                for event_id in due_ids:
+                    try:
+                        send_reminder(kind, event_id)
+                    except Exception as e:
+                        print(f"Error checking notifications: {e}")
+                        db.session.rollback()
     finally:
         try:
             lock.release()
         except:
             pass
+
+
+def flush_feedback_counters(app):
+    """将 Redis 中累积的反馈浏览量与点赞回写数据库"""
+    with app.app_context():
+        try:
+            FeedbackCounters.flush_views()
+        except Exception as e:
+            print(f"浏览量回写失败: {e}")
+            db.session.rollback()
+        for kind in LIKE_TYPES:
+            try:
+                FeedbackCounters.flush_likes(kind)
+            except Exception as e:
+                print(f"点赞回写失败 {kind}: {e}")
+
+
+def backscan_monitor_keywords(app):
+    """为新增的监控关键词回扫存量文档"""
+    with app.app_context():
+        try:
+            backscan_pending_keywords()
+        except Exception as e:
+            print(f"关键词回扫失败: {e}")
+            db.session.rollback()
+
+
+def cleanup_recycle_bin(app, days=7):
+    """清理回收站中保留超过指定天数的文档，返回清理数量"""
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(days=days)
+
+        # 查找回收站中超期的文档
+        docs = Document.query.filter(
+            Document.is_deleted == True,
+            Document.deleted_at < cutoff
+        ).all()
+
+        count = len(docs)
+        for doc in docs:
+            db.session.delete(doc)
+
+        db.session.commit()
+        print(f"已清理 {count} 个超过 {days} 天的回收站文档。")
+        return count
+
+
+def init_scheduler(app):
+    """
+    初始化定时任务调度器并以暂停状态启动
+    由后台运行时在成为主节点时恢复、失去主节点时暂停，保证只有一个进程执行定时任务
+    """
+    try:
+        from flask_apscheduler import APScheduler
+    except ImportError:
+        print("⚠️ Flask-APScheduler not installed, skipping scheduler.")
+        return None
+
+    try:
+        scheduler = APScheduler()
+        scheduler.init_app(app)
+        # 提醒由延迟队列实时发送，此任务仅兜底补发
+        scheduler.add_job(id='check_notifications', func=check_notifications, args=[app],
+                          trigger='interval', minutes=5)
+        # 反馈浏览量 / 点赞计数回写
+        scheduler.add_job(id='flush_feedback_counters', func=flush_feedback_counters, args=[app],
+                          trigger='interval', seconds=app.config.get('FEEDBACK_COUNTER_FLUSH_INTERVAL', 10))
+        # 新增监控关键词的存量文档回扫
+        scheduler.add_job(id='backscan_monitor_keywords', func=backscan_monitor_keywords, args=[app],
+                          trigger='interval', seconds=app.config.get('MONITOR_BACKSCAN_INTERVAL', 10))
+        # 每天凌晨 2 点清理回收站
+        scheduler.add_job(id='cleanup_recycle_bin', func=cleanup_recycle_bin, args=[app],
+                          trigger='cron', hour=2, minute=0)
+        scheduler.start(paused=True)
+        print("✅ Scheduler started.")
+        return scheduler
+    except Exception as e:
+        print(f"⚠️ Scheduler start failed: {e}")
+        return None
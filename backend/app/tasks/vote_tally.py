@@ -0,0 +1,73 @@
+"""
+投票实时计票推送
+submit_vote 提交后在 Redis 哈希中累加各选项的票数增量，主节点上的推送线程每隔固定间隔
+取出累计的增量，按投票合并为一条事件推送到对应的 Socket.IO 房间。
+热门投票期间每个间隔每个投票最多推送一次，客户端在列表快照上叠加增量，无需反复刷新
+"""
+import time
+import threading
+from app.extensions import redis_client
+from app.realtime import VOTE_TALLY_EVENT, push_to_vote
+
+VOTE_TALLY_DELTA_KEY = "vote_tally_delta"
+
+# 原子地取出并清空累计增量，避免取出与清空之间的新增量丢失
+_DRAIN_SCRIPT = """
+local deltas = redis.call('hgetall', KEYS[1])
+redis.call('del', KEYS[1])
+return deltas
+"""
+
+
+def record_vote(vote_id, option_key):
+    """登记一张新票，等待下一次合并推送"""
+    try:
+        redis_client.hincrby(VOTE_TALLY_DELTA_KEY, f"{vote_id}:{option_key}", 1)
+    except Exception as e:
+        # 推送失败不影响投票结果，客户端刷新列表即可取得最新计票
+        print(f"登记计票增量失败 {vote_id}: {e}")
+
+
+def drain_vote_tally_deltas():
+    """取出累计的增量，返回 {vote_id: {option_key: n}}"""
+    raw = redis_client.eval(_DRAIN_SCRIPT, 1, VOTE_TALLY_DELTA_KEY)
+    deltas = {}
+    for i in range(0, len(raw), 2):
+        vote_id, _, option_key = raw[i].decode().partition(':')
+        deltas.setdefault(int(vote_id), {})[option_key] = int(raw[i + 1])
+    return deltas
+
+
+def broadcast_vote_tallies():
+    """将累计的增量按投票合并推送，返回推送的投票数"""
+    deltas = drain_vote_tally_deltas()
+    for vote_id, options in deltas.items():
+        push_to_vote(vote_id, {
+            'vote_id': vote_id,
+            'deltas': options,
+            'total_delta': sum(options.values())
+        }, event=VOTE_TALLY_EVENT)
+    return len(deltas)
+
+
+def vote_tally_broadcaster(app, runtime=None):
+    """后台线程：按 VOTE_TALLY_BROADCAST_INTERVAL 合并推送计票增量"""
+    interval = app.config.get('VOTE_TALLY_BROADCAST_INTERVAL', 500) / 1000
+    with app.app_context():
+        while True:
+            # 仅在后台运行时的主节点上推送，避免同一增量被多个进程重复取出
+            if runtime is not None and not runtime.is_leader:
+                runtime.wait_for_leadership()
+
+            try:
+                broadcast_vote_tallies()
+            except Exception as e:
+                app.logger.warning(f"计票推送线程异常: {e}")
+            time.sleep(interval)
+
+
+def start_vote_tally_broadcaster(app, runtime=None):
+    """以守护线程启动计票推送，随应用生命周期运行"""
+    thread = threading.Thread(target=vote_tally_broadcaster, args=(app, runtime))
+    thread.daemon = True
+    thread.start()
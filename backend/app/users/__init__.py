@@ -5,9 +5,10 @@ import os
 import uuid
 from datetime import datetime
 
-from ..models.models import User, SystemNotification
+from ..models.models import User, SystemNotification, BroadcastNotification
 from ..extensions import db
 from ..utils.minio_service import upload_file_to_minio, delete_file_by_url
+from ..utils.notification_service import NotificationService
 
 users_bp = Blueprint('users', __name__)
 
@@ -156,27 +157,27 @@ def change_password():
 @users_bp.route('/notifications', methods=['GET'])
 @jwt_required()
 def get_notifications():
-    """获取用户的系统通知（未读在前）"""
+    """获取用户的系统通知（个人通知与全员通知合并，未读在前，优先读取 Redis 缓存）"""
     current_user_id = int(get_jwt_identity())
-    print(f"获取通知的用户ID: {current_user_id}")
     try:
-        notifications = SystemNotification.query.filter_by(user_id=current_user_id)\
-            .order_by(SystemNotification.is_read.asc(), SystemNotification.created_at.desc())\
-            .limit(20).all() # 只取最近20条
+        notifications, _ = NotificationService.get_cached(current_user_id) # 只取最近20条
     except Exception as e:
         print(f"查询通知失败: {e}")
         return jsonify([]), 200
     
-    return jsonify([
-        {
-            'id': n.id,
-            'title': n.title,
-            'content': n.content,
-            'is_read': n.is_read,
-            'created_at': n.created_at.isoformat(),
-            'type': n.type
-        } for n in notifications
-    ]), 200
+    return jsonify(notifications), 200
+
+@users_bp.route('/notifications/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    """获取未读通知数（读取 Redis 缓存）"""
+    current_user_id = int(get_jwt_identity())
+    try:
+        _, unread = NotificationService.get_cached(current_user_id)
+    except Exception as e:
+        print(f"查询未读数失败: {e}")
+        return jsonify({'count': 0}), 200
+    return jsonify({'count': unread}), 200
 
 @users_bp.route('/notifications/<int:id>/read', methods=['PUT'])
 @jwt_required()
@@ -188,7 +189,17 @@ def mark_read(id):
     if notification.user_id != current_user_id:
         return jsonify({'error': '无权限'}), 403
         
-    notification.is_read = True
+    NotificationService.mark_read(current_user_id, notification)
+    db.session.commit()
+    return jsonify({'message': '已读'}), 200
+
+@users_bp.route('/notifications/b<int:id>/read', methods=['PUT'])
+@jwt_required()
+def mark_broadcast_read(id):
+    """标记全员通知已读"""
+    current_user_id = int(get_jwt_identity())
+    BroadcastNotification.query.get_or_404(id)
+    NotificationService.mark_broadcast_read(current_user_id, id)
     db.session.commit()
     return jsonify({'message': '已读'}), 200
 
@@ -198,8 +209,7 @@ def mark_all_read():
     """全部已读"""
     current_user_id = int(get_jwt_identity())
     try:
-        SystemNotification.query.filter_by(user_id=current_user_id, is_read=False)\
-            .update({'is_read': True})
+        NotificationService.mark_all_read(current_user_id)
         db.session.commit()
         return jsonify({'message': '全部已读成功'}), 200
     except Exception as e:
@@ -212,7 +222,7 @@ def clear_all_notifications():
     """清空所有通知"""
     current_user_id = int(get_jwt_identity())
     try:
-        SystemNotification.query.filter_by(user_id=current_user_id).delete()
+        NotificationService.clear_all(current_user_id)
         db.session.commit()
         return jsonify({'message': '通知已清空'}), 200
     except Exception as e:
@@ -1,14 +1,35 @@
 """
 AES 加密解密服务
 用于隐私空间文档内容的加密存储
+
+密文格式：
+- v1（旧格式）: base64(salt + nonce + tag + ciphertext)，每条密文独立加盐，
+  每次加解密都要执行一次 PBKDF2 派生
+- v2: "v2:" + base64(nonce + tag + ciphertext)，密钥由密码与用户级盐值派生，
+  在验证隐私空间密码时派生一次并缓存于会话中，后续只需 AES-GCM 运算
 """
 import os
 import base64
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
+# v2 密文前缀（v1 密文为纯 base64，不会包含冒号）
+KEY_CIPHER_PREFIX = 'v2:'
+
+# 批量解密线程数；cryptography 的底层运算会释放 GIL，可真正并行
+BATCH_DECRYPT_WORKERS = min(8, os.cpu_count() or 1)
+# 批量密文总长度低于该值时直接在当前线程解密，线程调度开销大于收益
+BATCH_INLINE_THRESHOLD = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
 
 def derive_key(password: str, salt: bytes) -> bytes:
     """
@@ -25,13 +46,95 @@ def derive_key(password: str, salt: bytes) -> bytes:
     return kdf.derive(password.encode('utf-8'))
 
 
-def encrypt_content(content: str, password: str) -> str:
+def generate_user_salt() -> str:
+    """
+    生成用户级密钥派生盐值（十六进制字符串，存储于 User.privacy_salt）
+    """
+    return os.urandom(16).hex()
+
+
+def derive_user_key(password: str, salt_hex: str) -> bytes:
+    """
+    使用用户级盐值派生隐私空间会话密钥
+    """
+    return derive_key(password, bytes.fromhex(salt_hex))
+
+
+def _gcm_encrypt(key: bytes, plaintext: bytes) -> bytes:
+    """AES-256-GCM 加密，返回 nonce(12) + tag(16) + ciphertext"""
+    nonce = os.urandom(12)
+    encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend()).encryptor()
+    ciphertext = encryptor.update(plaintext) + encryptor.finalize()
+    return nonce + encryptor.tag + ciphertext
+
+
+def _gcm_decrypt(key: bytes, data: bytes) -> bytes:
+    """解密 _gcm_encrypt 的输出"""
+    nonce, tag, ciphertext = data[:12], data[12:28], data[28:]
+    decryptor = Cipher(algorithms.AES(key), modes.GCM(nonce, tag), backend=default_backend()).decryptor()
+    return decryptor.update(ciphertext) + decryptor.finalize()
+
+
+def is_key_encrypted(encrypted_content: str) -> bool:
+    """
+    判断密文是否为 v2（会话密钥）格式
+    """
+    return bool(encrypted_content) and encrypted_content.startswith(KEY_CIPHER_PREFIX)
+
+
+def encrypt_with_key(content: str, key: bytes) -> str:
+    """
+    使用已派生的会话密钥加密内容（v2 格式）
+    """
+    if not content:
+        return content
+    encrypted_data = _gcm_encrypt(key, content.encode('utf-8'))
+    return KEY_CIPHER_PREFIX + base64.b64encode(encrypted_data).decode('utf-8')
+
+
+def decrypt_with_key(encrypted_content: str, key: bytes) -> str:
+    """
+    使用已派生的会话密钥解密 v2 格式密文
+    """
+    if not encrypted_content:
+        return encrypted_content
+    try:
+        encrypted_data = base64.b64decode(encrypted_content[len(KEY_CIPHER_PREFIX):].encode('utf-8'))
+        return _gcm_decrypt(key, encrypted_data).decode('utf-8')
+    except Exception as e:
+        raise ValueError(f"解密失败: {str(e)}")
+
+
+def _session_wrapping_key(token: str, secret: str) -> bytes:
+    return hmac.new(secret.encode('utf-8'), token.encode('utf-8'), hashlib.sha256).digest()
+
+
+def wrap_session_key(key: bytes, token: str, secret: str) -> bytes:
+    """
+    用访问令牌包装会话密钥，缓存中只保存包装后的密文，
+    没有令牌无法还原密钥
+    """
+    return _gcm_encrypt(_session_wrapping_key(token, secret), key)
+
+
+def unwrap_session_key(wrapped: bytes, token: str, secret: str) -> bytes:
+    """
+    还原 wrap_session_key 包装的会话密钥
+    """
+    return _gcm_decrypt(_session_wrapping_key(token, secret), wrapped)
+
+
+def encrypt_content(content: str, password: str = None, key: bytes = None) -> str:
     """
     使用 AES-256-GCM 加密内容
-    返回格式: base64(salt + nonce + tag + ciphertext)
+    提供会话密钥时输出 v2 格式，否则使用密码按 v1 格式加密:
+    base64(salt + nonce + tag + ciphertext)
     """
     if not content:
         return content
+
+    if key is not None:
+        return encrypt_with_key(content, key)
     
     # 生成随机盐值和 nonce
     salt = os.urandom(16)
@@ -61,12 +164,21 @@ def encrypt_content(content: str, password: str) -> str:
     return base64.b64encode(encrypted_data).decode('utf-8')
 
 
-def decrypt_content(encrypted_content: str, password: str) -> str:
+def decrypt_content(encrypted_content: str, password: str = None, key: bytes = None) -> str:
     """
     解密 AES-256-GCM 加密的内容
+    v2 密文需要会话密钥，v1 密文需要密码
     """
     if not encrypted_content:
         return encrypted_content
+
+    if is_key_encrypted(encrypted_content):
+        if key is None:
+            raise ValueError("解密失败: 缺少会话密钥")
+        return decrypt_with_key(encrypted_content, key)
+
+    if not password:
+        raise ValueError("解密失败: 旧格式密文需要提供密码")
     
     try:
         # Base64 解码
@@ -98,6 +210,64 @@ def decrypt_content(encrypted_content: str, password: str) -> str:
         raise ValueError(f"解密失败: {str(e)}")
 
 
+def _get_decrypt_pool():
+    """
+    获取批量解密使用的线程池
+    gevent worker 下 threading 已被 monkey patch，普通线程池只会变成协程，
+    此时改用 hub 自带的原生线程池
+    """
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            from gevent import get_hub
+            return get_hub().threadpool
+    except ImportError:
+        pass
+
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=BATCH_DECRYPT_WORKERS,
+                    thread_name_prefix='decrypt'
+                )
+    return _executor
+
+
+def _decrypt_chunk(chunk, password, key):
+    results = []
+    for encrypted_content in chunk:
+        try:
+            results.append(decrypt_content(encrypted_content, password, key=key))
+        except Exception as e:
+            results.append(e if isinstance(e, ValueError) else ValueError(f"解密失败: {str(e)}"))
+    return results
+
+
+def decrypt_contents(encrypted_items, password: str = None, key: bytes = None) -> list:
+    """
+    批量解密，返回与输入顺序一致的列表
+    单条解密失败不会中断整批，对应位置为 ValueError 实例，调用方自行判断
+    """
+    items = list(encrypted_items)
+    if not items:
+        return []
+
+    total_size = sum(len(item) for item in items if item)
+    if len(items) == 1 or BATCH_DECRYPT_WORKERS <= 1 or total_size < BATCH_INLINE_THRESHOLD:
+        return _decrypt_chunk(items, password, key)
+
+    # 按线程数切块提交，避免每条密文一次调度
+    chunk_size = -(-len(items) // BATCH_DECRYPT_WORKERS)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    pool = _get_decrypt_pool()
+    results = []
+    for chunk_result in pool.map(lambda chunk: _decrypt_chunk(chunk, password, key), chunks):
+        results.extend(chunk_result)
+    return results
+
+
 def encrypt_title(title: str, password: str) -> str:
     """
     加密文档标题（简化版，仅用于搜索场景）
@@ -0,0 +1,105 @@
+"""
+文档关键词监控标记
+文档写入时用当前全部监控关键词的自动机扫描正文，命中结果写入 document_flag 表；
+新增关键词时由后台任务只针对该关键词分批回扫存量文档。
+管理员监控页直接按标记表查询，不再每次全量扫描
+"""
+from datetime import datetime
+from sqlalchemy import insert
+from ..extensions import db
+from ..models.models import Document, DocumentFlag, MonitorKeyword
+from .keyword_matcher import get_matcher, strip_html_tags
+
+# 片段在命中位置前后保留的字符数
+SNIPPET_CONTEXT = 30
+BACKSCAN_BATCH_SIZE = 500
+
+# 写入时与回扫可能同时标记同一文档，重复行直接忽略
+_INSERT_FLAGS = insert(DocumentFlag) \
+    .prefix_with('IGNORE', dialect='mysql') \
+    .prefix_with('OR IGNORE', dialect='sqlite')
+
+
+def build_snippet(clean_content, keyword, idx):
+    """截取关键词命中位置附近的内容片段"""
+    start = max(0, idx - SNIPPET_CONTEXT)
+    end = min(len(clean_content), idx + len(keyword) + SNIPPET_CONTEXT)
+    return '...' + clean_content[start:end] + '...'
+
+
+def _match_flags(document_id, content, keywords):
+    """用 [(关键词ID, 关键词)] 扫描正文，返回待写入的标记行"""
+    if not content or not keywords:
+        return []
+    keyword_ids = {keyword: keyword_id for keyword_id, keyword in keywords}
+    clean_content = strip_html_tags(content)
+    return [
+        {
+            'document_id': document_id,
+            'keyword_id': keyword_ids[keyword],
+            'snippet': build_snippet(clean_content, keyword, idx),
+            'created_at': datetime.utcnow(),
+        }
+        for keyword, idx in get_matcher(list(keyword_ids)).find(clean_content)
+    ]
+
+
+def refresh_document_flags(documents):
+    """
+    按当前监控关键词重新计算文档的标记，documents 为 [(文档ID, 正文)]
+    由调用方负责提交事务
+    """
+    documents = list(documents)
+    if not documents:
+        return
+    keywords = db.session.query(MonitorKeyword.id, MonitorKeyword.keyword).all()
+
+    db.session.query(DocumentFlag).filter(
+        DocumentFlag.document_id.in_([document_id for document_id, _ in documents])
+    ).delete(synchronize_session=False)
+    rows = []
+    for document_id, content in documents:
+        rows.extend(_match_flags(document_id, content, keywords))
+    if rows:
+        db.session.execute(_INSERT_FLAGS, rows)
+
+
+def backscan_keyword(keyword):
+    """按主键分批回扫全部文档中的单个关键词，完成后记录 scanned_at，返回命中文档数"""
+    keywords = [(keyword.id, keyword.keyword)]
+    flagged = 0
+    last_id = 0
+    while True:
+        # 以主键翻页而非长时间持有游标，每批单独提交
+        batch = db.session.query(Document.id, Document.content) \
+            .filter(Document.id > last_id) \
+            .order_by(Document.id) \
+            .limit(BACKSCAN_BATCH_SIZE) \
+            .all()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        rows = []
+        for document_id, content in batch:
+            rows.extend(_match_flags(document_id, content, keywords))
+        if rows:
+            db.session.execute(_INSERT_FLAGS, rows)
+            flagged += len(rows)
+        db.session.commit()
+
+    # 回扫期间关键词可能已被删除
+    db.session.query(MonitorKeyword).filter_by(id=keyword.id) \
+        .update({'scanned_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return flagged
+
+
+def backscan_pending_keywords():
+    """回扫所有尚未回扫的关键词，返回处理的关键词数"""
+    pending = MonitorKeyword.query.filter(MonitorKeyword.scanned_at.is_(None)) \
+        .order_by(MonitorKeyword.id).all()
+    for keyword in pending:
+        flagged = backscan_keyword(keyword)
+        print(f"关键词【{keyword.keyword}】回扫完成，命中 {flagged} 篇文档。")
+    return len(pending)
@@ -1,13 +1,38 @@
-"""封装 Elasticsearch 文档索引的常用操作，方便统一维护。"""
-from typing import List, Optional
+"""封装 Elasticsearch 文档索引的常用操作，方便统一维护。
 
-from elasticsearch import NotFoundError
+文档的增删改不直接同步写 ES，而是先写入 Redis 中的索引发件箱（outbox），
+由后台线程批量消费。发件箱是一个以文档 ID 为 field 的 Hash，同一文档的多次
+修改会被自然合并为最后一次操作。
+"""
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from elasticsearch import NotFoundError, helpers
 from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.orm import undefer
 
-from ..extensions import es
+from ..extensions import es, redis_client
+from ..models.models import Document
 
 DOCUMENT_INDEX = "documents"
 DEFAULT_SEARCH_SIZE = 100
+# 高亮片段长度（字符）
+HIGHLIGHT_FRAGMENT_SIZE = 100
+# search_after 翻页使用的排序：相关度优先，更新时间与文档 ID 作为稳定的次序
+SEARCH_SORT = [
+    {"_score": {"order": "desc"}},
+    {"updated_at": {"order": "desc", "missing": "_last"}},
+    {"id": {"order": "desc", "missing": "_last"}},
+]
+
+# 索引发件箱：field 为文档 ID，value 为操作类型
+INDEX_OUTBOX_KEY = "es_index_outbox"
+OP_INDEX = "index"
+OP_DELETE = "delete"
+# 每次从数据库批量加载文档的数量
+OUTBOX_LOAD_CHUNK = 500
 
 
 def _get_client():
@@ -18,6 +43,69 @@ def _serialize_datetime(value):
     return value.isoformat() if value else None
 
 
+def _document_body(doc) -> dict:
+    return {
+        "id": doc.id,
+        "title": doc.title,
+        "content": doc.content or "",
+        "owner_id": doc.owner_id,
+        "created_at": _serialize_datetime(doc.created_at),
+        "updated_at": _serialize_datetime(doc.updated_at),
+    }
+
+
+def _is_indexable(doc) -> bool:
+    """回收站与隐私空间的文档不进入搜索索引。"""
+    return doc is not None and not doc.is_deleted and not doc.in_privacy_space
+
+
+def iter_document_actions(index: str = DOCUMENT_INDEX, since=None, batch_size: int = OUTBOX_LOAD_CHUNK) -> Iterator[dict]:
+    """流式生成重建索引所需的 bulk 操作。
+
+    全量模式只输出可索引的文档；指定 since 时输出该时间之后变更过的所有文档，
+    其中已删除或进入隐私空间的文档生成删除操作。
+    """
+    query = Document.query.options(undefer(Document.content)).order_by(Document.id.asc())
+    if since is None:
+        query = query.filter(Document.is_deleted == False, Document.in_privacy_space == False)
+    else:
+        query = query.filter(or_(Document.updated_at >= since, Document.deleted_at >= since))
+
+    # yield_per 使用服务端游标分批读取，内存占用与文档总量无关
+    for doc in query.yield_per(batch_size):
+        if _is_indexable(doc):
+            yield {"_op_type": "index", "_index": index, "_id": doc.id, "_source": _document_body(doc)}
+        else:
+            yield {"_op_type": "delete", "_index": index, "_id": doc.id}
+
+
+def iter_stale_document_actions(index: str = DOCUMENT_INDEX, batch_size: int = OUTBOX_LOAD_CHUNK) -> Iterator[dict]:
+    """扫描索引中的全部文档 ID，为数据库中已不存在或不可索引的文档生成删除操作。
+
+    iter_document_actions 只能看到仍存在的行，硬删除的文档需要比对索引与数据库的 ID 才能发现。
+    """
+    ids = []
+    for hit in helpers.scan(_get_client(), index=index, query={"query": {"match_all": {}}},
+                            _source=False, size=batch_size):
+        ids.append(int(hit["_id"]))
+        if len(ids) >= batch_size:
+            yield from _stale_delete_actions(index, ids)
+            ids = []
+    if ids:
+        yield from _stale_delete_actions(index, ids)
+
+
+def _stale_delete_actions(index: str, ids: List[int]) -> Iterator[dict]:
+    indexable = {
+        doc_id for (doc_id,) in Document.query.with_entities(Document.id).filter(
+            Document.id.in_(ids), Document.is_deleted == False, Document.in_privacy_space == False
+        )
+    }
+    for doc_id in ids:
+        if doc_id not in indexable:
+            yield {"_op_type": "delete", "_index": index, "_id": doc_id}
+
+
 def index_document(doc) -> bool:
     """将文档写入或更新到 Elasticsearch 索引中。"""
     client = _get_client()
@@ -28,14 +116,7 @@ def index_document(doc) -> bool:
         client.index(
             index=DOCUMENT_INDEX,
             id=doc.id,
-            document={
-                "title": doc.title,
-                "content": doc.content or "",
-                "owner_id": doc.owner_id,
-                "created_at": _serialize_datetime(doc.created_at),
-                "updated_at": _serialize_datetime(doc.updated_at),
-            },
-            refresh="wait_for",
+            document=_document_body(doc),
         )
         return True
     except Exception as exc:  # pylint: disable=broad-except
@@ -50,7 +131,7 @@ def delete_document_from_index(doc_id: int) -> bool:
         return False
 
     try:
-        client.delete(index=DOCUMENT_INDEX, id=doc_id, ignore=[404], refresh="wait_for")
+        client.delete(index=DOCUMENT_INDEX, id=doc_id, ignore=[404])
         return True
     except NotFoundError:
         return True
@@ -59,6 +140,121 @@ def delete_document_from_index(doc_id: int) -> bool:
         return False
 
 
+def queue_index_operations(operations: Dict[int, str]) -> bool:
+    """将索引操作写入发件箱，由后台线程批量同步到 ES。
+
+    Redis 不可用时退化为同步写 ES，保证索引最终仍会更新。
+    """
+    operations = {doc_id: op for doc_id, op in operations.items() if doc_id}
+    if not operations:
+        return True
+
+    try:
+        redis_client.hset(INDEX_OUTBOX_KEY, mapping=operations)
+        return True
+    except Exception as exc:  # pylint: disable=broad-except
+        current_app.logger.warning("Failed to queue index operations, falling back to sync: %s", exc)
+
+    for doc_id, op in operations.items():
+        if op == OP_INDEX:
+            doc = Document.query.get(doc_id)
+            if _is_indexable(doc):
+                index_document(doc)
+                continue
+        delete_document_from_index(doc_id)
+    return False
+
+
+def queue_document_index(doc_id: int) -> bool:
+    """在提交事务后调用，排队（重新）索引指定文档。"""
+    return queue_index_operations({doc_id: OP_INDEX})
+
+
+def queue_document_delete(doc_id: int) -> bool:
+    """在提交事务后调用，排队从索引中删除指定文档。"""
+    return queue_index_operations({doc_id: OP_DELETE})
+
+
+def _requeue(operations: Dict[int, str]):
+    """把处理失败的操作放回发件箱；期间若已有更新的操作则以新操作为准。"""
+    if not operations:
+        return
+    pipe = redis_client.pipeline()
+    for doc_id, op in operations.items():
+        pipe.hsetnx(INDEX_OUTBOX_KEY, doc_id, op)
+    pipe.execute()
+
+
+def _build_bulk_actions(operations: Dict[int, str]) -> List[dict]:
+    """根据数据库中的最新状态生成 bulk 请求；已删除或转入隐私空间的文档改为删除操作。"""
+    actions = []
+    index_ids = [doc_id for doc_id, op in operations.items() if op == OP_INDEX]
+    docs = {}
+    for start in range(0, len(index_ids), OUTBOX_LOAD_CHUNK):
+        chunk = index_ids[start:start + OUTBOX_LOAD_CHUNK]
+        for doc in Document.query.options(undefer(Document.content)).filter(Document.id.in_(chunk)):
+            docs[doc.id] = doc
+
+    for doc_id, op in operations.items():
+        doc = docs.get(doc_id)
+        if op == OP_INDEX and _is_indexable(doc):
+            actions.append({
+                "_op_type": "index",
+                "_index": DOCUMENT_INDEX,
+                "_id": doc_id,
+                "_source": _document_body(doc),
+            })
+        else:
+            actions.append({"_op_type": "delete", "_index": DOCUMENT_INDEX, "_id": doc_id})
+    return actions
+
+
+def drain_index_outbox() -> int:
+    """消费一次发件箱，返回成功同步到 ES 的操作数。
+
+    通过 RENAME 将发件箱原子地转移到本次处理专用的 key，多个进程同时消费时
+    不会重复处理，新产生的操作会写入新的发件箱留待下一轮。
+    """
+    client = _get_client()
+    if not client or not redis_client:
+        return 0
+
+    processing_key = f"{INDEX_OUTBOX_KEY}:processing:{uuid.uuid4().hex}"
+    try:
+        if not redis_client.renamenx(INDEX_OUTBOX_KEY, processing_key):
+            return 0
+    except Exception:  # pylint: disable=broad-except
+        # 发件箱不存在（没有待处理操作）时 RENAMENX 会报错
+        return 0
+    # 进程在处理中途退出时避免遗留 key 永久占用内存，遗漏的文档可通过重建索引脚本补齐
+    redis_client.expire(processing_key, 3600)
+
+    raw = redis_client.hgetall(processing_key)
+    operations = {int(doc_id): op.decode("utf-8") for doc_id, op in raw.items()}
+    try:
+        actions = _build_bulk_actions(operations)
+        success, errors = helpers.bulk(client, actions, raise_on_error=False, raise_on_exception=False)
+    except Exception as exc:  # pylint: disable=broad-except
+        current_app.logger.warning("Bulk indexing failed, %s operations requeued: %s", len(operations), exc)
+        _requeue(operations)
+        redis_client.delete(processing_key)
+        return 0
+
+    failed = {}
+    for error in errors:
+        op_type, item = next(iter(error.items()))
+        # 删除不存在的文档视为成功
+        if op_type == "delete" and item.get("status") == 404:
+            continue
+        doc_id = int(item.get("_id"))
+        failed[doc_id] = operations.get(doc_id, OP_INDEX)
+    if failed:
+        current_app.logger.warning("Bulk indexing: %s operations failed and were requeued", len(failed))
+        _requeue(failed)
+    redis_client.delete(processing_key)
+    return success
+
+
 def search_document_ids(query: str, owner_id: int, limit: int = DEFAULT_SEARCH_SIZE) -> Optional[List[int]]:
     """基于关键词与用户 ID 在 Elasticsearch 中搜索，返回匹配的文档 ID 顺序。
 
@@ -74,22 +270,7 @@ def search_document_ids(query: str, owner_id: int, limit: int = DEFAULT_SEARCH_S
         response = client.search(
             index=DOCUMENT_INDEX,
             size=limit,
-            query={
-                "bool": {
-                    "must": [
-                        {
-                            "multi_match": {
-                                "query": keyword,
-                                "fields": ["title^3", "content"],
-                                "type": "best_fields",
-                            }
-                        }
-                    ],
-                    "filter": [
-                        {"term": {"owner_id": owner_id}},
-                    ],
-                }
-            },
+            query=_build_search_query(keyword, owner_id),
             source=False,
         )
         hits = response.get("hits", {}).get("hits", [])
@@ -100,3 +281,123 @@ def search_document_ids(query: str, owner_id: int, limit: int = DEFAULT_SEARCH_S
     except Exception as exc:  # pylint: disable=broad-except
         current_app.logger.warning("Elasticsearch search error: %s", exc)
         return None
+
+
+def search_document_hits(query: str, owner_id: int, size: int = DEFAULT_SEARCH_SIZE,
+                         search_after: Optional[list] = None) -> Optional[List[tuple]]:
+    """按相关度排序分页检索文档 ID，返回 [(文档 ID, 排序值)]，排序值可作为下一页的 search_after。
+
+    ES 不可用或查询异常时返回 None，索引不存在时返回空列表。
+    """
+    client = _get_client()
+    keyword = (query or "").strip()
+    if not client or not keyword:
+        return None if not client else []
+
+    try:
+        response = client.search(
+            index=DOCUMENT_INDEX,
+            size=size,
+            query=_build_search_query(keyword, owner_id),
+            sort=SEARCH_SORT,
+            search_after=search_after or None,
+            source=False,
+        )
+    except NotFoundError:
+        current_app.logger.warning("Elasticsearch index '%s' not found", DOCUMENT_INDEX)
+        return []
+    except Exception as exc:  # pylint: disable=broad-except
+        current_app.logger.warning("Elasticsearch search error: %s", exc)
+        return None
+    return [(int(hit["_id"]), hit.get("sort")) for hit in response.get("hits", {}).get("hits", [])]
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _build_search_query(keyword: str, owner_id: int) -> dict:
+    return {
+        "bool": {
+            "must": [
+                {
+                    "multi_match": {
+                        "query": keyword,
+                        "fields": ["title^3", "content"],
+                        "type": "best_fields",
+                    }
+                }
+            ],
+            "filter": [
+                {"term": {"owner_id": owner_id}},
+            ],
+        }
+    }
+
+
+def search_documents(query: str, owner_id: int, size: int = DEFAULT_SEARCH_SIZE,
+                     search_after: Optional[list] = None) -> Optional[dict]:
+    """在 ES 中完成检索、排序、高亮与分页，直接返回可展示的结果。
+
+    返回 {"total": int, "hits": [...], "sort": list | None}，其中 sort 为最后一条结果的
+    排序值，可作为下一页的 search_after；ES 不可用时返回 None 以便调用方回退数据库检索。
+    """
+    client = _get_client()
+    keyword = (query or "").strip()
+    if not client:
+        return None
+    if not keyword:
+        return {"total": 0, "hits": [], "sort": None}
+
+    try:
+        response = client.search(
+            index=DOCUMENT_INDEX,
+            size=size,
+            query=_build_search_query(keyword, owner_id),
+            sort=SEARCH_SORT,
+            search_after=search_after or None,
+            track_total_hits=True,
+            source=["title", "updated_at"],
+            highlight={
+                "pre_tags": ["<em>"],
+                "post_tags": ["</em>"],
+                "fields": {
+                    "title": {"number_of_fragments": 0},
+                    "content": {"fragment_size": HIGHLIGHT_FRAGMENT_SIZE, "number_of_fragments": 1},
+                },
+            },
+        )
+    except NotFoundError:
+        current_app.logger.warning("Elasticsearch index '%s' not found", DOCUMENT_INDEX)
+        return {"total": 0, "hits": [], "sort": None}
+    except Exception as exc:  # pylint: disable=broad-except
+        current_app.logger.warning("Elasticsearch search error: %s", exc)
+        return None
+
+    hits = response.get("hits", {})
+    results = []
+    for hit in hits.get("hits", []):
+        source = hit.get("_source") or {}
+        highlight = hit.get("highlight") or {}
+        results.append({
+            "id": int(hit["_id"]),
+            "title": source.get("title"),
+            "updated_at": _parse_datetime(source.get("updated_at")),
+            "score": hit.get("_score"),
+            "highlight": {
+                "title": (highlight.get("title") or [None])[0],
+                "content": (highlight.get("content") or [None])[0],
+            },
+        })
+
+    raw_hits = hits.get("hits", [])
+    return {
+        "total": hits.get("total", {}).get("value", len(results)),
+        "hits": results,
+        "sort": raw_hits[-1].get("sort") if raw_hits else None,
+    }
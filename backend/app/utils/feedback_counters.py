@@ -0,0 +1,285 @@
+"""
+反馈帖子的浏览量与点赞计数
+浏览量增量累加在 Redis 哈希中，点赞以 Redis 集合记录点赞用户，阅读与点赞不再锁 feedback 行；
+主节点定时将增量与点赞集合回写（write-behind）到 MySQL。
+浏览量回写至多生效一次：进程在提交数据库后、清理 Redis 前崩溃时，遗留的增量在下次回写时丢弃而不重复累加，
+最多损失一个回写周期的浏览量；数据库写入失败时增量退回 Redis 待下次回写。
+点赞以 Redis 为准，Redis 不可用时点赞接口返回 503，不回退到数据库，避免两边各自变更后相互覆盖。
+
+点赞集合在首次点赞时从数据库加载，之后以 Redis 为准；尚未加载的目标没有待回写的变更，
+读取时直接使用数据库中的值。集合带过期时间，点赞时续期、回写后重新设置，
+长期无人点赞的集合自然过期，之后再点赞时重新从数据库加载
+"""
+from sqlalchemy import bindparam, func
+from ..extensions import db, redis_client
+from ..models.models import Feedback, FeedbackLike, FeedbackReply, FeedbackReplyLike
+
+VIEW_PENDING_KEY = "feedback_views:pending"
+VIEW_FLUSHING_KEY = "feedback_views:flushing"
+LIKE_KEY_PREFIX = "feedback_likes:"
+LIKE_DIRTY_PREFIX = "feedback_likes_dirty:"
+FLUSH_BATCH_SIZE = 200
+# 点赞集合的过期时间（秒），远大于回写周期，待回写的集合不会在回写前过期
+LIKE_KEY_TTL = 7 * 24 * 3600
+# 点赞集合中的占位成员，用于区分"已加载的空集合"与"尚未加载"
+_SENTINEL = '-'
+
+# 点赞类型 -> (点赞模型, 外键列名, 被点赞模型, 冗余计数列名)
+LIKE_TYPES = {
+    'feedback': (FeedbackLike, 'feedback_id', Feedback, 'like_count'),
+    'reply': (FeedbackReplyLike, 'reply_id', FeedbackReply, None),
+}
+
+# 仅在集合不存在时写入数据库中的点赞用户，避免覆盖并发点赞
+_LOAD_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    redis.call('sadd', KEYS[1], unpack(ARGV, 2))
+    redis.call('expire', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# 切换点赞状态并登记待回写；集合未加载时返回 nil
+_TOGGLE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return nil
+end
+local liked = 1
+if redis.call('sismember', KEYS[1], ARGV[1]) == 1 then
+    redis.call('srem', KEYS[1], ARGV[1])
+    liked = 0
+else
+    redis.call('sadd', KEYS[1], ARGV[1])
+end
+redis.call('expire', KEYS[1], ARGV[3])
+redis.call('sadd', KEYS[2], ARGV[2])
+return {liked, redis.call('scard', KEYS[1]) - 1}
+"""
+
+# 将待回写的浏览量增量转入 flushing 哈希；上次回写遗留的数据无法确定是否已提交，直接丢弃
+_ROTATE_VIEWS_SCRIPT = """
+redis.call('del', KEYS[2])
+if redis.call('exists', KEYS[1]) == 1 then
+    redis.call('rename', KEYS[1], KEYS[2])
+end
+return redis.call('hgetall', KEYS[2])
+"""
+
+# 数据库写入失败时将 flushing 中的增量退回待回写哈希
+_RESTORE_VIEWS_SCRIPT = """
+local data = redis.call('hgetall', KEYS[2])
+for i = 1, #data, 2 do
+    redis.call('hincrby', KEYS[1], data[i], data[i + 1])
+end
+redis.call('del', KEYS[2])
+return #data / 2
+"""
+
+
+class FeedbackCounters:
+    """反馈浏览量 / 点赞计数服务类"""
+
+    @staticmethod
+    def _like_key(kind, target_id):
+        return f"{LIKE_KEY_PREFIX}{kind}:{target_id}"
+
+    @staticmethod
+    def record_view(feedback_id):
+        """记录一次浏览，返回尚未回写数据库的浏览量增量；Redis 不可用时返回 None"""
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hincrby(VIEW_PENDING_KEY, feedback_id, 1)
+            pipe.hget(VIEW_FLUSHING_KEY, feedback_id)
+            pending, flushing = pipe.execute()
+            return int(pending) + int(flushing or 0)
+        except Exception as e:
+            print(f"记录浏览量失败 {feedback_id}: {e}")
+            return None
+
+    @staticmethod
+    def pending_views(feedback_ids):
+        """批量获取尚未回写的浏览量增量 {id: n}"""
+        if not feedback_ids:
+            return {}
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hmget(VIEW_PENDING_KEY, feedback_ids)
+            pipe.hmget(VIEW_FLUSHING_KEY, feedback_ids)
+            pending, flushing = pipe.execute()
+        except Exception as e:
+            print(f"读取浏览量失败: {e}")
+            return {}
+        return {
+            feedback_id: int(a or 0) + int(b or 0)
+            for feedback_id, a, b in zip(feedback_ids, pending, flushing)
+        }
+
+    @staticmethod
+    def like_states(kind, target_ids, user_id):
+        """
+        批量获取点赞状态 {id: (点赞数, 当前用户是否点赞)}
+        只包含点赞集合已加载到 Redis 的目标，其余以数据库为准
+        """
+        if not target_ids:
+            return {}
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for target_id in target_ids:
+                key = FeedbackCounters._like_key(kind, target_id)
+                pipe.scard(key)
+                pipe.sismember(key, user_id)
+            results = pipe.execute()
+        except Exception as e:
+            print(f"读取点赞状态失败: {e}")
+            return {}
+
+        states = {}
+        for i, target_id in enumerate(target_ids):
+            size, is_member = results[2 * i], results[2 * i + 1]
+            if size:
+                states[target_id] = (size - 1, bool(is_member))
+        return states
+
+    @staticmethod
+    def _load_likes(kind, target_id):
+        like_model, fk_name, _, _ = LIKE_TYPES[kind]
+        user_ids = [
+            str(user_id) for (user_id,) in
+            db.session.query(like_model.user_id).filter(getattr(like_model, fk_name) == target_id)
+        ]
+        redis_client.eval(
+            _LOAD_SCRIPT, 1, FeedbackCounters._like_key(kind, target_id), LIKE_KEY_TTL, _SENTINEL, *user_ids
+        )
+
+    @staticmethod
+    def toggle_like(kind, target_id, user_id):
+        """
+        切换点赞状态，返回 (是否点赞, 点赞数)；数据库由回写任务更新
+        Redis 不可用时抛出异常，由调用方返回 503
+        """
+        keys = (FeedbackCounters._like_key(kind, target_id), LIKE_DIRTY_PREFIX + kind)
+        args = (user_id, target_id, LIKE_KEY_TTL)
+        result = redis_client.eval(_TOGGLE_SCRIPT, 2, *keys, *args)
+        if result is None:
+            FeedbackCounters._load_likes(kind, target_id)
+            result = redis_client.eval(_TOGGLE_SCRIPT, 2, *keys, *args)
+        liked, count = result
+        return bool(liked), int(count)
+
+    @staticmethod
+    def discard(kind, target_ids):
+        """删除帖子 / 回复后清理对应的计数数据"""
+        if not target_ids:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.delete(*[FeedbackCounters._like_key(kind, target_id) for target_id in target_ids])
+            pipe.srem(LIKE_DIRTY_PREFIX + kind, *target_ids)
+            if kind == 'feedback':
+                pipe.hdel(VIEW_PENDING_KEY, *target_ids)
+            pipe.execute()
+        except Exception as e:
+            print(f"清理计数失败 {kind}: {e}")
+
+    @staticmethod
+    def flush_views():
+        """将浏览量增量回写数据库，返回更新的帖子数"""
+        raw = redis_client.eval(_ROTATE_VIEWS_SCRIPT, 2, VIEW_PENDING_KEY, VIEW_FLUSHING_KEY)
+        if not raw:
+            return 0
+
+        params = [
+            {'fid': int(raw[i]), 'n': int(raw[i + 1])}
+            for i in range(0, len(raw), 2)
+        ]
+        table = Feedback.__table__
+        try:
+            db.session.execute(
+                table.update()
+                .where(table.c.id == bindparam('fid'))
+                .values(view_count=func.coalesce(table.c.view_count, 0) + bindparam('n')),
+                params
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            redis_client.eval(_RESTORE_VIEWS_SCRIPT, 2, VIEW_PENDING_KEY, VIEW_FLUSHING_KEY)
+            raise
+        redis_client.delete(VIEW_FLUSHING_KEY)
+        return len(params)
+
+    @staticmethod
+    def flush_likes(kind):
+        """将有变更的点赞集合与数据库对齐，返回处理的目标数"""
+        like_model, fk_name, target_model, counter_name = LIKE_TYPES[kind]
+        fk_column = getattr(like_model, fk_name)
+        dirty_key = LIKE_DIRTY_PREFIX + kind
+        total = 0
+
+        while True:
+            target_ids = [int(i) for i in redis_client.spop(dirty_key, FLUSH_BATCH_SIZE) or []]
+            if not target_ids:
+                return total
+
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                for target_id in target_ids:
+                    pipe.smembers(FeedbackCounters._like_key(kind, target_id))
+                # 集合已不存在（过期或被清理）时没有可回写的数据，跳过而不是当作无人点赞
+                members = {
+                    target_id: {int(m) for m in raw if m not in (_SENTINEL, _SENTINEL.encode())}
+                    for target_id, raw in zip(target_ids, pipe.execute()) if raw
+                }
+
+                # 已删除的帖子 / 回复不再回写，同时清理遗留集合
+                alive = {
+                    target_id for (target_id,) in
+                    db.session.query(target_model.id).filter(target_model.id.in_(list(members)))
+                } if members else set()
+                removed = [target_id for target_id in members if target_id not in alive]
+                if removed:
+                    redis_client.delete(*[FeedbackCounters._like_key(kind, i) for i in removed])
+
+                stored = {target_id: set() for target_id in alive}
+                for target_id, user_id in db.session.query(fk_column, like_model.user_id).filter(fk_column.in_(alive)):
+                    stored[target_id].add(user_id)
+
+                inserts = []
+                for target_id in alive:
+                    wanted = members[target_id]
+                    inserts.extend(
+                        {fk_name: target_id, 'user_id': user_id}
+                        for user_id in wanted - stored[target_id]
+                    )
+                    unliked = stored[target_id] - wanted
+                    if unliked:
+                        db.session.query(like_model).filter(
+                            fk_column == target_id,
+                            like_model.user_id.in_(unliked)
+                        ).delete(synchronize_session=False)
+                if inserts:
+                    db.session.bulk_insert_mappings(like_model, inserts)
+
+                if counter_name and alive:
+                    table = target_model.__table__
+                    db.session.execute(
+                        table.update()
+                        .where(table.c.id == bindparam('tid'))
+                        .values({counter_name: bindparam('n')}),
+                        [{'tid': target_id, 'n': len(members[target_id])} for target_id in alive]
+                    )
+                db.session.commit()
+                total += len(target_ids)
+            except Exception:
+                db.session.rollback()
+                # 放回待回写集合，下次重试
+                redis_client.sadd(dirty_key, *target_ids)
+                raise
+
+            # 已回写的集合重新设置过期时间；回写期间又被点赞的集合已由点赞续期
+            if alive:
+                pipe = redis_client.pipeline(transaction=False)
+                for target_id in alive:
+                    pipe.expire(FeedbackCounters._like_key(kind, target_id), LIKE_KEY_TTL)
+                pipe.execute()
@@ -0,0 +1,117 @@
+"""
+多关键词匹配（Aho-Corasick 自动机）
+对文本只扫描一遍即可找出全部命中的关键词，耗时与文本长度线性相关，与关键词数量基本无关。
+安装 pyahocorasick 时使用其 C 实现，否则退回纯 Python 实现
+"""
+import re
+from collections import deque
+from functools import lru_cache
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+_HTML_TAG_RE = re.compile('<.*?>')
+
+
+def strip_html_tags(text):
+    """去除HTML标签与多余空白，保留纯文本"""
+    if not text:
+        return ''
+    # str.split() 合并空白比正则替换快数倍，结果一致
+    return ' '.join(_HTML_TAG_RE.sub('', text).split())
+
+
+class KeywordMatcher:
+    """大小写不敏感的多关键词匹配器，构建后可重复用于任意多段文本"""
+
+    def __init__(self, keywords):
+        # 去重并保持调用方给出的顺序，命中结果按此顺序返回
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        patterns = {}
+        for index, keyword in enumerate(self.keywords):
+            patterns.setdefault(keyword.lower(), []).append(index)
+        self._patterns = {pattern: (tuple(indexes), len(pattern)) for pattern, indexes in patterns.items()}
+
+        if not self._patterns:
+            self._automaton = None
+        elif ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for pattern, value in self._patterns.items():
+                self._automaton.add_word(pattern, value)
+            self._automaton.make_automaton()
+        else:
+            self._build_fallback()
+
+    def _build_fallback(self):
+        """构建纯 Python 版自动机：trie 转移表、失败指针与输出表"""
+        goto, output = [{}], [[]]
+        for pattern, value in self._patterns.items():
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    output.append([])
+                node = nxt
+            output[node].append(value)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                output[nxt] = output[nxt] + output[fail[nxt]]
+
+        self._automaton = None
+        self._goto, self._fail, self._output = goto, fail, output
+
+    def _iter_matches(self, text):
+        """依次产出 (结束位置, (关键词下标, 长度))"""
+        if ahocorasick is not None:
+            yield from self._automaton.iter(text)
+            return
+
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for value in output[node]:
+                yield pos, value
+
+    def find(self, text):
+        """
+        返回文本中命中的关键词及其首次出现位置 [(关键词, 位置), ...]，按关键词顺序排列
+        位置基于 text.lower()
+        """
+        if not text or not self._patterns:
+            return []
+
+        first_seen = {}
+        for end, (indexes, length) in self._iter_matches(text.lower()):
+            for index in indexes:
+                if index not in first_seen:
+                    first_seen[index] = end - length + 1
+            if len(first_seen) == len(self.keywords):
+                break
+        return [(self.keywords[index], first_seen[index]) for index in sorted(first_seen)]
+
+
+@lru_cache(maxsize=16)
+def _compile(keywords):
+    return KeywordMatcher(keywords)
+
+
+def get_matcher(keywords):
+    """获取关键词集合对应的匹配器；相同关键词复用已构建的自动机，关键词变化时重新构建"""
+    return _compile(tuple(keywords))
@@ -0,0 +1,374 @@
+"""
+应用级逻辑备份（NDJSON）
+按表导出数据行：带 updated_at 的表只导出水位线之后变更的行，只插入不更新的表（消息、点赞、投票等）按 created_at 增量导出，
+其余表每次全量导出。每张表都按主键顺序分块附带当前全部主键，恢复时逐块删除备份之间被删除的行，
+每块只覆盖相邻两块之间的主键区间，导出与恢复的内存占用与表大小无关。
+MinIO 附件桶生成对象 ETag 清单，对象按 ETag 在服务端复制到备份桶（objects/<桶>/<对象名>@<ETag>），
+同一版本只复制一次，恢复旧的备份链时取回的是清单中对应版本的内容。
+
+每行一条 JSON 记录：header → (row* → ids+ → table)* → object* → footer，footer 中的 until 即下一次增量备份的水位线。
+恢复时各表的行按批并行写入（存在则更新），附件按清单与 ETag 比对后从备份桶并行复制回原桶
+"""
+import base64
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from sqlalchemy import LargeBinary, select, tuple_
+from ..extensions import db
+from .minio_service import get_minio_client
+
+BACKUP_FORMAT_VERSION = 1
+# 需要备份的 MinIO 桶与存放对象副本的备份桶
+BACKUP_BUCKETS = ('documents', 'avatars', 'file-center')
+BACKUP_OBJECT_BUCKET = 'backups'
+BACKUP_OBJECT_PREFIX = 'objects/'
+EXPORT_BATCH_SIZE = 1000
+# 每条 ids 记录包含的主键数
+IDS_CHUNK_SIZE = 10000
+# 只插入、删除而从不更新的表，没有 updated_at 时按 created_at 增量导出
+APPEND_ONLY_TABLES = frozenset({
+    'ai_message',
+    'broadcast_notification',
+    'document_flag',
+    'feedback_like',
+    'feedback_reply_like',
+    'vote_record',
+})
+# 增量导出时水位线向前重叠的时间：时间戳在提交前生成，长事务提交的行可能早于上次的水位线；恢复按主键覆盖，重复导出无害
+WATERMARK_OVERLAP = timedelta(minutes=5)
+RESTORE_BATCH_SIZE = 500
+RESTORE_WORKERS = 4
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return value
+
+
+def _decode(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, LargeBinary):
+        return base64.b64decode(value)
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type in (datetime, date, time):
+        return python_type.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return value
+
+
+def _watermark_column(table):
+    """增量导出依据的时间列，没有时整表导出"""
+    if 'updated_at' in table.c:
+        return table.c.updated_at
+    if table.name in APPEND_ONLY_TABLES:
+        return table.c.created_at
+    return None
+
+
+def _iter_table(table, since):
+    """导出单张表的记录；有时间列的表按水位线增量导出"""
+    column = _watermark_column(table)
+    incremental = since is not None and column is not None
+    stmt = select(table)
+    if incremental:
+        stmt = stmt.where(column > since - WATERMARK_OVERLAP)
+    stmt = stmt.order_by(*table.primary_key).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    count = 0
+    result = db.session.execute(stmt)
+    try:
+        for row in result.mappings():
+            count += 1
+            yield {'type': 'row', 'table': table.name, 'data': {k: _encode(v) for k, v in row.items()}}
+    finally:
+        result.close()
+
+    # 行记录看不到硬删除，按主键顺序分块附上当前全部主键，恢复时逐块删除多余的行
+    yield from _iter_id_chunks(table)
+    yield {'type': 'table', 'table': table.name, 'rows': count, 'incremental': incremental}
+
+
+def _iter_id_chunks(table):
+    """
+    按主键顺序分块生成 ids 记录，after 为上一块的最后一个主键（首块为 null），
+    每块覆盖 (after, 本块最后一个主键] 区间，final 块覆盖到区间末尾
+    """
+    pk_columns = list(table.primary_key)
+    stmt = select(*pk_columns).order_by(*pk_columns).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    after = None
+    chunk = []
+    result = db.session.execute(stmt)
+    try:
+        for row in result:
+            values = [_encode(value) for value in row]
+            chunk.append(values[0] if len(values) == 1 else values)
+            if len(chunk) >= IDS_CHUNK_SIZE:
+                yield {'type': 'ids', 'table': table.name, 'after': after, 'ids': chunk, 'final': False}
+                after = chunk[-1]
+                chunk = []
+    finally:
+        result.close()
+    yield {'type': 'ids', 'table': table.name, 'after': after, 'ids': chunk, 'final': True}
+
+
+def backup_object_name(bucket, name, etag):
+    """对象副本在备份桶中的名称，按 ETag 区分版本"""
+    etag = etag.strip('"')
+    return f'{BACKUP_OBJECT_PREFIX}{bucket}/{name}@{etag}'
+
+
+def _iter_objects(since):
+    """生成附件 ETag 清单，并将备份桶中尚无副本的对象版本复制过去"""
+    from minio.commonconfig import CopySource
+    from minio.error import S3Error
+
+    client = get_minio_client()
+    if not client.bucket_exists(BACKUP_OBJECT_BUCKET):
+        client.make_bucket(BACKUP_OBJECT_BUCKET)
+    for bucket in BACKUP_BUCKETS:
+        if not client.bucket_exists(bucket):
+            continue
+        for obj in client.list_objects(bucket, recursive=True):
+            # 增量备份中未变更的对象已在之前的备份中复制
+            if since is None or obj.last_modified.replace(tzinfo=None) > since - WATERMARK_OVERLAP:
+                target = backup_object_name(bucket, obj.object_name, obj.etag)
+                try:
+                    client.stat_object(BACKUP_OBJECT_BUCKET, target)
+                except S3Error:
+                    # 服务端复制，数据不经过应用进程
+                    client.copy_object(BACKUP_OBJECT_BUCKET, target, CopySource(bucket, obj.object_name))
+            yield {
+                'type': 'object',
+                'bucket': bucket,
+                'name': obj.object_name,
+                'etag': obj.etag,
+                'size': obj.size,
+                'last_modified': _encode(obj.last_modified.replace(tzinfo=None)),
+            }
+
+
+def iter_backup_records(since=None, until=None, include_objects=True):
+    """
+    流式生成备份记录（字典），since 为上次备份的水位线（UTC），为空时全量备份
+    until 默认取导出开始的时间，导出期间的修改会在下一次备份中重复导出，恢复时按主键覆盖
+    """
+    until = until or datetime.utcnow()
+    tables = db.metadata.sorted_tables
+    yield {
+        'type': 'header',
+        'version': BACKUP_FORMAT_VERSION,
+        'since': _encode(since),
+        'until': _encode(until),
+        'tables': [table.name for table in tables],
+    }
+
+    rows = 0
+    for table in tables:
+        for record in _iter_table(table, since):
+            if record['type'] == 'row':
+                rows += 1
+            yield record
+
+    objects = 0
+    objects_error = None
+    if include_objects:
+        try:
+            for record in _iter_objects(since):
+                objects += 1
+                yield record
+        except Exception as e:
+            # 对象存储不可用时仍保留数据库部分，footer 中记录错误
+            print(f"附件清单生成失败: {e}")
+            objects_error = str(e)
+
+    yield {'type': 'footer', 'until': _encode(until), 'rows': rows, 'objects': objects, 'objects_error': objects_error}
+
+
+def iter_backup_ndjson(since=None, until=None, include_objects=True):
+    """以 NDJSON 字节行流式输出备份"""
+    for record in iter_backup_records(since, until, include_objects):
+        yield (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _upsert_statement(conn, table):
+    """按方言构造"存在则更新"的插入语句"""
+    updates = [c.name for c in table.c if not c.primary_key]
+    if conn.dialect.name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        if not updates:
+            return stmt.prefix_with('IGNORE')
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in updates})
+    if conn.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        keys = [c.name for c in table.primary_key]
+        if not updates:
+            return stmt.on_conflict_do_nothing(index_elements=keys)
+        return stmt.on_conflict_do_update(index_elements=keys, set_={name: stmt.excluded[name] for name in updates})
+    raise NotImplementedError(f'不支持的数据库: {conn.dialect.name}')
+
+
+def _execute_without_fk_checks(engine, callback):
+    """在独立连接上执行写入，期间关闭外键检查，使各表可以并行、无序写入"""
+    with engine.begin() as conn:
+        mysql = conn.dialect.name == 'mysql'
+        if mysql:
+            conn.exec_driver_sql('SET FOREIGN_KEY_CHECKS=0')
+        try:
+            callback(conn)
+        finally:
+            if mysql:
+                conn.exec_driver_sql('SET FOREIGN_KEY_CHECKS=1')
+
+
+def _restore_rows(engine, table, rows):
+    def write(conn):
+        conn.execute(_upsert_statement(conn, table), rows)
+    _execute_without_fk_checks(engine, write)
+
+
+def _decode_key(pk_columns, key):
+    values = key if isinstance(key, list) else [key]
+    return tuple(_decode(column, value) for column, value in zip(pk_columns, values))
+
+
+def _key_expression(pk_columns):
+    return pk_columns[0] if len(pk_columns) == 1 else tuple_(*pk_columns)
+
+
+def _key_value(pk_columns, key):
+    return key[0] if len(pk_columns) == 1 else tuple_(*key)
+
+
+def _delete_missing_rows(engine, table, record):
+    """删除 ids 记录覆盖的主键区间内、备份时已不存在的行"""
+    pk_columns = list(table.primary_key)
+    wanted = {_decode_key(pk_columns, key) for key in record['ids']}
+    key_expr = _key_expression(pk_columns)
+    # 旧格式的 ids 记录没有 after / final，整表作为一块
+    after = record.get('after')
+    final = record.get('final', True)
+    conditions = []
+    if after is not None:
+        conditions.append(key_expr > _key_value(pk_columns, _decode_key(pk_columns, after)))
+    if not final:
+        conditions.append(key_expr <= _key_value(pk_columns, _decode_key(pk_columns, record['ids'][-1])))
+
+    def delete(conn):
+        existing = conn.execute(select(*pk_columns).where(*conditions)).fetchall()
+        stale = [tuple(row) for row in existing if tuple(row) not in wanted]
+        for i in range(0, len(stale), RESTORE_BATCH_SIZE):
+            batch = stale[i:i + RESTORE_BATCH_SIZE]
+            if len(pk_columns) == 1:
+                condition = pk_columns[0].in_([key[0] for key in batch])
+            else:
+                condition = tuple_(*pk_columns).in_(batch)
+            conn.execute(table.delete().where(condition))
+    _execute_without_fk_checks(engine, delete)
+
+
+def _restore_object(client, record):
+    """
+    对象缺失或 ETag 不一致时从备份桶复制清单中的版本回原桶
+    返回 'copied' / 'unchanged'；备份桶中没有该版本时返回 'missing'
+    """
+    from minio.commonconfig import CopySource
+    from minio.error import S3Error
+
+    try:
+        if client.stat_object(record['bucket'], record['name']).etag == record['etag']:
+            return 'unchanged'
+    except S3Error:
+        pass
+    source = backup_object_name(record['bucket'], record['name'], record['etag'])
+    try:
+        client.stat_object(BACKUP_OBJECT_BUCKET, source)
+    except S3Error:
+        print(f"备份桶中缺少附件副本: {source}")
+        return 'missing'
+    if not client.bucket_exists(record['bucket']):
+        client.make_bucket(record['bucket'])
+    client.copy_object(record['bucket'], record['name'], CopySource(BACKUP_OBJECT_BUCKET, source))
+    return 'copied'
+
+
+def restore_backup(lines, workers=RESTORE_WORKERS, include_objects=True):
+    """
+    从 NDJSON 行恢复备份，返回统计信息
+    多个备份文件按时间顺序依次恢复（全量 + 若干增量）即可还原到最后一次备份的状态
+    """
+    engine = db.engine
+    tables = {table.name: table for table in db.metadata.sorted_tables}
+    client = get_minio_client() if include_objects else None
+    stats = {'rows': 0, 'deleted_tables': 0, 'objects': 0, 'objects_restored': 0, 'objects_missing': 0}
+    batches = {}
+    # 各表尚未确认完成的写入批次，删除前需等待该表全部写入完成
+    table_writes = {}
+    deleted_tables = set()
+    futures = []
+    # 限制排队中的批次数，内存占用与备份大小无关
+    slots = threading.BoundedSemaphore(workers * 2)
+
+    def submit(fn, *args):
+        slots.acquire()
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+        return future
+
+    def flush(table_name):
+        rows = batches.pop(table_name, None)
+        if rows:
+            table_writes.setdefault(table_name, []).append(
+                submit(_restore_rows, engine, tables[table_name], rows)
+            )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record['type']
+            if kind == 'header' and record.get('version') != BACKUP_FORMAT_VERSION:
+                raise ValueError(f"不支持的备份格式版本: {record.get('version')}")
+            elif kind == 'row' and record['table'] in tables:
+                table = tables[record['table']]
+                row = {k: _decode(table.c[k], v) for k, v in record['data'].items() if k in table.c}
+                batch = batches.setdefault(record['table'], [])
+                batch.append(row)
+                stats['rows'] += 1
+                if len(batch) >= RESTORE_BATCH_SIZE:
+                    flush(record['table'])
+            elif kind == 'table':
+                flush(record['table'])
+            elif kind == 'ids' and record['table'] in tables:
+                # ids 记录位于该表所有行之后，等待该表写入完成后逐块删除
+                flush(record['table'])
+                for future in table_writes.pop(record['table'], []):
+                    future.result()
+                submit(_delete_missing_rows, engine, tables[record['table']], record)
+                deleted_tables.add(record['table'])
+            elif kind == 'object' and client is not None:
+                stats['objects'] += 1
+                submit(_restore_object, client, record)
+
+        for table_name in list(batches):
+            flush(table_name)
+        results = [future.result() for future in futures]
+        stats['objects_restored'] = sum(1 for result in results if result == 'copied')
+        stats['objects_missing'] = sum(1 for result in results if result == 'missing')
+        stats['deleted_tables'] = len(deleted_tables)
+    return stats
@@ -0,0 +1,339 @@
+"""
+系统通知服务
+个人通知按用户逐条存储；全员通知只写一行 BroadcastNotification，
+每个用户的已读 / 清空状态用水位线加少量单独已读标记表示，读取时合并。
+新通知在事务提交后通过 Socket.IO 推送，回滚时丢弃。
+
+每个用户最近的通知与未读数缓存在 Redis 哈希中，所有写入路径在提交后同步更新缓存；
+全员通知发布时只递增全局版本号，各用户缓存在下次读取时按需重建
+"""
+import json
+from datetime import datetime
+from sqlalchemy import and_, event, exists, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..extensions import db, redis_client
+from ..models.models import (
+    BroadcastNotification,
+    BroadcastRead,
+    BroadcastReadState,
+    SystemNotification,
+)
+
+# 全员通知在接口中以 "b<ID>" 表示，与个人通知 ID 区分
+BROADCAST_ID_PREFIX = 'b'
+# 会话中待提交后执行的回调（推送、缓存更新）
+_AFTER_COMMIT_KEY = 'notification_after_commit'
+
+CACHE_PREFIX = "notif_cache:"
+BROADCAST_VERSION_KEY = "notif_broadcast_version"
+CACHE_SIZE = 20  # 缓存并返回的最近通知条数
+CACHE_TTL = 86400  # 1 天（秒）
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit_callbacks(session):
+    callbacks = session.info.pop(_AFTER_COMMIT_KEY, None)
+    for callback in callbacks or []:
+        try:
+            callback()
+        except Exception as e:
+            # 推送或缓存失败不影响通知落库，缓存会在过期或下次写入时修正
+            print(f"通知提交后处理失败: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_commit_callbacks(session):
+    session.info.pop(_AFTER_COMMIT_KEY, None)
+
+
+class NotificationService:
+    """系统通知服务类"""
+
+    @staticmethod
+    def _after_commit(callback):
+        db.session.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+
+    @staticmethod
+    def broadcast(title: str, content: str, type: str = 'system') -> BroadcastNotification:
+        """
+        发布一条全员通知，写入量与用户数无关
+        由调用方负责提交事务
+        """
+        from ..realtime import push_to_all
+
+        notification = BroadcastNotification(title=title, content=content, type=type)
+        db.session.add(notification)
+        db.session.flush()
+        payload = NotificationService._serialize(notification, False, broadcast=True)
+        NotificationService._after_commit(lambda: redis_client.incr(BROADCAST_VERSION_KEY))
+        NotificationService._after_commit(lambda: push_to_all(payload))
+        return notification
+
+    @staticmethod
+    def notify_user(user_id, title: str, content: str, type: str = 'system', created_at=None) -> SystemNotification:
+        """
+        为单个用户生成个人通知，提交后写入缓存并推送给该用户
+        由调用方负责提交事务
+        """
+        from ..realtime import push_to_user
+
+        notification = SystemNotification(
+            user_id=user_id,
+            title=title,
+            content=content,
+            type=type,
+            is_read=False,
+            created_at=created_at or datetime.utcnow()
+        )
+        db.session.add(notification)
+        db.session.flush()
+        payload = NotificationService._serialize(notification, False)
+        NotificationService._after_commit(
+            lambda: NotificationService._update_cache(user_id, NotificationService._prepend(payload))
+        )
+        NotificationService._after_commit(lambda: push_to_user(user_id, payload))
+        return notification
+
+    @staticmethod
+    def _get_read_state(user_id, create=False):
+        state = db.session.get(BroadcastReadState, user_id)
+        if state is None and create:
+            state = BroadcastReadState(user_id=user_id, read_watermark=0, cleared_watermark=0)
+            db.session.add(state)
+        return state
+
+    @staticmethod
+    def init_read_state(user_id):
+        """新用户的已读水位线从当前最新的全员通知开始，注册前的全员通知不计入未读；由调用方负责提交事务"""
+        latest_id = db.session.query(db.func.max(BroadcastNotification.id)).scalar() or 0
+        state = NotificationService._get_read_state(user_id, create=True)
+        state.read_watermark = max(state.read_watermark or 0, latest_id)
+        return state
+
+    @staticmethod
+    def _ensure_read_state(user_id):
+        """
+        没有已读状态的用户（注册以外的途径创建）首次读取时按新用户处理，
+        以当前最新的全员通知为水位线并保存；并发创建冲突时由另一方的结果为准
+        """
+        state = NotificationService._get_read_state(user_id)
+        if state is not None:
+            return state
+        try:
+            with db.session.begin_nested():
+                state = NotificationService.init_read_state(user_id)
+            db.session.commit()
+        except IntegrityError:
+            state = NotificationService._get_read_state(user_id)
+        return state
+
+    @staticmethod
+    def _serialize(notification, is_read, broadcast=False):
+        return {
+            'id': f"{BROADCAST_ID_PREFIX}{notification.id}" if broadcast else notification.id,
+            'title': notification.title,
+            'content': notification.content,
+            'is_read': is_read,
+            'created_at': notification.created_at.isoformat(),
+            'type': notification.type
+        }
+
+    @staticmethod
+    def _broadcast_filters(user_id):
+        """返回 (可见的全员通知查询, 未读条件, 已读条件)"""
+        state = NotificationService._ensure_read_state(user_id)
+        read_watermark = state.read_watermark if state else 0
+        cleared_watermark = state.cleared_watermark if state else 0
+
+        marked_read = exists().where(and_(
+            BroadcastRead.user_id == user_id,
+            BroadcastRead.broadcast_id == BroadcastNotification.id
+        ))
+        visible = BroadcastNotification.query.filter(BroadcastNotification.id > cleared_watermark)
+        unread = and_(BroadcastNotification.id > read_watermark, ~marked_read)
+        read = or_(BroadcastNotification.id <= read_watermark, marked_read)
+        return visible, unread, read
+
+    @staticmethod
+    def list_for_user(user_id, limit=CACHE_SIZE):
+        """合并个人通知与全员通知，未读在前、按时间倒序，返回前 limit 条（直接查询数据库）"""
+        personal = SystemNotification.query.filter_by(user_id=user_id)\
+            .order_by(SystemNotification.is_read.asc(), SystemNotification.created_at.desc())\
+            .limit(limit).all()
+        entries = [(n, bool(n.is_read), False) for n in personal]
+
+        visible, unread_filter, read_filter = NotificationService._broadcast_filters(user_id)
+        # 未读与已读分别取前 limit 条，保证合并后的排序与单表排序一致
+        unread = visible.filter(unread_filter).order_by(BroadcastNotification.id.desc()).limit(limit).all()
+        read = visible.filter(read_filter).order_by(BroadcastNotification.id.desc()).limit(limit).all()
+        entries.extend((n, False, True) for n in unread)
+        entries.extend((n, True, True) for n in read)
+
+        entries.sort(key=lambda entry: entry[0].created_at, reverse=True)
+        entries.sort(key=lambda entry: entry[1])
+        return [NotificationService._serialize(*entry) for entry in entries[:limit]]
+
+    @staticmethod
+    def count_unread(user_id):
+        """统计未读通知数（直接查询数据库）"""
+        personal = SystemNotification.query.filter_by(user_id=user_id, is_read=False).count()
+        visible, unread_filter, _ = NotificationService._broadcast_filters(user_id)
+        return personal + visible.filter(unread_filter).count()
+
+    # ----------------- 缓存 -----------------
+
+    @staticmethod
+    def get_cached(user_id):
+        """
+        读取用户最近的通知与未读数，返回 (items, unread)
+        缓存缺失或全员通知版本变化时从数据库重建
+        """
+        key = f"{CACHE_PREFIX}{user_id}"
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hgetall(key)
+            pipe.get(BROADCAST_VERSION_KEY)
+            cached, version = pipe.execute()
+            version = int(version or 0)
+            if b'items' in cached and int(cached.get(b'bver', -1)) == version:
+                return json.loads(cached[b'items']), int(cached[b'unread'])
+        except Exception as e:
+            print(f"读取通知缓存失败: {e}")
+            return NotificationService.list_for_user(user_id), NotificationService.count_unread(user_id)
+
+        return NotificationService._rebuild_cache(user_id, key, version)
+
+    @staticmethod
+    def _rebuild_cache(user_id, key, version):
+        result = {}
+
+        def _rebuild(pipe):
+            # WATCH 期间若有写入路径修改了该用户缓存，事务重试并重新查询，避免用旧数据覆盖
+            result['items'] = NotificationService.list_for_user(user_id)
+            result['unread'] = NotificationService.count_unread(user_id)
+            pipe.multi()
+            pipe.hset(key, mapping={
+                'items': json.dumps(result['items']),
+                'unread': result['unread'],
+                'bver': version,
+            })
+            pipe.expire(key, CACHE_TTL)
+
+        try:
+            redis_client.transaction(_rebuild, key)
+        except Exception as e:
+            print(f"重建通知缓存失败: {e}")
+            if 'items' not in result:
+                return NotificationService.list_for_user(user_id), NotificationService.count_unread(user_id)
+        return result['items'], result['unread']
+
+    @staticmethod
+    def _update_cache(user_id, transform):
+        """
+        按 transform(items, unread) -> (items, unread) 更新缓存，返回 None 表示需要失效
+        缓存不存在时仅触碰键，使并发中的重建事务重新查询
+        """
+        key = f"{CACHE_PREFIX}{user_id}"
+
+        def _apply(pipe):
+            cached = pipe.hgetall(key)
+            pipe.multi()
+            if b'items' not in cached:
+                pipe.hincrby(key, 'writes', 1)
+                pipe.expire(key, CACHE_TTL)
+                return
+            updated = transform(json.loads(cached[b'items']), int(cached[b'unread']))
+            if updated is None:
+                pipe.delete(key)
+                return
+            items, unread = updated
+            pipe.hset(key, mapping={'items': json.dumps(items), 'unread': max(unread, 0)})
+            pipe.expire(key, CACHE_TTL)
+
+        redis_client.transaction(_apply, key)
+
+    @staticmethod
+    def _prepend(payload):
+        # 新通知是最新的未读通知，必然排在首位
+        return lambda items, unread: (([payload] + items)[:CACHE_SIZE], unread + 1)
+
+    @staticmethod
+    def _mark_item_read(item_id):
+        def transform(items, unread):
+            # 缓存已满时，其余已读通知可能排到被标记的通知之前，无法就地调整顺序
+            if len(items) >= CACHE_SIZE:
+                return None
+            for item in items:
+                if item['id'] == item_id:
+                    item['is_read'] = True
+            items.sort(key=lambda item: item['created_at'], reverse=True)
+            items.sort(key=lambda item: item['is_read'])
+            return items, unread - 1
+        return transform
+
+    @staticmethod
+    def _mark_all_items_read(items, unread):
+        if len(items) >= CACHE_SIZE:
+            return None
+        for item in items:
+            item['is_read'] = True
+        items.sort(key=lambda item: item['created_at'], reverse=True)
+        return items, 0
+
+    # ----------------- 已读 / 清空 -----------------
+
+    @staticmethod
+    def mark_read(user_id, notification):
+        """标记个人通知已读，由调用方负责提交事务"""
+        if notification.is_read:
+            return
+        notification.is_read = True
+        NotificationService._after_commit(
+            lambda: NotificationService._update_cache(user_id, NotificationService._mark_item_read(notification.id))
+        )
+
+    @staticmethod
+    def mark_broadcast_read(user_id, broadcast_id):
+        """标记单条全员通知已读，由调用方负责提交事务"""
+        state = NotificationService._get_read_state(user_id)
+        if state and (broadcast_id <= state.read_watermark or broadcast_id <= state.cleared_watermark):
+            return
+        if db.session.get(BroadcastRead, (user_id, broadcast_id)) is None:
+            db.session.add(BroadcastRead(user_id=user_id, broadcast_id=broadcast_id))
+            item_id = f"{BROADCAST_ID_PREFIX}{broadcast_id}"
+            NotificationService._after_commit(
+                lambda: NotificationService._update_cache(user_id, NotificationService._mark_item_read(item_id))
+            )
+
+    @staticmethod
+    def _advance_broadcast_watermark(user_id):
+        """将已读水位线推进到最新的全员通知，并清理被水位线覆盖的单独标记"""
+        latest_id = db.session.query(db.func.max(BroadcastNotification.id)).scalar() or 0
+        state = NotificationService._get_read_state(user_id, create=True)
+        state.read_watermark = max(state.read_watermark or 0, latest_id)
+        BroadcastRead.query.filter(
+            BroadcastRead.user_id == user_id,
+            BroadcastRead.broadcast_id <= state.read_watermark
+        ).delete(synchronize_session=False)
+        return state
+
+    @staticmethod
+    def mark_all_read(user_id):
+        """个人通知与全员通知全部标记已读，由调用方负责提交事务"""
+        SystemNotification.query.filter_by(user_id=user_id, is_read=False)\
+            .update({'is_read': True})
+        NotificationService._advance_broadcast_watermark(user_id)
+        NotificationService._after_commit(
+            lambda: NotificationService._update_cache(user_id, NotificationService._mark_all_items_read)
+        )
+
+    @staticmethod
+    def clear_all(user_id):
+        """清空个人通知，并推进全员通知的清空水位线，由调用方负责提交事务"""
+        SystemNotification.query.filter_by(user_id=user_id).delete()
+        state = NotificationService._advance_broadcast_watermark(user_id)
+        state.cleared_watermark = state.read_watermark
+        NotificationService._after_commit(
+            lambda: NotificationService._update_cache(user_id, lambda items, unread: ([], 0))
+        )
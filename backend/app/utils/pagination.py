@@ -0,0 +1,75 @@
+"""基于游标（keyset）的分页工具，避免 OFFSET 在深翻页时的全表扫描。"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, literal, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """游标格式非法或与当前排序不匹配。"""
+
+
+def clamp_limit(limit, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """将请求中的 limit 参数限制在合理范围内。"""
+    if limit is None or limit <= 0:
+        return default
+    return min(limit, maximum)
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values) -> str:
+    """将最后一行的排序键编码为不透明的 URL 安全字符串。"""
+    payload = json.dumps([_dump_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """解析游标，返回排序键列表；格式错误时抛出 InvalidCursor。"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if not isinstance(values, list) or len(values) != size:
+            raise InvalidCursor('cursor size mismatch')
+        return [_load_value(v) for v in values]
+    except InvalidCursor:
+        raise
+    except Exception as exc:
+        raise InvalidCursor(str(exc)) from exc
+
+
+def keyset_condition(keys, values):
+    """构造 keyset 翻页条件。
+
+    :param keys: [(column_expression, descending), ...]，需与 ORDER BY 顺序一致且末尾为唯一列
+    :param values: 上一页最后一行对应的排序键
+    :return: 形如 (a < x) OR (a = x AND b < y) ... 的过滤条件，可兼容混合升降序
+    """
+    # 统一包装为绑定参数，布尔值等常量才能参与大小比较
+    values = [literal(value) for value in values]
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        value = values[i]
+        equal_prefix = [keys[j][0] == values[j] for j in range(i)]
+        compare = column < value if descending else column > value
+        clauses.append(and_(*equal_prefix, compare))
+    return or_(*clauses)
+
+
+def keyset_order_by(keys):
+    """根据 keyset 定义生成 ORDER BY 子句。"""
+    return [column.desc() if descending else column.asc() for column, descending in keys]
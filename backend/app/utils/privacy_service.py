@@ -6,29 +6,39 @@ import secrets
 from datetime import datetime, timedelta
 from flask import current_app
 from ..extensions import redis_client
+from .crypto_service import wrap_session_key, unwrap_session_key
 
 
 class PrivacySpaceService:
     """隐私空间服务类"""
     
     TOKEN_PREFIX = "privacy_token:"
+    SESSION_KEY_PREFIX = "privacy_key:"
     TOKEN_EXPIRY = 180  # 3 分钟（秒）
     
     @staticmethod
-    def generate_access_token(user_id: int) -> str:
+    def generate_access_token(user_id: int, session_key: bytes = None) -> str:
         """
         生成隐私空间访问令牌
-        有效期 3 分钟
+        有效期 3 分钟；同时缓存用令牌包装后的会话密钥，与令牌同生命周期
         """
         token = secrets.token_urlsafe(32)
         key = f"{PrivacySpaceService.TOKEN_PREFIX}{user_id}"
         
         try:
-            redis_client.setex(
+            pipe = redis_client.pipeline()
+            pipe.setex(
                 key,
                 PrivacySpaceService.TOKEN_EXPIRY,
                 token
             )
+            session_key_name = f"{PrivacySpaceService.SESSION_KEY_PREFIX}{user_id}"
+            if session_key:
+                wrapped = wrap_session_key(session_key, token, current_app.config['SECRET_KEY'])
+                pipe.setex(session_key_name, PrivacySpaceService.TOKEN_EXPIRY, wrapped)
+            else:
+                pipe.delete(session_key_name)
+            pipe.execute()
             return token
         except Exception as e:
             current_app.logger.error(f"生成隐私空间令牌失败: {e}")
@@ -52,6 +62,26 @@ class PrivacySpaceService:
         except Exception as e:
             current_app.logger.error(f"验证隐私空间令牌失败: {e}")
             return False
+
+    @staticmethod
+    def get_session_key(user_id: int, token: str):
+        """
+        获取与令牌绑定的会话密钥，令牌无效或密钥已过期时返回 None
+        """
+        if not token:
+            return None
+
+        try:
+            pipe = redis_client.pipeline()
+            pipe.get(f"{PrivacySpaceService.TOKEN_PREFIX}{user_id}")
+            pipe.get(f"{PrivacySpaceService.SESSION_KEY_PREFIX}{user_id}")
+            stored_token, wrapped = pipe.execute()
+            if not stored_token or not wrapped or stored_token.decode('utf-8') != token:
+                return None
+            return unwrap_session_key(wrapped, token, current_app.config['SECRET_KEY'])
+        except Exception as e:
+            current_app.logger.error(f"获取隐私空间会话密钥失败: {e}")
+            return None
     
     @staticmethod
     def refresh_access_token(user_id: int, token: str) -> bool:
@@ -65,8 +95,11 @@ class PrivacySpaceService:
         key = f"{PrivacySpaceService.TOKEN_PREFIX}{user_id}"
         
         try:
-            # 重新设置过期时间
-            redis_client.expire(key, PrivacySpaceService.TOKEN_EXPIRY)
+            # 重新设置过期时间（令牌与会话密钥同步续期）
+            pipe = redis_client.pipeline()
+            pipe.expire(key, PrivacySpaceService.TOKEN_EXPIRY)
+            pipe.expire(f"{PrivacySpaceService.SESSION_KEY_PREFIX}{user_id}", PrivacySpaceService.TOKEN_EXPIRY)
+            pipe.execute()
             return True
         except Exception as e:
             current_app.logger.error(f"刷新隐私空间令牌失败: {e}")
@@ -81,7 +114,7 @@ class PrivacySpaceService:
         key = f"{PrivacySpaceService.TOKEN_PREFIX}{user_id}"
         
         try:
-            redis_client.delete(key)
+            redis_client.delete(key, f"{PrivacySpaceService.SESSION_KEY_PREFIX}{user_id}")
             return True
         except Exception as e:
             current_app.logger.error(f"撤销隐私空间令牌失败: {e}")
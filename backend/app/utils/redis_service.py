@@ -1,9 +1,23 @@
 import json
+import hashlib
+import uuid
 from flask import current_app
+from redis.exceptions import ResponseError
 from ..extensions import redis_client
 
 class RedisService:
+    # 旧版离线文档列表，仅用于迁移存量数据
     OFFLINE_DOCS_KEY = "offline_docs"
+    # 离线文档写入流与消费组：消息确认后才删除，消费者崩溃时由其他消费者认领
+    OFFLINE_STREAM_KEY = "offline_docs_stream"
+    OFFLINE_GROUP = "offline_sync"
+    # 已投递但超过该时长仍未确认的消息可被其他消费者认领（毫秒）
+    OFFLINE_CLAIM_IDLE_MS = 60000
+    # 无法落库的消息转入死信流，由人工排查后重新投递
+    OFFLINE_DEAD_LETTER_KEY = "offline_docs_dead"
+    OFFLINE_DEAD_LETTER_MAXLEN = 10000
+    # 投递超过该次数仍未确认的消息视为无法处理
+    OFFLINE_MAX_DELIVERIES = 5
 
     @staticmethod
     def get_client():
@@ -11,40 +25,138 @@ class RedisService:
         return redis_client
 
     @staticmethod
-    def save_offline_document(user_id, doc_data):
-        """当数据库离线时保存文档到 Redis 列表"""
+    def save_offline_document(user_id, doc_data, offline_key=None):
+        """当数据库离线时将文档写入 Redis Stream，返回幂等键，失败时返回 None"""
         try:
             client = RedisService.get_client()
-            # 添加时间戳和用户ID到数据
+            # 添加用户ID与幂等键，同步落库时据此去重
             doc_data['owner_id'] = user_id
-            doc_data['is_offline'] = True
-            
-            # 使用列表存储离线文档
-            client.rpush(RedisService.OFFLINE_DOCS_KEY, json.dumps(doc_data))
-            return True
+            doc_data['offline_key'] = offline_key or doc_data.get('offline_key') or uuid.uuid4().hex
+
+            client.xadd(RedisService.OFFLINE_STREAM_KEY, {'data': json.dumps(doc_data)})
+            return doc_data['offline_key']
         except Exception as e:
             print(f"保存到 Redis 失败: {e}")
-            return False
+            return None
 
     @staticmethod
-    def get_offline_documents(limit=10):
-        """从 Redis 获取离线文档"""
+    def ensure_offline_group():
+        """创建离线文档消费组（已存在时忽略）"""
+        client = RedisService.get_client()
         try:
-            client = RedisService.get_client()
-            # 获取指定范围的项目
-            items = client.lrange(RedisService.OFFLINE_DOCS_KEY, 0, limit - 1)
-            return [json.loads(item) for item in items]
-        except Exception as e:
-            print(f"从 Redis 获取失败: {e}")
-            return []
+            client.xgroup_create(RedisService.OFFLINE_STREAM_KEY, RedisService.OFFLINE_GROUP,
+                                 id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
 
     @staticmethod
-    def remove_offline_documents(count):
-        """从 Redis 移除已处理的文档"""
-        try:
-            client = RedisService.get_client()
-            client.lpop(RedisService.OFFLINE_DOCS_KEY, count)
-            return True
-        except Exception as e:
-            print(f"从 Redis 移除失败: {e}")
-            return False
+    def read_offline_documents(consumer, count=500):
+        """
+        读取一批离线文档，返回 [(消息ID, 文档数据)]
+        优先认领其他消费者超时未确认的消息，再读取新消息；无法解析的消息数据为 None
+        """
+        client = RedisService.get_client()
+        claimed = client.xautoclaim(
+            RedisService.OFFLINE_STREAM_KEY, RedisService.OFFLINE_GROUP, consumer,
+            min_idle_time=RedisService.OFFLINE_CLAIM_IDLE_MS, start_id='0-0', count=count
+        )
+        messages = list(claimed[1])
+        if len(messages) < count:
+            streams = client.xreadgroup(
+                RedisService.OFFLINE_GROUP, consumer,
+                {RedisService.OFFLINE_STREAM_KEY: '>'}, count=count - len(messages)
+            )
+            for _, stream_messages in streams or []:
+                messages.extend(stream_messages)
+
+        entries = []
+        for entry_id, fields in messages:
+            try:
+                doc_data = json.loads(fields[b'data'])
+            except Exception:
+                doc_data = None
+            entries.append((entry_id, doc_data))
+        return entries
+
+    @staticmethod
+    def ack_offline_documents(entry_ids):
+        """确认并删除已落库的离线文档消息"""
+        if not entry_ids:
+            return
+        client = RedisService.get_client()
+        pipe = client.pipeline()
+        pipe.xack(RedisService.OFFLINE_STREAM_KEY, RedisService.OFFLINE_GROUP, *entry_ids)
+        pipe.xdel(RedisService.OFFLINE_STREAM_KEY, *entry_ids)
+        pipe.execute()
+
+    @staticmethod
+    def get_offline_delivery_counts(entry_ids):
+        """查询消息的投递次数（XPENDING），返回 {消息ID: 次数}"""
+        if not entry_ids:
+            return {}
+        client = RedisService.get_client()
+        pipe = client.pipeline(transaction=False)
+        for entry_id in entry_ids:
+            pipe.xpending_range(RedisService.OFFLINE_STREAM_KEY, RedisService.OFFLINE_GROUP,
+                                min=entry_id, max=entry_id, count=1)
+        counts = {}
+        for entry_id, pending in zip(entry_ids, pipe.execute()):
+            if pending:
+                counts[entry_id] = pending[0]['times_delivered']
+        return counts
+
+    @staticmethod
+    def dead_letter_offline_documents(failures):
+        """将无法落库的消息写入死信流并从离线文档流中确认删除，failures 为 [(消息ID, 文档数据, 原因)]"""
+        if not failures:
+            return
+        client = RedisService.get_client()
+        pipe = client.pipeline()
+        for entry_id, doc_data, reason in failures:
+            pipe.xadd(RedisService.OFFLINE_DEAD_LETTER_KEY, {
+                'entry_id': entry_id,
+                'data': json.dumps(doc_data),
+                'error': reason[:1000],
+            }, maxlen=RedisService.OFFLINE_DEAD_LETTER_MAXLEN, approximate=True)
+        entry_ids = [entry_id for entry_id, _, _ in failures]
+        pipe.xack(RedisService.OFFLINE_STREAM_KEY, RedisService.OFFLINE_GROUP, *entry_ids)
+        pipe.xdel(RedisService.OFFLINE_STREAM_KEY, *entry_ids)
+        pipe.execute()
+
+    @staticmethod
+    def migrate_legacy_offline_documents(batch_size=500):
+        """
+        将旧版列表中的离线文档迁移到 Stream，返回迁移条数
+        幂等键取原始数据摘要，迁移中断后重复写入的条目会在落库时去重
+        """
+        client = RedisService.get_client()
+        migrated = 0
+        moved = 0
+
+        def _move_batch(pipe):
+            nonlocal moved
+            items = pipe.lrange(RedisService.OFFLINE_DOCS_KEY, 0, batch_size - 1)
+            moved = len(items)
+            if not items:
+                return
+            pipe.multi()
+            for raw in items:
+                try:
+                    doc_data = json.loads(raw)
+                except ValueError:
+                    doc_data = None
+                if not isinstance(doc_data, dict):
+                    print(f"丢弃无法解析的离线文档: {raw[:100]}")
+                    continue
+                doc_data['offline_key'] = 'legacy-' + hashlib.sha1(raw).hexdigest()
+                pipe.xadd(RedisService.OFFLINE_STREAM_KEY, {'data': json.dumps(doc_data)})
+            pipe.ltrim(RedisService.OFFLINE_DOCS_KEY, moved, -1)
+
+        while True:
+            moved = 0
+            # WATCH 旧列表，多个进程同时迁移时只有一个事务生效，其余自动重试
+            client.transaction(_move_batch, RedisService.OFFLINE_DOCS_KEY)
+            if not moved:
+                return migrated
+            migrated += moved
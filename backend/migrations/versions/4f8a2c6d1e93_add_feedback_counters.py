@@ -0,0 +1,40 @@
+"""Add denormalised reply/like counters to Feedback
+
+Revision ID: 4f8a2c6d1e93
+Revises: 9b41d0c7e356
+Create Date: 2026-10-18 17:02:44.185530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f8a2c6d1e93'
+down_revision = '9b41d0c7e356'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('feedback', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False, comment='回复数'))
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False, comment='点赞数'))
+        batch_op.add_column(sa.Column('last_reply_at', sa.DateTime(), nullable=True, comment='最后回复时间'))
+        batch_op.create_index('ix_feedback_created_at', ['created_at'], unique=False)
+
+    # 回填存量数据
+    op.execute(
+        'UPDATE feedback SET '
+        'reply_count = (SELECT COUNT(*) FROM feedback_reply r WHERE r.feedback_id = feedback.id), '
+        'last_reply_at = (SELECT MAX(r.created_at) FROM feedback_reply r WHERE r.feedback_id = feedback.id), '
+        'like_count = (SELECT COUNT(*) FROM feedback_like l WHERE l.feedback_id = feedback.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('feedback', schema=None) as batch_op:
+        batch_op.drop_index('ix_feedback_created_at')
+        batch_op.drop_column('last_reply_at')
+        batch_op.drop_column('like_count')
+        batch_op.drop_column('reply_count')
@@ -0,0 +1,27 @@
+"""Add User.privacy_salt for per-user key derivation
+
+Revision ID: 5a9f3c2e7b14
+Revises: c41e7a9d05b3
+Create Date: 2026-10-18 11:20:45.663104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9f3c2e7b14'
+down_revision = 'c41e7a9d05b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 已设置密码的用户在下次验证隐私空间密码时自动生成盐值
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('privacy_salt', sa.String(length=32), nullable=True, comment='隐私空间密钥派生盐值（十六进制）'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('privacy_salt')
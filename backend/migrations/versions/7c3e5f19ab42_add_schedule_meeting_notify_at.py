@@ -0,0 +1,36 @@
+"""Add notify_at to Schedule and Meeting for indexed reminder lookup
+
+Revision ID: 7c3e5f19ab42
+Revises: e2b7d4a91c60
+Create Date: 2026-10-18 15:10:06.274481
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e5f19ab42'
+down_revision = 'e2b7d4a91c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('schedule', 'meeting'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('notify_at', sa.DateTime(), nullable=True, comment='提醒时间（开始时间减提前分钟数），不通知时为空'))
+            batch_op.create_index(f'ix_{table}_notify_due', ['is_notified', 'notify_at'], unique=False)
+
+        # 回填存量数据
+        op.execute(
+            f'UPDATE {table} SET notify_at = DATE_SUB(start_time, INTERVAL remind_minutes MINUTE) '
+            'WHERE remind_minutes > 0'
+        )
+
+
+def downgrade():
+    for table in ('schedule', 'meeting'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_notify_due')
+            batch_op.drop_column('notify_at')
@@ -0,0 +1,27 @@
+"""Add Document.preview for list views
+
+Revision ID: 8d55857656b2
+Revises: 3d70066a9213
+Create Date: 2026-10-18 09:12:40.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d55857656b2'
+down_revision = '3d70066a9213'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 已有数据请运行 scripts/backfill_document_preview.py 分批回填
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview', sa.Text(), nullable=True, comment='内容预览（列表展示用）'))
+
+
+def downgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_column('preview')
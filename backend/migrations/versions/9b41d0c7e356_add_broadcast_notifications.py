@@ -0,0 +1,52 @@
+"""Add broadcast notifications with per-user read watermarks
+
+Revision ID: 9b41d0c7e356
+Revises: 7c3e5f19ab42
+Create Date: 2026-10-18 16:25:48.903117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b41d0c7e356'
+down_revision = '7c3e5f19ab42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('broadcast_notification',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False, comment='通知标题'),
+    sa.Column('content', sa.Text(), nullable=False, comment='通知内容'),
+    sa.Column('type', sa.String(length=50), nullable=True, comment='通知类型'),
+    sa.Column('created_at', sa.DateTime(), nullable=True, comment='创建时间'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('broadcast_read_state',
+    sa.Column('user_id', sa.Integer(), nullable=False, comment='用户ID'),
+    sa.Column('read_watermark', sa.Integer(), nullable=False, comment='已读水位线'),
+    sa.Column('cleared_watermark', sa.Integer(), nullable=False, comment='已清空水位线'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('broadcast_read',
+    sa.Column('user_id', sa.Integer(), nullable=False, comment='用户ID'),
+    sa.Column('broadcast_id', sa.Integer(), nullable=False, comment='全员通知ID'),
+    sa.ForeignKeyConstraint(['broadcast_id'], ['broadcast_notification.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'broadcast_id')
+    )
+    with op.batch_alter_table('system_notification', schema=None) as batch_op:
+        batch_op.create_index('ix_system_notification_user_read', ['user_id', 'is_read', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('system_notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_system_notification_user_read')
+
+    op.drop_table('broadcast_read')
+    op.drop_table('broadcast_read_state')
+    op.drop_table('broadcast_notification')
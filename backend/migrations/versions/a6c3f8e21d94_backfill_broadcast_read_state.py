@@ -0,0 +1,31 @@
+"""Backfill BroadcastReadState for existing users
+
+Revision ID: a6c3f8e21d94
+Revises: d3a81f6c2b07
+Create Date: 2026-10-18 21:05:12.640381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c3f8e21d94'
+down_revision = 'd3a81f6c2b07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 已有用户补建已读状态，水位线为 0：引入全员通知之后发布的通知对他们仍计为未读；
+    # 之后没有已读状态的用户在首次读取时以当时最新的全员通知为水位线
+    op.execute(
+        'INSERT INTO broadcast_read_state (user_id, read_watermark, cleared_watermark) '
+        'SELECT id, 0, 0 FROM `user` '
+        'WHERE NOT EXISTS (SELECT 1 FROM broadcast_read_state s WHERE s.user_id = `user`.id)'
+    )
+
+
+def downgrade():
+    # 补建的状态与缺省值等价，无需回滚
+    pass
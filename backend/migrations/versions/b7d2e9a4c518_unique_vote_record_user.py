@@ -0,0 +1,31 @@
+"""Unique (vote_id, user_id) on VoteRecord
+
+Revision ID: b7d2e9a4c518
+Revises: 4f8a2c6d1e93
+Create Date: 2026-10-18 18:51:07.402317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e9a4c518'
+down_revision = '4f8a2c6d1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 并发提交可能已产生重复投票，保留每人最早的一条
+    op.execute(
+        'DELETE FROM vote_record WHERE id NOT IN ('
+        'SELECT id FROM (SELECT MIN(id) AS id FROM vote_record GROUP BY vote_id, user_id) AS keep_ids)'
+    )
+    with op.batch_alter_table('vote_record', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_vote_record_user', ['vote_id', 'user_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('vote_record', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_vote_record_user', type_='unique')
@@ -0,0 +1,27 @@
+"""Add ngram FULLTEXT index on document title/content
+
+Revision ID: c41e7a9d05b3
+Revises: 8d55857656b2
+Create Date: 2026-10-18 10:03:17.402215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7a9d05b3'
+down_revision = '8d55857656b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ES 不可用时的降级检索索引；MySQL 需关闭 innodb_ft_enable_stopword 以免 ngram 片段被停用词过滤
+    op.execute(
+        'CREATE FULLTEXT INDEX ft_document_title_content ON document (title, content) WITH PARSER ngram'
+    )
+
+
+def downgrade():
+    op.drop_index('ft_document_title_content', table_name='document')
@@ -0,0 +1,46 @@
+"""Add DocumentFlag and MonitorKeyword.scanned_at
+
+Revision ID: d3a81f6c2b07
+Revises: b7d2e9a4c518
+Create Date: 2026-10-18 19:20:36.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a81f6c2b07'
+down_revision = 'b7d2e9a4c518'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('document_flag',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=False, comment='文档ID'),
+    sa.Column('keyword_id', sa.Integer(), nullable=False, comment='关键词ID'),
+    sa.Column('snippet', sa.String(length=255), nullable=True, comment='首次命中处的内容片段'),
+    sa.Column('created_at', sa.DateTime(), nullable=True, comment='标记时间'),
+    sa.ForeignKeyConstraint(['document_id'], ['document.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['keyword_id'], ['monitor_keyword.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('document_id', 'keyword_id', name='uq_document_flag')
+    )
+    with op.batch_alter_table('document_flag', schema=None) as batch_op:
+        batch_op.create_index('ix_document_flag_keyword', ['keyword_id', 'document_id'], unique=False)
+
+    # 已有关键词的 scanned_at 为空，部署后由回扫任务生成标记
+    with op.batch_alter_table('monitor_keyword', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('scanned_at', sa.DateTime(), nullable=True, comment='存量文档回扫完成时间，为空表示待回扫'))
+
+
+def downgrade():
+    with op.batch_alter_table('monitor_keyword', schema=None) as batch_op:
+        batch_op.drop_column('scanned_at')
+
+    with op.batch_alter_table('document_flag', schema=None) as batch_op:
+        batch_op.drop_index('ix_document_flag_keyword')
+
+    op.drop_table('document_flag')
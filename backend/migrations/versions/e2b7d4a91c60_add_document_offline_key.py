@@ -0,0 +1,28 @@
+"""Add Document.offline_key for idempotent offline sync
+
+Revision ID: e2b7d4a91c60
+Revises: 5a9f3c2e7b14
+Create Date: 2026-10-18 14:02:31.518920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7d4a91c60'
+down_revision = '5a9f3c2e7b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('offline_key', sa.String(length=64), nullable=True, comment='离线写入幂等键'))
+        batch_op.create_index(batch_op.f('ix_document_offline_key'), ['offline_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_document_offline_key'))
+        batch_op.drop_column('offline_key')
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+回填 Document.preview
+为历史文档生成列表预览，按主键分批读取正文，避免一次性加载全部内容
+"""
+
+import argparse
+import sys
+import os
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy.orm import load_only, undefer
+
+from app import create_app
+from app.extensions import db
+from app.models.models import Document
+
+
+def backfill(batch_size=500, force=False):
+    app = create_app(start_background=False)
+    with app.app_context():
+        query = Document.query.options(
+            load_only(Document.id, Document.in_privacy_space, Document.preview),
+            undefer(Document.content)
+        ).filter(Document.in_privacy_space == False)
+        if not force:
+            query = query.filter(Document.preview.is_(None))
+
+        last_id = 0
+        total = 0
+        while True:
+            # 按主键翻页而不是 OFFSET，已更新的行不会影响后续批次
+            docs = query.filter(Document.id > last_id).order_by(Document.id.asc()).limit(batch_size).all()
+            if not docs:
+                break
+            for doc in docs:
+                doc.preview = Document.build_preview(doc.content)
+            last_id = docs[-1].id
+            total += len(docs)
+            db.session.commit()
+            db.session.expunge_all()
+            print(f"  - 已处理 {total} 篇文档 (最新 ID={last_id})")
+
+        print(f"✅ 预览回填完成，共更新 {total} 篇文档。")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='回填文档列表预览字段')
+    parser.add_argument('--batch-size', type=int, default=500, help='每批处理的文档数')
+    parser.add_argument('--force', action='store_true', help='重新生成所有文档的预览')
+    args = parser.parse_args()
+    backfill(batch_size=args.batch_size, force=args.force)
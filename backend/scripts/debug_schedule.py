@@ -2,7 +2,7 @@ from app import create_app
 from app.models.models import Schedule, User, Role
 from sqlalchemy import or_
 
-app = create_app()
+app = create_app(start_background=False)
 
 with app.app_context():
     print("--- Live Debug ---")
@@ -22,7 +22,7 @@ from sqlalchemy import text
 
 def create_tables():
     """创建所有数据库表并初始化基础数据"""
-    app = create_app()
+    app = create_app(start_background=False)
     
     with app.app_context():
         # 重置所有表 (开发环境方便，生产环境需谨慎)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Elasticsearch 文档索引重建脚本
+从 MySQL 流式读取文档并批量写入 ES，支持增量补录与基于别名的零停机重建；
+写入完成后比对索引与数据库的文档 ID，删除硬删除等原因已不应在索引中的文档
+
+用法:
+    python3 scripts/reindex_es.py                       # 全量写入当前索引
+    python3 scripts/reindex_es.py --since 2025-01-01    # 仅补录该时间之后变更的文档
+    python3 scripts/reindex_es.py --alias               # 新建索引并切换别名（零停机）
+"""
+
+import argparse
+import sys
+import os
+import time
+from datetime import datetime
+
+sys.path.append(os.getcwd())
+
+from elasticsearch import helpers
+
+from app import create_app
+from app import extensions
+from init_es import INDEX_MAPPING
+
+
+def parse_since(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法解析时间: {value}，应为 ISO 格式，例如 2025-01-01T08:00:00")
+
+
+def run_bulk(client, actions, chunk_size, report_every):
+    """执行 streaming_bulk 并周期性输出进度，返回 (成功数, 失败数)"""
+    ok_count = 0
+    failed = 0
+    started = time.monotonic()
+    last_report = started
+
+    for ok, item in helpers.streaming_bulk(
+        client, actions, chunk_size=chunk_size, raise_on_error=False, raise_on_exception=False
+    ):
+        op_type, result = next(iter(item.items()))
+        # 删除不存在的文档视为成功
+        if ok or (op_type == 'delete' and result.get('status') == 404):
+            ok_count += 1
+        else:
+            failed += 1
+            print(f"  ⚠️ 文档 {result.get('_id')} {op_type} 失败: {result.get('error')}")
+
+        now = time.monotonic()
+        if now - last_report >= report_every:
+            rate = ok_count / (now - started) if now > started else 0
+            print(f"  - 已处理 {ok_count + failed} 篇 (失败 {failed})，{rate:.0f} 篇/秒")
+            last_report = now
+
+    elapsed = time.monotonic() - started
+    rate = ok_count / elapsed if elapsed > 0 else 0
+    print(f"  ✅ 共写入 {ok_count} 篇，失败 {failed} 篇，耗时 {elapsed:.1f}s，平均 {rate:.0f} 篇/秒")
+    return ok_count, failed
+
+
+def prune_stale_documents(client, index, args):
+    """删除索引中数据库已不存在或不可索引的文档，返回失败数"""
+    from app.utils.es_service import iter_stale_document_actions
+
+    print("🔄 清理索引中已删除的文档...")
+    client.indices.refresh(index=index)
+    actions = iter_stale_document_actions(index, batch_size=args.batch_size)
+    _, failed = run_bulk(client, actions, args.chunk_size, args.report_every)
+    return failed
+
+
+def swap_alias(client, new_index, keep_old=False):
+    """将 documents 别名原子地切换到新索引"""
+    from app.utils.es_service import DOCUMENT_INDEX
+
+    old_indices = []
+    if client.indices.exists_alias(name=DOCUMENT_INDEX):
+        old_indices = list(client.indices.get_alias(name=DOCUMENT_INDEX).keys())
+    elif client.indices.exists(index=DOCUMENT_INDEX):
+        # 首次迁移：同名的实体索引会阻止创建别名，只能先删除（会有极短的不可用窗口）
+        print(f"⚠️  '{DOCUMENT_INDEX}' 当前为实体索引，删除后改为别名...")
+        client.indices.delete(index=DOCUMENT_INDEX)
+
+    actions = [{"remove": {"index": name, "alias": DOCUMENT_INDEX}} for name in old_indices]
+    actions.append({"add": {"index": new_index, "alias": DOCUMENT_INDEX}})
+    client.indices.update_aliases(actions=actions)
+    print(f"✅ 别名 '{DOCUMENT_INDEX}' 已指向 '{new_index}'")
+
+    if not keep_old:
+        for name in old_indices:
+            client.indices.delete(index=name)
+            print(f"  - 已删除旧索引 '{name}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重建 Elasticsearch 文档索引')
+    parser.add_argument('--since', type=parse_since, help='增量模式：仅同步该时间之后更新的文档')
+    parser.add_argument('--alias', action='store_true', help='写入新索引后原子切换别名，实现零停机重建')
+    parser.add_argument('--keep-old', action='store_true', help='切换别名后保留旧索引')
+    parser.add_argument('--batch-size', type=int, default=500, help='每批从数据库读取的文档数')
+    parser.add_argument('--chunk-size', type=int, default=500, help='每个 bulk 请求包含的操作数')
+    parser.add_argument('--report-every', type=float, default=5.0, help='进度输出间隔（秒）')
+    args = parser.parse_args()
+
+    if args.alias and args.since:
+        parser.error('--alias 为全量重建，不能与 --since 同时使用')
+
+    app = create_app(start_background=False)
+    # es_service 在导入时引用 redis_client，需在 create_app 初始化之后再导入
+    from app.utils.es_service import DOCUMENT_INDEX, iter_document_actions
+
+    with app.app_context():
+        client = extensions.es
+        if client is None:
+            print("❌ 无法连接到 Elasticsearch")
+            sys.exit(1)
+
+        print("=" * 60)
+        print("Elasticsearch 索引重建")
+        print("=" * 60)
+
+        if not args.alias:
+            mode = f"增量 (since={args.since.isoformat()})" if args.since else "全量"
+            print(f"🔄 {mode}写入 '{DOCUMENT_INDEX}' ...")
+            actions = iter_document_actions(DOCUMENT_INDEX, since=args.since, batch_size=args.batch_size)
+            _, failed = run_bulk(client, actions, args.chunk_size, args.report_every)
+            failed += prune_stale_documents(client, DOCUMENT_INDEX, args)
+            sys.exit(1 if failed else 0)
+
+        started_at = datetime.utcnow()
+        new_index = f"{DOCUMENT_INDEX}_{started_at.strftime('%Y%m%d%H%M%S')}"
+        settings = dict(INDEX_MAPPING['settings'])
+        # 批量写入期间关闭刷新，完成后再恢复
+        settings['refresh_interval'] = '-1'
+        client.indices.create(index=new_index, mappings=INDEX_MAPPING['mappings'], settings=settings)
+        print(f"🔄 已创建新索引 '{new_index}'，开始全量写入...")
+
+        actions = iter_document_actions(new_index, batch_size=args.batch_size)
+        _, failed = run_bulk(client, actions, args.chunk_size, args.report_every)
+        if failed:
+            print(f"❌ 存在写入失败的文档，保留新索引 '{new_index}' 供排查，未切换别名")
+            sys.exit(1)
+
+        client.indices.put_settings(index=new_index, settings={'refresh_interval': '1s'})
+        client.indices.refresh(index=new_index)
+        swap_alias(client, new_index, keep_old=args.keep_old)
+
+        # 重建期间线上写入仍指向旧索引，切换后补录这段时间的变更
+        print("🔄 补录重建期间的变更...")
+        actions = iter_document_actions(DOCUMENT_INDEX, since=started_at, batch_size=args.batch_size)
+        run_bulk(client, actions, args.chunk_size, args.report_every)
+        # 切换前的删除操作写入了旧索引，硬删除的文档也不会出现在补录中；
+        # 切换之后的删除已直接作用于新索引，此时比对即可覆盖整个重建窗口
+        prune_stale_documents(client, DOCUMENT_INDEX, args)
+
+        print("\n" + "=" * 60)
+        print("✅ 索引重建完成！")
+        print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
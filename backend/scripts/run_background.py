@@ -0,0 +1,22 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+
+from app import create_app
+from app.runtime import BackgroundRuntime
+
+def main():
+    """
+    独立运行后台任务（离线同步、索引消费、定时任务）
+    配合 BACKGROUND_RUNTIME=external 使用，Web 进程不再承担后台负载；
+    可部署多个实例，由 Redis 租约选出唯一主节点，主节点退出后自动切换
+    """
+    # 不启动内嵌运行时，由本进程显式创建，与 BACKGROUND_RUNTIME 配置无关
+    app = create_app(start_background=False)
+    runtime = BackgroundRuntime(app)
+    app.extensions['background_runtime'] = runtime
+    print(f"后台运行时启动: {runtime.identity}")
+    runtime.run_forever()
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,7 @@ from app.extensions import db
 from sqlalchemy import text
 
 def update_schema():
-    app = create_app()
+    app = create_app(start_background=False)
     with app.app_context():
         print("Checking schema updates...")
         
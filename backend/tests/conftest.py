@@ -0,0 +1,71 @@
+"""
+测试夹具
+使用 SQLite 临时数据库与 fakeredis，不依赖 MySQL / Redis / Elasticsearch / MinIO 服务；
+应用以 start_background=False 创建，测试中不会启动后台运行时
+"""
+import os
+import sys
+
+import fakeredis
+import pytest
+import redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.utils.storage import StorageClient
+
+# 部分模块在导入时保存 redis_client 引用，所有测试共用同一个 fake 服务端，每个用例前清空
+_redis_server = fakeredis.FakeServer()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    client = fakeredis.FakeRedis(server=_redis_server)
+    client.flushall()
+    monkeypatch.setattr(redis.Redis, 'from_url', classmethod(lambda cls, *a, **k: client))
+    monkeypatch.setattr(StorageClient, 'init_app', lambda self, app: None)
+
+    class TestConfig(Config):
+        TESTING = True
+        # 文件数据库，恢复等多线程写入需要共享同一个库
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        ELASTICSEARCH_URL = ''
+        SOCKETIO_MESSAGE_QUEUE = None
+        JWT_SECRET_KEY = 'test-jwt-secret-key-with-at-least-32-bytes'
+
+    app = create_app(TestConfig, start_background=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    from app.models.models import Role, User
+    role = Role(name='用户', code='user')
+    db.session.add(role)
+    db.session.flush()
+    user = User(username='alice', email='alice@example.com', role_id=role.id)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def admin_headers(app):
+    from flask_jwt_extended import create_access_token
+    from app.models.models import Role, User
+    role = Role(name='管理员', code='admin')
+    db.session.add(role)
+    db.session.flush()
+    admin = User(username='admin', email='admin@example.com', role_id=role.id)
+    admin.set_password('password')
+    db.session.add(admin)
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
@@ -0,0 +1,36 @@
+import gzip
+import os
+import zlib
+
+import pytest
+
+
+def _fake_mysqldump(tmp_path, monkeypatch, script):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    path = bin_dir / 'mysqldump'
+    path.write_text('#!/bin/sh\n' + script)
+    path.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_export_streams_gzip(app, admin_headers, tmp_path, monkeypatch):
+    _fake_mysqldump(tmp_path, monkeypatch, "echo 'INSERT INTO t VALUES (1);'\n")
+    response = app.test_client().get('/api/admin/backup/export', headers=admin_headers)
+    assert response.status_code == 200
+    assert gzip.decompress(response.data) == b'INSERT INTO t VALUES (1);\n'
+
+
+def test_failed_dump_truncates_download(app, admin_headers, tmp_path, monkeypatch, caplog):
+    _fake_mysqldump(tmp_path, monkeypatch, "echo 'INSERT INTO t VALUES (1);'\necho 'Access denied' >&2\nexit 2\n")
+    response = app.test_client().get('/api/admin/backup/export', headers=admin_headers, buffered=False)
+    assert response.status_code == 200
+
+    body = b''
+    with pytest.raises(RuntimeError):
+        for chunk in response.response:
+            body += chunk
+    # 没有 gzip 结尾，解压时报错
+    with pytest.raises((EOFError, zlib.error)):
+        gzip.decompress(body)
+    assert 'Access denied' in caplog.text
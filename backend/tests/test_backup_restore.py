@@ -0,0 +1,90 @@
+from sqlalchemy import text
+
+from app.extensions import db
+
+
+def _write_dump(tmp_path):
+    path = tmp_path / 'backup.sql'
+    path.write_text(
+        "DROP TABLE IF EXISTS `t`;\n"
+        "CREATE TABLE `t` (id INTEGER PRIMARY KEY, v TEXT);\n"
+        "INSERT INTO `t` VALUES (1,'a;b'),(2,'100%');\n"
+    )
+    return str(path)
+
+
+def test_restore_releases_only_its_own_lock(app, tmp_path):
+    from app.extensions import redis_client
+    from app.tasks import backup_restore
+
+    job_id = backup_restore.create_restore_job(_write_dump(tmp_path), 'backup.sql', 1)
+    assert backup_restore.create_restore_job(_write_dump(tmp_path), 'backup.sql', 1) is None
+    assert backup_restore.get_restore_job(job_id)['status'] == backup_restore.STATUS_QUEUED
+
+    assert backup_restore.run_next_restore_job(app, timeout=1) == job_id
+    assert backup_restore.get_restore_job(job_id)['status'] == backup_restore.STATUS_SUCCEEDED
+    assert redis_client.get(backup_restore.RESTORE_LOCK_KEY) is None
+    assert db.session.execute(text('SELECT COUNT(*) FROM t')).scalar() == 2
+
+    # 锁已被其他任务取得时，结束的任务不能释放它
+    redis_client.set(backup_restore.RESTORE_LOCK_KEY, 'other-job')
+    backup_restore._release_lock(job_id)
+    assert redis_client.get(backup_restore.RESTORE_LOCK_KEY) == b'other-job'
+
+
+def test_running_job_without_lock_reports_interrupted(app, tmp_path):
+    from app.extensions import redis_client
+    from app.tasks import backup_restore
+
+    job_id = backup_restore.create_restore_job(_write_dump(tmp_path), 'backup.sql', 1)
+
+    # 执行进程退出后锁过期，队列中的任务不再执行
+    redis_client.delete(backup_restore.RESTORE_LOCK_KEY)
+    assert backup_restore.get_restore_job(job_id)['status'] == backup_restore.STATUS_INTERRUPTED
+    assert backup_restore.run_next_restore_job(app, timeout=1) is None
+
+    assert backup_restore.resume_restore_job(job_id)
+    assert backup_restore.get_restore_job(job_id)['status'] == backup_restore.STATUS_QUEUED
+    assert backup_restore.run_next_restore_job(app, timeout=1) == job_id
+    assert backup_restore.get_restore_job(job_id)['status'] == backup_restore.STATUS_SUCCEEDED
+
+
+def test_status_endpoint_does_not_depend_on_user_table(app, admin_headers, tmp_path):
+    from flask_jwt_extended import create_access_token
+    from app.models.models import User
+    from app.tasks import backup_restore
+
+    admin_id = User.query.filter_by(username='admin').one().id
+    job_id = backup_restore.create_restore_job(_write_dump(tmp_path), 'backup.sql', admin_id)
+
+    # 恢复过程中 user 表被清空重建
+    User.query.delete()
+    db.session.commit()
+
+    client = app.test_client()
+    resp = client.get(f'/api/admin/backup/import/{job_id}', headers=admin_headers)
+    assert resp.status_code == 200
+    assert resp.get_json()['status'] == backup_restore.STATUS_QUEUED
+
+    # 其他用户看不到该任务
+    other = {'Authorization': f'Bearer {create_access_token(identity=str(admin_id + 1))}'}
+    assert client.get(f'/api/admin/backup/import/{job_id}', headers=other).status_code == 404
+    assert client.post(f'/api/admin/backup/import/{job_id}/resume', headers=other).status_code == 404
+
+
+def test_lock_heartbeat_renews_and_detects_loss(app, monkeypatch):
+    from app.extensions import redis_client
+    from app.tasks import backup_restore
+
+    monkeypatch.setattr(backup_restore, 'RESTORE_LOCK_RENEW_INTERVAL', 0.05)
+    redis_client.set(backup_restore.RESTORE_LOCK_KEY, 'job', ex=1)
+    heartbeat = backup_restore._LockHeartbeat('job')
+    heartbeat.start()
+    try:
+        assert not heartbeat.lost.wait(0.2)
+        assert redis_client.ttl(backup_restore.RESTORE_LOCK_KEY) == backup_restore.RESTORE_LOCK_TTL
+
+        redis_client.set(backup_restore.RESTORE_LOCK_KEY, 'other-job')
+        assert heartbeat.lost.wait(1)
+    finally:
+        heartbeat.stop()
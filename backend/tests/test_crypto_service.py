@@ -0,0 +1,61 @@
+import pytest
+
+from app.utils import crypto_service
+from app.utils.crypto_service import (
+    decrypt_content, decrypt_contents, derive_user_key, encrypt_content,
+    generate_user_salt, is_key_encrypted, unwrap_session_key, wrap_session_key,
+)
+
+
+def test_session_key_round_trip():
+    key = derive_user_key('secret', generate_user_salt())
+    encrypted = encrypt_content('隐私正文', key=key)
+
+    assert is_key_encrypted(encrypted)
+    assert decrypt_content(encrypted, key=key) == '隐私正文'
+    # 同一内容每次使用新的 nonce
+    assert encrypt_content('隐私正文', key=key) != encrypted
+
+    other = derive_user_key('secret', generate_user_salt())
+    with pytest.raises(ValueError):
+        decrypt_content(encrypted, key=other)
+    with pytest.raises(ValueError):
+        decrypt_content(encrypted, password='secret')
+
+
+def test_v1_ciphertext_still_decrypts_with_password():
+    legacy = encrypt_content('旧文档', password='secret')
+    key = derive_user_key('secret', generate_user_salt())
+
+    assert not is_key_encrypted(legacy)
+    assert decrypt_content(legacy, password='secret', key=key) == '旧文档'
+    with pytest.raises(ValueError):
+        decrypt_content(legacy, password='wrong')
+    with pytest.raises(ValueError):
+        decrypt_content(legacy, key=key)
+
+
+def test_batch_decrypt_mixes_formats_and_keeps_order(monkeypatch):
+    # 阈值设为 0 强制走线程池
+    monkeypatch.setattr(crypto_service, 'BATCH_INLINE_THRESHOLD', 0)
+    monkeypatch.setattr(crypto_service, 'BATCH_DECRYPT_WORKERS', 2)
+    key = derive_user_key('secret', generate_user_salt())
+    items = [
+        encrypt_content('一', key=key),
+        encrypt_content('二', password='secret'),
+        'v2:损坏',
+        encrypt_content('四', key=key),
+    ]
+
+    results = decrypt_contents(items, 'secret', key=key)
+    assert results[0] == '一' and results[1] == '二' and results[3] == '四'
+    assert isinstance(results[2], ValueError)
+
+
+def test_wrapped_session_key_requires_token():
+    key = derive_user_key('secret', generate_user_salt())
+    wrapped = wrap_session_key(key, 'token-a', 'app-secret')
+
+    assert unwrap_session_key(wrapped, 'token-a', 'app-secret') == key
+    with pytest.raises(Exception):
+        unwrap_session_key(wrapped, 'token-b', 'app-secret')
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models.models import Document
+
+
+def _headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+
+def _create_documents(user, specs):
+    base = datetime(2026, 1, 1)
+    docs = []
+    for title, minutes, pinned in specs:
+        doc = Document(title=title, content='', owner_id=user.id, is_pinned=pinned,
+                       updated_at=base + timedelta(minutes=minutes))
+        db.session.add(doc)
+        docs.append(doc)
+    db.session.commit()
+    return docs
+
+
+def _walk(client, headers, limit, **params):
+    titles = []
+    cursor = None
+    for _ in range(20):
+        query = dict(params, limit=limit)
+        if cursor:
+            query['cursor'] = cursor
+        resp = client.get('/api/docs/', headers=headers, query_string=query)
+        assert resp.status_code == 200
+        body = resp.get_json()
+        titles.extend(item['title'] for item in body['items'])
+        cursor = body['next_cursor']
+        if not cursor:
+            return titles
+    raise AssertionError('分页没有结束')
+
+
+def test_cursor_walk_keeps_pinned_first_and_breaks_ties_by_id(app, user):
+    # 多篇文档更新时间相同，置顶文档的游标中包含布尔值
+    docs = _create_documents(user, [
+        ('a', 1, False), ('b', 2, False), ('c', 2, False), ('d', 2, True),
+        ('e', 3, True), ('f', 0, False), ('g', 2, False),
+    ])
+    expected = [
+        doc.title for doc in sorted(docs, key=lambda d: (d.is_pinned, d.updated_at, d.id), reverse=True)
+    ]
+
+    client = app.test_client()
+    for limit in (1, 2, 3, 10):
+        assert _walk(client, _headers(user), limit) == expected
+
+
+def test_cursor_walk_ascending_without_pinned_keys(app, user):
+    docs = _create_documents(user, [('a', 2, True), ('b', 1, False), ('c', 1, False), ('d', 0, True)])
+    for doc in docs:
+        doc.is_deleted = True
+    db.session.commit()
+    expected = [doc.title for doc in sorted(docs, key=lambda d: (d.updated_at, d.id))]
+
+    titles = _walk(app.test_client(), _headers(user), 2, order='asc', recycle_bin='true')
+    assert titles == expected
+
+
+def test_invalid_cursor_is_rejected(app, user):
+    resp = app.test_client().get('/api/docs/', headers=_headers(user), query_string={'cursor': 'not-a-cursor'})
+    assert resp.status_code == 400
+
+
+def test_search_pages_follow_es_rank(app, user, monkeypatch):
+    from app.docs import routes
+
+    docs = _create_documents(user, [(f'doc{i}', i, i == 0) for i in range(6)])
+    # 第 3 篇已在回收站，不属于默认视图
+    docs[3].is_deleted = True
+    db.session.commit()
+    ranking = [docs[i].id for i in (4, 0, 3, 5, 1, 2)]
+
+    def fake_hits(keyword, owner_id, size, search_after=None):
+        # 排序值与 SEARCH_SORT 对应：(相关度, 更新时间, ID)
+        start = search_after[2] + 1 if search_after else 0
+        return [(doc_id, [1.0, 0, position]) for position, doc_id in enumerate(ranking)][start:start + size]
+
+    monkeypatch.setattr(routes, 'search_document_hits', fake_hits)
+
+    titles = _walk(app.test_client(), _headers(user), 2, q='doc')
+    assert titles == ['doc4', 'doc0', 'doc5', 'doc1', 'doc2']
@@ -0,0 +1,78 @@
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models.models import Document
+from app.utils.crypto_service import decrypt_content, encrypt_content
+
+PASSWORD = 'privacy-password'
+
+
+def _headers(user):
+    return {
+        'Authorization': f'Bearer {create_access_token(identity=str(user.id))}',
+        'X-Privacy-Token': 'token',
+    }
+
+
+def _privacy_document(user, content):
+    doc = Document(
+        title=encrypt_content('标题', PASSWORD),
+        content=encrypt_content(content, PASSWORD),
+        preview=encrypt_content(Document.build_preview(content), PASSWORD),
+        owner_id=user.id,
+        in_privacy_space=True,
+    )
+    db.session.add(doc)
+    db.session.commit()
+    return doc
+
+
+def _allow_privacy_access(monkeypatch):
+    from app.docs import routes
+    monkeypatch.setattr(routes.PrivacySpaceService, 'verify_access_token', staticmethod(lambda user_id, token: True))
+    monkeypatch.setattr(routes, '_get_privacy_session_key', lambda user_id: None)
+
+
+def test_move_out_of_privacy_with_plaintext_builds_plain_preview(app, user, monkeypatch):
+    _allow_privacy_access(monkeypatch)
+    doc = _privacy_document(user, '<p>机密正文</p>')
+
+    resp = app.test_client().put(f'/api/docs/{doc.id}', headers=_headers(user), json={
+        'in_privacy_space': False, 'title': '标题', 'content': '<p>公开正文</p>', '_privacy_password': PASSWORD,
+    })
+    assert resp.status_code == 200
+    db.session.expire_all()
+    doc = db.session.get(Document, doc.id)
+    assert not doc.in_privacy_space
+    # 目标为普通空间，新内容不再加密
+    assert doc.content == '<p>公开正文</p>'
+    assert doc.preview == Document.build_preview('<p>公开正文</p>')
+
+
+def test_move_out_of_privacy_without_plaintext_clears_preview(app, user, monkeypatch):
+    _allow_privacy_access(monkeypatch)
+    doc = _privacy_document(user, '<p>机密正文</p>')
+
+    resp = app.test_client().put(f'/api/docs/{doc.id}', headers=_headers(user), json={
+        'in_privacy_space': False, '_privacy_password': PASSWORD,
+    })
+    assert resp.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Document, doc.id).preview is None
+
+
+def test_move_into_privacy_with_content_encrypts_it(app, user, monkeypatch):
+    _allow_privacy_access(monkeypatch)
+    doc = Document(title='标题', content='<p>旧正文</p>', owner_id=user.id)
+    db.session.add(doc)
+    db.session.commit()
+
+    resp = app.test_client().put(f'/api/docs/{doc.id}', headers=_headers(user), json={
+        'in_privacy_space': True, 'content': '<p>新正文</p>', '_privacy_password': PASSWORD,
+    })
+    assert resp.status_code == 200
+    db.session.expire_all()
+    doc = db.session.get(Document, doc.id)
+    assert doc.in_privacy_space
+    assert decrypt_content(doc.content, PASSWORD) == '<p>新正文</p>'
+    assert decrypt_content(doc.preview, PASSWORD) == Document.build_preview('<p>新正文</p>')
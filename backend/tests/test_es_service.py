@@ -0,0 +1,21 @@
+from app.extensions import db
+from app.models.models import Document
+
+
+def test_stale_documents_are_deleted_from_index(app, user, monkeypatch):
+    from app.utils import es_service
+
+    db.session.add_all([
+        Document(id=1, title='正常', content='', owner_id=user.id),
+        Document(id=2, title='回收站', content='', owner_id=user.id, is_deleted=True),
+        Document(id=3, title='隐私', content='', owner_id=user.id, in_privacy_space=True),
+    ])
+    db.session.commit()
+    # 文档 4 已被硬删除，只剩索引中的记录
+    monkeypatch.setattr(es_service.helpers, 'scan',
+                        lambda client, **kwargs: ({'_id': str(doc_id)} for doc_id in (1, 2, 3, 4)))
+
+    actions = list(es_service.iter_stale_document_actions('documents_new', batch_size=3))
+    assert [(a['_op_type'], a['_index'], a['_id']) for a in actions] == [
+        ('delete', 'documents_new', 2), ('delete', 'documents_new', 3), ('delete', 'documents_new', 4),
+    ]
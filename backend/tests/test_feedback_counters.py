@@ -0,0 +1,85 @@
+from unittest import mock
+
+import pytest
+
+from app.extensions import db
+from app.models.models import Feedback
+
+
+def _feedback(user):
+    feedback = Feedback(title='标题', content='内容', user_id=user.id, view_count=0)
+    db.session.add(feedback)
+    db.session.commit()
+    return feedback.id
+
+
+def test_flush_views_does_not_replay_leftover_batch(app, user):
+    from app.utils.feedback_counters import FeedbackCounters
+
+    feedback_id = _feedback(user)
+    FeedbackCounters.record_view(feedback_id)
+    FeedbackCounters.record_view(feedback_id)
+    assert FeedbackCounters.flush_views() == 1
+
+    # 模拟上次回写在提交后、清理 flushing 前崩溃
+    from app.utils.feedback_counters import VIEW_FLUSHING_KEY
+    from app.extensions import redis_client
+    redis_client.hset(VIEW_FLUSHING_KEY, feedback_id, 2)
+    FeedbackCounters.record_view(feedback_id)
+    FeedbackCounters.flush_views()
+
+    assert db.session.get(Feedback, feedback_id).view_count == 3
+
+
+def test_flush_views_returns_increments_on_db_error(app, user):
+    from app.utils.feedback_counters import FeedbackCounters
+
+    feedback_id = _feedback(user)
+    FeedbackCounters.record_view(feedback_id)
+    with mock.patch.object(db.session, 'commit', side_effect=RuntimeError('db down')):
+        with pytest.raises(RuntimeError):
+            FeedbackCounters.flush_views()
+    assert FeedbackCounters.pending_views([feedback_id]) == {feedback_id: 1}
+
+    FeedbackCounters.flush_views()
+    db.session.expire_all()
+    assert db.session.get(Feedback, feedback_id).view_count == 1
+
+
+def test_like_sets_expire_and_reload_from_database(app, user):
+    from app.extensions import redis_client
+    from app.models.models import FeedbackLike
+    from app.utils.feedback_counters import LIKE_KEY_TTL, FeedbackCounters
+
+    feedback_id = _feedback(user)
+    key = FeedbackCounters._like_key('feedback', feedback_id)
+    assert FeedbackCounters.toggle_like('feedback', feedback_id, user.id) == (True, 1)
+    assert 0 < redis_client.ttl(key) <= LIKE_KEY_TTL
+
+    # 回写后重新设置过期时间
+    redis_client.expire(key, 60)
+    assert FeedbackCounters.flush_likes('feedback') == 1
+    assert redis_client.ttl(key) > 60
+    assert FeedbackLike.query.filter_by(feedback_id=feedback_id).count() == 1
+
+    # 集合过期后读取以数据库为准，再次点赞时重新加载
+    redis_client.delete(key)
+    assert FeedbackCounters.like_states('feedback', [feedback_id], user.id) == {}
+    assert FeedbackCounters.toggle_like('feedback', feedback_id, user.id) == (False, 0)
+    assert redis_client.ttl(key) > 0
+
+
+def test_flush_skips_like_sets_that_expired_before_flush(app, user):
+    from app.extensions import redis_client
+    from app.models.models import FeedbackLike
+    from app.utils.feedback_counters import FeedbackCounters
+
+    feedback_id = _feedback(user)
+    db.session.add(FeedbackLike(feedback_id=feedback_id, user_id=user.id))
+    db.session.commit()
+    FeedbackCounters.toggle_like('feedback', feedback_id, 999)
+    redis_client.delete(FeedbackCounters._like_key('feedback', feedback_id))
+
+    # 集合不存在时不能当作无人点赞而删除数据库中的记录
+    FeedbackCounters.flush_likes('feedback')
+    assert FeedbackLike.query.filter_by(feedback_id=feedback_id).count() == 1
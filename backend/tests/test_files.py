@@ -0,0 +1,50 @@
+from app.extensions import db
+from app.models.models import FileCenterFile, FileCenterFolder, User
+
+
+def _folder(name, creator_id, parent=None):
+    folder = FileCenterFolder(name=name, creator_id=creator_id, parent_id=parent.id if parent else None)
+    db.session.add(folder)
+    db.session.flush()
+    return folder
+
+
+def test_folder_cannot_move_into_descendant(app, admin_headers):
+    admin_id = User.query.filter_by(username='admin').one().id
+    root = _folder('根', admin_id)
+    child = _folder('子', admin_id, root)
+    grandchild = _folder('孙', admin_id, child)
+    other = _folder('其他', admin_id)
+    db.session.commit()
+    client = app.test_client()
+
+    def move(folder, parent):
+        return client.put(f'/api/files/folders/{folder.id}', headers=admin_headers,
+                          json={'parent_id': parent.id if parent else None})
+
+    assert move(root, root).get_json()['error'] == '不能移动到自身'
+    for target in (child, grandchild):
+        resp = move(root, target)
+        assert resp.status_code == 400
+        assert resp.get_json()['error'] == '不能移动到子文件夹'
+    db.session.expire_all()
+    assert db.session.get(FileCenterFolder, root.id).parent_id is None
+
+    # 移出子树后不再是子孙文件夹，可以移动
+    assert move(grandchild, other).status_code == 200
+    assert move(root, grandchild).status_code == 200
+    assert move(root, None).status_code == 200
+
+
+def test_folder_sizes_sum_whole_subtree(app, admin_headers):
+    admin_id = User.query.filter_by(username='admin').one().id
+    root = _folder('根', admin_id)
+    child = _folder('子', admin_id, root)
+    grandchild = _folder('孙', admin_id, child)
+    for folder, size in ((root, 1), (child, 10), (grandchild, 100)):
+        db.session.add(FileCenterFile(name='f', path='p', size=size, type='txt',
+                                      folder_id=folder.id, uploader_id=admin_id))
+    db.session.commit()
+
+    resp = app.test_client().get('/api/files/list', headers=admin_headers)
+    assert [(f['name'], f['size']) for f in resp.get_json()['folders']] == [('根', 111)]
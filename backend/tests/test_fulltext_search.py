@@ -0,0 +1,34 @@
+from sqlalchemy.dialects import mysql
+
+from app.extensions import db
+from app.models.models import Document
+
+
+def test_fulltext_query_splits_terms_into_ngrams():
+    from app.docs.routes import _build_fulltext_query
+
+    assert _build_fulltext_query('数据库') == '+数据 +据库'
+    # 重复片段只保留一次，不足一个片段长度的词使用前缀匹配
+    assert _build_fulltext_query('哈哈哈 库') == '+哈哈 +库*'
+    assert _build_fulltext_query('ab') == '+ab'
+
+
+def test_fulltext_query_strips_boolean_operators():
+    from app.docs.routes import _build_fulltext_query
+
+    assert _build_fulltext_query('+a -"b" (cd)~') == '+a* +b* +cd'
+    assert _build_fulltext_query('  *** ') == ''
+
+
+def test_split_keyword_filter_compiles_to_match_against(app):
+    from app.docs.routes import _apply_split_keyword_filter
+
+    query = db.session.query(Document.id)
+    assert _apply_split_keyword_filter(query, '   ') is query
+
+    compiled = _apply_split_keyword_filter(query, '搜索引擎').statement.compile(
+        dialect=mysql.dialect(), compile_kwargs={'literal_binds': True}
+    )
+    sql = str(compiled)
+    assert 'MATCH (document.title, document.content) AGAINST' in sql
+    assert "'+搜索 +索引 +引擎' IN BOOLEAN MODE" in sql
@@ -0,0 +1,153 @@
+import json
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models.models import AIMessage, AISession, Document, MonitorKeyword
+
+
+def _export(since=None):
+    from app.utils.logical_backup import iter_backup_ndjson
+    lines = [line.decode('utf-8') for line in iter_backup_ndjson(since, include_objects=False)]
+    footer = json.loads(lines[-1])
+    return lines, datetime.fromisoformat(footer['until'])
+
+
+def _row_ids(lines, table):
+    records = (json.loads(line) for line in lines)
+    return [r['data']['id'] for r in records if r['type'] == 'row' and r['table'] == table]
+
+
+def test_full_and_incremental_restore_keeps_deletions(app, user):
+    from app.utils.logical_backup import restore_backup
+
+    session = AISession(user_id=user.id, title='会话')
+    db.session.add(session)
+    db.session.flush()
+    old_message = AIMessage(session_id=session.id, role='user', content='旧消息',
+                            created_at=datetime.utcnow() - timedelta(days=1))
+    keyword = MonitorKeyword(keyword='机密')
+    documents = [Document(title=f'文档{i}', content='正文', owner_id=user.id) for i in range(2)]
+    db.session.add_all([old_message, keyword, *documents])
+    db.session.commit()
+    keyword_id, document_id, message_id = keyword.id, documents[0].id, old_message.id
+
+    full, until = _export()
+
+    # 两次备份之间：删除整表导出的行与增量表的行，新增一条消息
+    db.session.delete(keyword)
+    db.session.delete(documents[0])
+    db.session.add(AIMessage(session_id=session.id, role='assistant', content='新消息'))
+    db.session.commit()
+
+    incremental, _ = _export(until)
+    # 只插入的表按 created_at 增量导出，早于水位线的消息不再导出
+    assert message_id not in _row_ids(incremental, 'ai_message')
+    assert len(_row_ids(incremental, 'ai_message')) == 1
+
+    restore_backup(full, include_objects=False)
+    db.session.expire_all()
+    assert db.session.get(MonitorKeyword, keyword_id) is not None
+
+    restore_backup(incremental, include_objects=False)
+    db.session.expire_all()
+    assert db.session.get(MonitorKeyword, keyword_id) is None
+    assert db.session.get(Document, document_id) is None
+    assert db.session.get(AIMessage, message_id) is not None
+    assert AIMessage.query.count() == 2
+
+
+def test_ids_are_streamed_in_chunks_and_applied_by_range(app, user, monkeypatch):
+    from app.utils import logical_backup
+
+    monkeypatch.setattr(logical_backup, 'IDS_CHUNK_SIZE', 2)
+    for doc_id in (1, 3, 5, 7, 9):
+        db.session.add(Document(id=doc_id, title=f'文档{doc_id}', content='', owner_id=user.id))
+    db.session.commit()
+
+    full, _ = _export()
+    chunks = [json.loads(line) for line in full]
+    chunks = [r for r in chunks if r['type'] == 'ids' and r['table'] == 'document']
+    assert [(r['after'], r['ids'], r['final']) for r in chunks] == [
+        (None, [1, 3], False), (3, [5, 7], False), (7, [9], True),
+    ]
+
+    # 备份之后新增的行分别落在首块之前、各块之间与末块之后
+    Document.query.filter_by(id=5).delete()
+    for doc_id in (2, 6, 8, 12):
+        db.session.add(Document(id=doc_id, title=f'文档{doc_id}', content='', owner_id=user.id))
+    db.session.commit()
+
+    stats = logical_backup.restore_backup(full, include_objects=False)
+    db.session.expire_all()
+    assert sorted(doc_id for (doc_id,) in db.session.query(Document.id)) == [1, 3, 5, 7, 9]
+    assert stats['deleted_tables'] == len(db.metadata.sorted_tables)
+
+
+class _FakeMinio:
+    """内存中的 MinIO 客户端，对象以 (桶, 名称) -> ETag 表示"""
+
+    def __init__(self):
+        from datetime import timezone
+        self.now = datetime.now(timezone.utc)
+        self.objects = {}
+        self.copies = []
+
+    def bucket_exists(self, bucket):
+        return True
+
+    def make_bucket(self, bucket):
+        pass
+
+    def list_objects(self, bucket, recursive=True):
+        from types import SimpleNamespace
+        return [
+            SimpleNamespace(object_name=name, etag=etag, size=1, last_modified=self.now)
+            for (b, name), etag in list(self.objects.items()) if b == bucket
+        ]
+
+    def stat_object(self, bucket, name):
+        from types import SimpleNamespace
+        from minio.error import S3Error
+        if (bucket, name) not in self.objects:
+            raise S3Error('NoSuchKey', 'not found', name, 'req', 'host', None)
+        return SimpleNamespace(etag=self.objects[(bucket, name)])
+
+    def copy_object(self, bucket, name, source):
+        self.copies.append((bucket, name))
+        self.objects[(bucket, name)] = self.objects[(source.bucket_name, source.object_name)]
+
+
+def test_object_copies_are_keyed_by_etag(app, monkeypatch):
+    from app.utils import logical_backup
+
+    client = _FakeMinio()
+    monkeypatch.setattr(logical_backup, 'get_minio_client', lambda: client)
+    client.objects[('avatars', 'a.png')] = 'v1'
+
+    old_manifest = list(logical_backup.iter_backup_ndjson())
+    list(logical_backup.iter_backup_ndjson())
+    # 重复导出不会重复复制同一版本
+    assert client.copies == [('backups', 'objects/avatars/a.png@v1')]
+
+    client.objects[('avatars', 'a.png')] = 'v2'
+    list(logical_backup.iter_backup_ndjson())
+    assert ('backups', 'objects/avatars/a.png@v2') in client.copies
+
+    # 恢复旧备份取回清单中的版本
+    objects = [line for line in old_manifest if b'"type":"object"' in line]
+    stats = logical_backup.restore_backup(objects)
+    assert stats['objects_restored'] == 1
+    assert client.objects[('avatars', 'a.png')] == 'v1'
+
+
+def test_logical_export_requires_post(app, admin_headers):
+    import gzip
+    client = app.test_client()
+    assert client.get('/api/admin/backup/logical', headers=admin_headers).status_code == 405
+
+    response = client.post('/api/admin/backup/logical?objects=0', headers=admin_headers)
+    assert response.status_code == 200
+    records = [json.loads(line) for line in gzip.decompress(response.data).splitlines()]
+    assert records[0]['type'] == 'header'
+    assert records[-1]['type'] == 'footer'
+    assert records[-1]['until'] == response.headers['X-Backup-Until']
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models.models import Document
+
+
+def _create_documents(user):
+    base = datetime(2026, 1, 1)
+    # 更新时间与主键顺序不一致，偶数篇命中关键词
+    for doc_id in range(1, 10):
+        db.session.add(Document(
+            id=doc_id, title=f'文档{doc_id}', owner_id=user.id,
+            content='<p>机密资料</p>' if doc_id % 2 == 0 else '<p>普通内容</p>',
+            updated_at=base + timedelta(hours=(doc_id * 7) % 10),
+        ))
+    db.session.commit()
+    return sorted(
+        (doc for doc in Document.query if doc.id % 2 == 0),
+        key=lambda doc: (doc.updated_at, doc.id), reverse=True
+    )
+
+
+def test_live_scan_walks_primary_key_and_sorts_matches(app, user, admin_headers, monkeypatch):
+    from app.admin import routes
+
+    monkeypatch.setattr(routes, 'MONITOR_SCAN_BATCH_SIZE', 2)
+    expected = _create_documents(user)
+    client = app.test_client()
+
+    resp = client.post('/api/admin/monitor/docs', headers=admin_headers, json={'keywords': ['机密']})
+    assert [item['id'] for item in resp.get_json()] == [doc.id for doc in expected]
+
+    seen = []
+    cursor = None
+    for _ in range(10):
+        body = {'keywords': ['机密'], 'limit': 3}
+        if cursor:
+            body['cursor'] = cursor
+        page = client.post('/api/admin/monitor/docs', headers=admin_headers, json=body).get_json()
+        ids = [item['id'] for item in page['items']]
+        # 每页内部按更新时间倒序
+        updated = [item['updated_at'] for item in page['items']]
+        assert updated == sorted(updated, reverse=True)
+        seen.extend(ids)
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert sorted(seen) == [2, 4, 6, 8]
@@ -0,0 +1,40 @@
+from app.extensions import db
+from app.models.models import Role, User
+
+
+def test_new_user_does_not_inherit_unread_broadcasts(app):
+    from app.utils.notification_service import NotificationService
+
+    db.session.add(Role(name='用户', code='user'))
+    NotificationService.broadcast('历史通知', '注册前发布')
+    db.session.commit()
+
+    response = app.test_client().post('/api/auth/register', json={
+        'username': 'bob', 'email': 'bob@example.com', 'password': 'password'
+    })
+    assert response.status_code == 201
+    user_id = User.query.filter_by(username='bob').one().id
+    assert NotificationService.count_unread(user_id) == 0
+
+    NotificationService.broadcast('新通知', '注册后发布')
+    db.session.commit()
+    assert NotificationService.count_unread(user_id) == 1
+
+
+def test_user_without_read_state_starts_from_latest_broadcast(app, user):
+    from app.models.models import BroadcastReadState
+    from app.utils.notification_service import NotificationService
+
+    # 用户不是经注册接口创建的，没有已读状态
+    NotificationService.broadcast('历史通知', '首次读取前发布')
+    db.session.commit()
+    assert db.session.get(BroadcastReadState, user.id) is None
+
+    items, unread = NotificationService.get_cached(user.id)
+    assert unread == 0
+    assert [item['is_read'] for item in items] == [True]
+    assert db.session.get(BroadcastReadState, user.id) is not None
+
+    NotificationService.broadcast('新通知', '首次读取后发布')
+    db.session.commit()
+    assert NotificationService.get_cached(user.id)[1] == 1
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models.models import Schedule
+
+
+def test_due_reminders_are_claimed_once(app):
+    from app.extensions import redis_client
+    from app.tasks.reminders import REMINDER_QUEUE_KEY, claim_due_reminders
+
+    now = 1_000_000
+    redis_client.zadd(REMINDER_QUEUE_KEY, {
+        'schedule:1': now - 10, 'meeting:2': now, 'schedule:3': now + 10, 'unknown:4': now - 5,
+    })
+
+    assert sorted(claim_due_reminders(now)) == [('meeting', 2), ('schedule', 1)]
+    # 其他节点再次领取时拿不到已领取的条目，未到期的提醒留在队列中
+    assert claim_due_reminders(now) == []
+    assert redis_client.zrange(REMINDER_QUEUE_KEY, 0, -1) == [b'schedule:3']
+    assert claim_due_reminders(now + 10) == [('schedule', 3)]
+
+
+def test_claim_skips_members_removed_concurrently(app, monkeypatch):
+    from app.extensions import redis_client
+    from app.tasks import reminders
+
+    redis_client.zadd(reminders.REMINDER_QUEUE_KEY, {'schedule:1': 1, 'schedule:2': 2})
+    real_zrem = redis_client.zrem
+
+    def racing_zrem(key, member):
+        # 模拟另一个分发线程抢先领取了 schedule:1
+        if member == b'schedule:1':
+            real_zrem(key, member)
+        return real_zrem(key, member)
+
+    monkeypatch.setattr(reminders.redis_client, 'zrem', racing_zrem)
+    assert reminders.claim_due_reminders(10) == [('schedule', 2)]
+
+
+def test_send_reminder_marks_event_once(app, user):
+    from app.tasks.reminders import send_reminder
+
+    start = datetime.now() + timedelta(minutes=5)
+    schedule = Schedule(title='站会', start_time=start, end_time=start + timedelta(minutes=15),
+                        user_id=user.id, remind_minutes=10)
+    schedule.refresh_notify_at()
+    db.session.add(schedule)
+    db.session.commit()
+
+    assert send_reminder('schedule', schedule.id) is True
+    assert send_reminder('schedule', schedule.id) is False
+    db.session.expire_all()
+    assert db.session.get(Schedule, schedule.id).is_notified is True
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models.models import Meeting, Schedule
+
+
+def _headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+
+def _queued_at(kind, event_id):
+    from app.extensions import redis_client
+    from app.tasks.reminders import REMINDER_QUEUE_KEY
+    return redis_client.zscore(REMINDER_QUEUE_KEY, f'{kind}:{event_id}')
+
+
+def test_schedule_routes_maintain_notify_at(app, user):
+    client = app.test_client()
+    headers = _headers(user)
+    start = datetime(2030, 5, 1, 9, 0)
+
+    resp = client.post('/api/schedule/schedules', headers=headers, json={
+        'title': '周会', 'start_time': start.isoformat(),
+        'end_time': (start + timedelta(hours=1)).isoformat(), 'remind_minutes': 15,
+    })
+    assert resp.status_code == 201
+    schedule_id = resp.get_json()['id']
+    assert db.session.get(Schedule, schedule_id).notify_at == start - timedelta(minutes=15)
+    assert _queued_at('schedule', schedule_id) == (start - timedelta(minutes=15)).timestamp()
+
+    # 修改提前分钟数后重新计算提醒时间并重置通知状态
+    db.session.get(Schedule, schedule_id).is_notified = True
+    db.session.commit()
+    resp = client.put(f'/api/schedule/schedules/{schedule_id}', headers=headers, json={'remind_minutes': 60})
+    assert resp.status_code == 200
+    db.session.expire_all()
+    schedule = db.session.get(Schedule, schedule_id)
+    assert schedule.notify_at == start - timedelta(hours=1)
+    assert schedule.is_notified is False
+    assert _queued_at('schedule', schedule_id) == (start - timedelta(hours=1)).timestamp()
+
+    # 只修改开始时间也会重新计算
+    new_start = start + timedelta(days=1)
+    client.put(f'/api/schedule/schedules/{schedule_id}', headers=headers, json={'start_time': new_start.isoformat()})
+    db.session.expire_all()
+    assert db.session.get(Schedule, schedule_id).notify_at == new_start - timedelta(hours=1)
+
+    # 取消提醒后清空提醒时间并移出队列
+    client.put(f'/api/schedule/schedules/{schedule_id}', headers=headers, json={'remind_minutes': 0})
+    db.session.expire_all()
+    assert db.session.get(Schedule, schedule_id).notify_at is None
+    assert _queued_at('schedule', schedule_id) is None
+
+
+def test_meeting_routes_maintain_notify_at(app, user):
+    client = app.test_client()
+    headers = _headers(user)
+    start = datetime(2030, 5, 1, 14, 0)
+
+    resp = client.post('/api/schedule/meetings', headers=headers, json={
+        'title': '评审会', 'start_time': start.isoformat(),
+        'end_time': (start + timedelta(hours=2)).isoformat(), 'remind_minutes': 0,
+    })
+    meeting_id = resp.get_json()['id']
+    assert db.session.get(Meeting, meeting_id).notify_at is None
+    assert _queued_at('meeting', meeting_id) is None
+
+    client.put(f'/api/schedule/meetings/{meeting_id}', headers=headers, json={'remind_minutes': 30})
+    db.session.expire_all()
+    assert db.session.get(Meeting, meeting_id).notify_at == start - timedelta(minutes=30)
+    assert _queued_at('meeting', meeting_id) == (start - timedelta(minutes=30)).timestamp()
+
+    client.delete(f'/api/schedule/meetings/{meeting_id}', headers=headers)
+    assert _queued_at('meeting', meeting_id) is None
@@ -0,0 +1,61 @@
+import json
+
+from app.extensions import db
+from app.models.models import Document
+
+
+def test_corrupt_entries_are_acked_with_valid_ones(app, user):
+    # 依赖 redis_client 的模块需在应用创建后导入
+    from app.sync import sync_offline_documents
+    from app.utils.redis_service import RedisService
+
+    RedisService.ensure_offline_group()
+    client = RedisService.get_client()
+    client.xadd(RedisService.OFFLINE_STREAM_KEY, {'data': b'{not json'})
+    client.xadd(RedisService.OFFLINE_STREAM_KEY, {'data': json.dumps(['not', 'an', 'object'])})
+    key = RedisService.save_offline_document(user.id, {'title': '离线文档', 'content': '<p>正文</p>'})
+
+    assert sync_offline_documents('test-consumer') == 3
+
+    pending = client.xpending(RedisService.OFFLINE_STREAM_KEY, RedisService.OFFLINE_GROUP)
+    assert pending['pending'] == 0
+    assert client.xlen(RedisService.OFFLINE_STREAM_KEY) == 0
+    document = db.session.query(Document).filter_by(offline_key=key).one()
+    assert document.title == '离线文档'
+    assert document.owner_id == user.id
+
+
+def test_failing_rows_go_to_dead_letter_without_blocking_batch(app, user):
+    from app.sync import sync_offline_documents
+    from app.utils.redis_service import RedisService
+
+    RedisService.ensure_offline_group()
+    client = RedisService.get_client()
+    good = RedisService.save_offline_document(user.id, {'title': '正常文档', 'content': ''})
+    # 标题为空违反非空约束，整批插入失败后逐条插入
+    bad = RedisService.save_offline_document(user.id, {'title': None, 'content': ''})
+
+    assert sync_offline_documents('test-consumer') == 2
+
+    pending = client.xpending(RedisService.OFFLINE_STREAM_KEY, RedisService.OFFLINE_GROUP)
+    assert pending['pending'] == 0
+    assert db.session.query(Document).filter_by(offline_key=good).count() == 1
+    dead = client.xrange(RedisService.OFFLINE_DEAD_LETTER_KEY)
+    assert len(dead) == 1
+    assert json.loads(dead[0][1][b'data'])['offline_key'] == bad
+
+
+def test_entries_over_delivery_limit_go_to_dead_letter(app, user, monkeypatch):
+    from app.sync import sync_offline_documents
+    from app.utils.redis_service import RedisService
+
+    monkeypatch.setattr(RedisService, 'OFFLINE_MAX_DELIVERIES', 0)
+    RedisService.ensure_offline_group()
+    client = RedisService.get_client()
+    key = RedisService.save_offline_document(user.id, {'title': '离线文档', 'content': ''})
+
+    assert sync_offline_documents('test-consumer') == 1
+
+    assert db.session.query(Document).filter_by(offline_key=key).count() == 0
+    assert client.xlen(RedisService.OFFLINE_STREAM_KEY) == 0
+    assert client.xlen(RedisService.OFFLINE_DEAD_LETTER_KEY) == 1
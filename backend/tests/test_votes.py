@@ -0,0 +1,44 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models.models import Vote, VoteRecord
+
+
+def _vote(user):
+    vote = Vote(title='午餐', created_by=user.id,
+                options=[{'key': 'a', 'label': '面'}, {'key': 'b', 'label': '饭'}])
+    db.session.add(vote)
+    db.session.commit()
+    return vote.id
+
+
+def test_duplicate_vote_is_rejected(app, user):
+    from app.extensions import redis_client
+    from app.tasks.vote_tally import VOTE_TALLY_DELTA_KEY
+
+    vote_id = _vote(user)
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    resp = client.post(f'/api/notice/votes/{vote_id}/submit', headers=headers, json={'option_key': 'a'})
+    assert resp.status_code == 200
+    resp = client.post(f'/api/notice/votes/{vote_id}/submit', headers=headers, json={'option_key': 'b'})
+    assert resp.status_code == 400
+    assert resp.get_json()['error'] == '您已投过票'
+
+    # 只记录第一张票，计票增量也只累加一次
+    assert [r.option_key for r in VoteRecord.query.filter_by(vote_id=vote_id)] == ['a']
+    assert redis_client.hgetall(VOTE_TALLY_DELTA_KEY) == {f'{vote_id}:a'.encode(): b'1'}
+
+
+def test_unique_constraint_blocks_second_record(app, user):
+    vote_id = _vote(user)
+    db.session.add(VoteRecord(vote_id=vote_id, user_id=user.id, option_key='a'))
+    db.session.commit()
+
+    db.session.add(VoteRecord(vote_id=vote_id, user_id=user.id, option_key='b'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
@@ -39,6 +39,14 @@ export const importBackup = (formData) => {
   })
 }
 
+export const getImportBackupStatus = (jobId) => {
+  return request.get(`/admin/backup/import/${jobId}`)
+}
+
+export const resumeImportBackup = (jobId) => {
+  return request.post(`/admin/backup/import/${jobId}/resume`)
+}
+
 export const getMonitorKeywords = () => {
   return request.get('/admin/monitor/keywords')
 }
@@ -0,0 +1,26 @@
+import { io } from 'socket.io-client'
+
+let socket = null
+
+// 建立（或复用）与后端 Socket.IO 的连接，连接时携带 JWT 认证
+// 后端由多个 gevent worker 提供服务且没有粘性会话，只使用 websocket 传输，
+// 避免长轮询的多次请求落到不同 worker 上导致会话失效
+export function connectSocket() {
+    if (socket) return socket
+    if (!localStorage.getItem('token')) return null
+
+    socket = io(import.meta.env.VITE_SOCKET_URL || '/', {
+        transports: ['websocket'],
+        // 每次（重新）连接时读取最新的 token
+        auth: (cb) => cb({ token: localStorage.getItem('token') })
+    })
+    return socket
+}
+
+// 退出登录时断开连接
+export function disconnectSocket() {
+    if (socket) {
+        socket.disconnect()
+        socket = null
+    }
+}
@@ -25,6 +25,14 @@ export function getNotifications() {
     })
 }
 
+// 获取未读通知数
+export function getUnreadCount() {
+    return request({
+        url: '/users/notifications/unread-count',
+        method: 'get'
+    })
+}
+
 // 标记通知已读
 export function markRead(id) {
     return request({
@@ -18,6 +18,11 @@ export default defineConfig({
                 target: 'http://localhost:5000',
                 changeOrigin: true
             },
+            '/socket.io': {
+                target: 'http://localhost:5000',
+                ws: true,
+                changeOrigin: true
+            },
             '/minio': {
                 target: 'http://localhost:9000',
                 changeOrigin: true,